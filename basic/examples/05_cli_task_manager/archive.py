@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+已完成任务的归档 (archive)
+完成很久的任务从任务文件移到按月分区、只追加的归档文件中，
+任务文件因此只保存近期的任务。归档文件只在查询需要历史数据时才加载。
+
+归档目录的结构 (Archive directory layout):
+    tasks.json.archive/
+        2024-01.jsonl   # 2024年1月完成的任务，每行一个任务
+        2024-02.jsonl
+"""
+
+import os
+import json
+import heapq
+
+
+class TaskArchive:
+    """
+    按月分区的任务归档类
+    (Month-partitioned task archive)
+    """
+
+    def __init__(self, directory):
+        """
+        参数:
+            directory (str): 归档目录，第一次写入时创建
+        """
+        self.directory = directory
+        # 归档任务按ID索引，第一次查询时才加载 (Archived tasks by ID, loaded on first query)
+        self._tasks = None
+
+    def partitions(self):
+        """
+        返回所有分区名，按时间排序
+        (Return every partition name in chronological order)
+
+        返回:
+            list: 分区名列表，例如 ["2024-01", "2024-02"]
+        """
+        if not os.path.isdir(self.directory):
+            return []
+        return sorted(name[:-len(".jsonl")] for name in os.listdir(self.directory)
+                      if name.endswith(".jsonl"))
+
+    def append(self, tasks, durability="normal"):
+        """
+        把任务追加到它们完成时间所在月份的分区
+        (Append tasks to the partitions of the months they were completed in)
+
+        参数:
+            tasks (list): 要归档的已完成任务
+            durability (str): 持久化级别，"off"时不调用fsync
+        """
+        by_partition = {}
+        for task in tasks:
+            by_partition.setdefault(partition_of(task), []).append(task)
+
+        os.makedirs(self.directory, exist_ok=True)
+        for partition, partition_tasks in by_partition.items():
+            path = os.path.join(self.directory, partition + ".jsonl")
+            lines = "".join(json.dumps(task, ensure_ascii=False, separators=(',', ':')) + "\n"
+                            for task in partition_tasks)
+            with open(path, 'a', encoding='utf-8') as file:
+                file.write(lines)
+                if durability != "off":
+                    file.flush()
+                    os.fsync(file.fileno())
+
+        if self._tasks is not None:
+            for task in tasks:
+                self._tasks[task['id']] = task
+
+    def iter_tasks(self):
+        """
+        逐个读取所有归档任务，不一次性加载到内存
+        同一任务可能因中途崩溃被归档两次，读取时不去重
+        (Read every archived task one by one without loading them all; a task
+        may appear twice after an interrupted archive run, no deduplication here)
+
+        返回:
+            generator: 归档任务
+        """
+        for partition in self.partitions():
+            path = os.path.join(self.directory, partition + ".jsonl")
+            with open(path, 'r', encoding='utf-8') as file:
+                for line in file:
+                    try:
+                        yield json.loads(line)
+                    except json.JSONDecodeError:
+                        # 忽略崩溃时写了一半的行 (Skip a line half-written during a crash)
+                        continue
+
+    def get(self, task_id):
+        """
+        根据ID获取归档任务，第一次调用时加载归档
+        (Get an archived task by ID, loading the archive on first use)
+
+        参数:
+            task_id (int): 任务ID
+
+        返回:
+            dict: 归档任务，如果找不到则返回None
+        """
+        return self._load().get(task_id)
+
+    def tasks(self):
+        """
+        返回所有归档任务，按ID排序，第一次调用时加载归档
+        (Return every archived task in ID order, loading the archive on first use)
+
+        返回:
+            list: 归档任务列表
+        """
+        return [self._load()[task_id] for task_id in sorted(self._load())]
+
+    def is_loaded(self):
+        """归档是否已经加载到内存 (Whether the archive has been loaded into memory)"""
+        return self._tasks is not None
+
+    def _load(self):
+        """加载全部归档任务 (Load every archived task)"""
+        if self._tasks is None:
+            self._tasks = {task['id']: task for task in self.iter_tasks()}
+        return self._tasks
+
+
+def partition_of(task):
+    """
+    返回任务所属的归档分区，按完成时间的年月划分，旧任务没有完成时间时使用创建时间
+    (Return the archive partition of a task: the year and month it was completed,
+    or created for old tasks without a completion time)
+
+    参数:
+        task (dict): 已完成的任务
+
+    返回:
+        str: 分区名，例如 "2024-05"
+    """
+    timestamp = task.get('completed_at') or task.get('created_at') or "unknown"
+    return timestamp[:7]
+
+
+def merge_by_id(*task_lists):
+    """
+    合并多个按ID排序的任务列表，同一ID只保留第一个列表中的任务
+    (Merge task lists sorted by ID; for a repeated ID the earlier list wins)
+
+    参数:
+        *task_lists (list): 按ID排序的任务列表
+
+    返回:
+        list: 合并后的任务列表
+    """
+    return list(iter_merge_by_id(*task_lists))
+
+
+def iter_merge_by_id(*task_iterables):
+    """
+    逐个返回合并后的任务，输入可以是生成器，只在需要时才读取下一个任务
+    (Yield the merged tasks one at a time; the inputs may be generators and
+    are only advanced when the next task is needed)
+
+    参数:
+        *task_iterables (iterable): 按ID排序的任务，同一ID只保留第一个输入中的任务
+
+    返回:
+        generator: 按ID排序的任务
+    """
+    seen = set()
+    ranked = [_ranked(tasks, rank) for rank, tasks in enumerate(task_iterables)]
+    for task_id, _, task in heapq.merge(*ranked):
+        if task_id not in seen:
+            seen.add(task_id)
+            yield task
+
+
+def _ranked(tasks, rank):
+    """给每个任务加上排序键 (ID, 输入序号) (Tag each task with the sort key (id, input rank))"""
+    for task in tasks:
+        yield task['id'], rank, task
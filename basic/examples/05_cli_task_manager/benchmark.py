@@ -0,0 +1,642 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+任务管理器性能测试
+生成指定数量的模拟任务，测量不同快照格式的加载和保存时间，
+以及TaskManager各项操作的延迟分布和内存峰值。
+结果可以保存为JSON文件，用于比较两次提交之间的性能变化。
+
+用法 (Usage):
+    python benchmark.py snapshot --sizes 10000 100000 1000000
+    python benchmark.py ops --sizes 1000 10000 100000 --storage json --output before.json
+    python benchmark.py compare before.json after.json --threshold 0.2
+    python benchmark.py startup --budget-ms 150
+    python benchmark.py memory --sizes 100000 1000000
+    python benchmark.py compression --size 100000
+    python benchmark.py workspace --projects 200 --tasks 2000
+"""
+
+import io
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import datetime
+import platform
+import tempfile
+import contextlib
+import subprocess
+import tracemalloc
+
+import snapshot
+import compression
+from persistence import atomic_write
+
+PRIORITIES = ("low", "medium", "high")
+WORDS = ("写", "周报", "整理", "文档", "会议", "代码", "审查", "修复", "测试", "发布",
+         "report", "review", "deploy", "fix", "plan")
+
+
+def generate_tasks(count, seed=42):
+    """
+    生成模拟任务
+    (Generate synthetic tasks)
+
+    参数:
+        count (int): 任务数量
+        seed (int): 随机种子，保证每次生成的数据相同
+
+    返回:
+        list: 任务列表
+    """
+    rng = random.Random(seed)
+    start = datetime.datetime(2024, 1, 1)
+    tasks = []
+    for task_id in range(1, count + 1):
+        created_at = start + datetime.timedelta(minutes=rng.randrange(525600))
+        due_date = None
+        if rng.random() < 0.7:
+            due_date = (created_at + datetime.timedelta(days=rng.randrange(60))).strftime("%Y-%m-%d")
+        tasks.append({
+            "id": task_id,
+            "title": "".join(rng.choice(WORDS) for _ in range(rng.randrange(2, 6))),
+            "description": " ".join(rng.choice(WORDS) for _ in range(rng.randrange(0, 12))),
+            "created_at": created_at.strftime("%Y-%m-%d %H:%M:%S"),
+            "due_date": due_date,
+            "priority": rng.choice(PRIORITIES),
+            "completed": rng.random() < 0.4,
+        })
+    return tasks
+
+
+def timed(function, *args, **kwargs):
+    """
+    执行函数并返回 (结果, 耗时秒数)
+    (Run a function and return (result, elapsed seconds))
+    """
+    start = time.perf_counter()
+    result = function(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def percentile(sorted_values, fraction):
+    """
+    返回已排序数据的百分位数 (最近秩法)
+    (Return a percentile of sorted data, nearest-rank method)
+
+    参数:
+        sorted_values (list): 已排序的数据
+        fraction (float): 0到1之间的比例，例如0.95
+
+    返回:
+        float: 百分位数
+    """
+    rank = max(1, -(-len(sorted_values) * fraction // 1))
+    return sorted_values[int(rank) - 1]
+
+
+def summarize(samples):
+    """
+    汇总延迟样本
+    (Summarize latency samples)
+
+    参数:
+        samples (list): 每次调用的耗时，单位为秒
+
+    返回:
+        dict: 调用次数、最小值、平均值、p50、p95、p99和最大值
+    """
+    ordered = sorted(samples)
+    return {
+        "count": len(ordered),
+        "min": ordered[0],
+        "mean": sum(ordered) / len(ordered),
+        "p50": percentile(ordered, 0.50),
+        "p95": percentile(ordered, 0.95),
+        "p99": percentile(ordered, 0.99),
+        "max": ordered[-1],
+    }
+
+
+def peak_memory(function):
+    """
+    用tracemalloc测量一次调用期间分配的内存峰值
+    tracemalloc会明显拖慢执行，所以不与计时放在同一次调用里
+    (Measure the peak memory allocated during one call with tracemalloc; it
+    slows execution noticeably, so it is never combined with a timed call)
+
+    参数:
+        function (callable): 要测量的函数
+
+    返回:
+        int: 相对调用前的内存峰值，单位为字节
+    """
+    tracemalloc.start()
+    try:
+        baseline, _ = tracemalloc.get_traced_memory()
+        function()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak - baseline
+
+
+def write_task_file(storage_file, tasks, storage):
+    """
+    把模拟任务写成指定存储模式的任务文件
+    (Write synthetic tasks as a task file for a storage mode)
+
+    参数:
+        storage_file (str): 任务文件路径
+        tasks (list): 任务列表
+        storage (str): "json"、"journal"或"sqlite"
+    """
+    data = {"next_id": len(tasks) + 1, "revision": 0, "tasks": tasks}
+    atomic_write(storage_file, snapshot.dumps(data), durability="off")
+    if storage == "sqlite":
+        # 第一次打开时把JSON任务文件导入数据库 (The first open imports the JSON file into the database)
+        from task_manager import TaskManager
+        TaskManager(storage_file, storage="sqlite", durability="off").close()
+
+
+def bench_operations(sizes, storage, repeat, directory, seed=42):
+    """
+    测量TaskManager各项操作在不同数据量下的延迟分布和内存峰值
+    (Measure latency distribution and peak memory of TaskManager operations
+    at different data sizes)
+
+    参数:
+        sizes (list): 要测试的任务数量
+        storage (str): 存储模式
+        repeat (int): 每项操作的计时次数
+        directory (str): 存放测试文件的目录
+        seed (int): 随机种子
+
+    返回:
+        list: 每个 (数量, 操作) 组合的测试结果
+    """
+    from task_manager import TaskManager, print_task_list
+
+    results = []
+    for size in sizes:
+        storage_file = os.path.join(directory, f"tasks-{size}.json")
+        write_task_file(storage_file, generate_tasks(size, seed), storage)
+        manager = TaskManager(storage_file, storage=storage, durability="off")
+        rng = random.Random(seed)
+        # 删除操作每次删除不同的任务 (Every delete removes a different task)
+        doomed = iter(rng.sample(range(1, size + 1), min(size, repeat + 1)))
+
+        def load():
+            TaskManager(storage_file, storage=storage, durability="off").close()
+
+        def print_list():
+            with contextlib.redirect_stdout(io.StringIO()):
+                print_task_list(manager.get_tasks_by_status(False), "待办任务 (Pending tasks)")
+
+        operations = {
+            "load": load,
+            "add_task": lambda: manager.add_task("性能测试 benchmark", priority="high"),
+            "get_task_by_id": lambda: manager.get_task_by_id(rng.randrange(1, size + 1)),
+            "update_task": lambda: manager.update_task(rng.randrange(1, size + 1), title="已修改 updated"),
+            "delete_task": lambda: manager.delete_task(next(doomed)),
+            "get_tasks_by_status": lambda: manager.get_tasks_by_status(False),
+            "print_task_list": print_list,
+        }
+
+        for name, operation in operations.items():
+            samples = [timed(operation)[1] for _ in range(repeat)]
+            result = {"operation": name, "size": size, "storage": storage}
+            result.update(summarize(samples))
+            result["peak_bytes"] = peak_memory(operation)
+            results.append(result)
+
+        manager.close()
+    return results
+
+
+def print_operation_results(results):
+    """打印操作测试结果表格，延迟单位为毫秒 (Print the operation benchmark table, latency in ms)"""
+    print(f"{'任务数 (Tasks)':>16} {'操作 (Operation)':>22} {'p50 ms':>10} {'p95 ms':>10} "
+          f"{'max ms':>10} {'峰值 (Peak) MB':>15}")
+    for result in results:
+        print(f"{result['size']:>16} {result['operation']:>22} {result['p50'] * 1e3:>10.3f} "
+              f"{result['p95'] * 1e3:>10.3f} {result['max'] * 1e3:>10.3f} "
+              f"{result['peak_bytes'] / 1e6:>15.2f}")
+
+
+def bench_startup(repeat, task_count, directory, seed=42):
+    """
+    测量命令行子命令从启动到退出的时间，包括解释器本身的启动时间
+    (Measure the wall time of CLI subcommands from start to exit,
+    including the interpreter's own start-up)
+
+    参数:
+        repeat (int): 每条命令的运行次数
+        task_count (int): 任务文件中的任务数
+        directory (str): 存放测试文件的目录
+        seed (int): 随机种子
+
+    返回:
+        list: 每条命令的测试结果，第一条是空解释器的基准
+    """
+    storage_file = os.path.join(directory, "tasks.json")
+    write_task_file(storage_file, generate_tasks(task_count, seed), "json")
+    script = os.path.join(os.path.dirname(os.path.abspath(__file__)), "task_manager.py")
+    commands = {
+        "python -c pass": [sys.executable, "-c", "pass"],
+        "list": [sys.executable, script, "--storage-file", storage_file, "list"],
+        "add": [sys.executable, script, "--storage-file", storage_file, "add", "性能测试 benchmark"],
+        "search": [sys.executable, script, "--storage-file", storage_file, "search", "周报"],
+    }
+
+    results = []
+    for name, command in commands.items():
+        samples = []
+        for _ in range(repeat):
+            completed, elapsed = timed(subprocess.run, command, stdout=subprocess.DEVNULL)
+            completed.check_returncode()
+            samples.append(elapsed)
+        result = {"operation": name, "size": task_count, "storage": "json"}
+        result.update(summarize(samples))
+        results.append(result)
+    return results
+
+
+def print_startup_results(results, budget_ms):
+    """
+    打印启动时间表格，标记超出预算的命令
+    (Print the start-up time table, marking commands over budget)
+
+    返回:
+        bool: 所有命令的p50是否都在预算内
+    """
+    within_budget = True
+    print(f"{'命令 (Command)':>18} {'p50 ms':>10} {'p95 ms':>10} {'max ms':>10}")
+    for result in results:
+        over = result["operation"] != "python -c pass" and result["p50"] * 1e3 > budget_ms
+        within_budget = within_budget and not over
+        marker = f"  ← 超出预算 {budget_ms} ms (over budget)" if over else ""
+        print(f"{result['operation']:>18} {result['p50'] * 1e3:>10.1f} {result['p95'] * 1e3:>10.1f} "
+              f"{result['max'] * 1e3:>10.1f}{marker}")
+    return within_budget
+
+
+def bench_memory(sizes, seed=42):
+    """
+    比较字典和紧凑Task对象保存任务时占用的内存
+    任务先编码为快照再解码，使字符串和真实加载时一样是各自独立的对象
+    (Compare the memory held by tasks stored as dicts and as compact Task
+    objects; tasks go through a snapshot round trip so their strings are
+    separate objects, as after a real load)
+
+    参数:
+        sizes (list): 要测试的任务数量
+        seed (int): 随机种子
+
+    返回:
+        list: 每个 (数量, 记录类型) 组合的测试结果
+    """
+    from task_store import TaskStore
+    from task_record import Task
+
+    results = []
+    for size in sizes:
+        content = snapshot.dumps({"next_id": size + 1, "tasks": generate_tasks(size, seed)})
+        for name, record_type in (("dict", None), ("compact", Task)):
+            tracemalloc.start()
+            try:
+                store, load_time = timed(lambda: TaskStore(snapshot.loads(content)["tasks"], size + 1,
+                                                           record_type=record_type))
+                current, peak = tracemalloc.get_traced_memory()
+            finally:
+                tracemalloc.stop()
+            results.append({
+                "operation": "load",
+                "size": size,
+                "storage": name,
+                "load_seconds": load_time,
+                "bytes": current,
+                "bytes_per_task": current / size,
+                "peak_bytes": peak,
+            })
+            del store
+    return results
+
+
+def print_memory_results(results):
+    """打印内存测试结果表格 (Print the memory benchmark table)"""
+    print(f"{'任务数 (Tasks)':>16} {'记录 (Record)':>14} {'内存 (Held) MB':>15} "
+          f"{'每任务 (B/task)':>16} {'峰值 (Peak) MB':>15}")
+    for result in results:
+        print(f"{result['size']:>16} {result['storage']:>14} {result['bytes'] / 1e6:>15.1f} "
+              f"{result['bytes_per_task']:>16.0f} {result['peak_bytes'] / 1e6:>15.1f}")
+
+
+# 每种压缩算法测试的级别 (Levels tested for each codec)
+COMPRESSION_LEVELS = {"gzip": (1, 6, 9), "lzma": (0, 1, 3, 6), "zstd": (1, 3, 10, 19)}
+
+
+def bench_compression(size, directory, snapshot_format="json", seed=42):
+    """
+    比较不同压缩算法和级别的文件大小、保存时间和加载时间
+    (Compare file size, save time and load time of compression codecs and levels)
+
+    参数:
+        size (int): 任务数量
+        directory (str): 存放测试文件的目录
+        snapshot_format (str): 快照格式
+        seed (int): 随机种子
+
+    返回:
+        list: 每个 (算法, 级别) 组合的测试结果，第一条是不压缩的基准
+    """
+    data = {"next_id": size + 1, "tasks": generate_tasks(size, seed)}
+    content = snapshot.dumps(data, snapshot_format)
+    extensions = {codec: extension for extension, codec in reversed(compression.EXTENSIONS.items())}
+
+    variants = [(None, None)]
+    for codec in compression.available_codecs():
+        variants.extend((codec, level) for level in COMPRESSION_LEVELS[codec])
+
+    results = []
+    for codec, level in variants:
+        path = os.path.join(directory, "tasks." + snapshot_format + (extensions[codec] if codec else ""))
+        _, save_time = timed(atomic_write, path, content, "off", codec, level)
+        loaded, load_time = timed(lambda: snapshot.loads(compression.read_file(path)))
+        assert len(loaded["tasks"]) == size
+        results.append({
+            "operation": f"{codec}-{level}" if codec else "none",
+            "size": size,
+            "storage": snapshot_format,
+            "save_seconds": save_time,
+            "load_seconds": load_time,
+            "bytes": os.path.getsize(path),
+            "ratio": len(content) / os.path.getsize(path),
+        })
+        os.remove(path)
+    return results
+
+
+def print_compression_results(results):
+    """打印压缩测试结果表格 (Print the compression benchmark table)"""
+    print(f"{'算法-级别 (Codec)':>18} {'大小 (Size) MB':>15} {'压缩比 (Ratio)':>15} "
+          f"{'保存 (Save) s':>14} {'加载 (Load) s':>14}")
+    for result in results:
+        print(f"{result['operation']:>18} {result['bytes'] / 1e6:>15.2f} {result['ratio']:>15.1f} "
+              f"{result['save_seconds']:>14.3f} {result['load_seconds']:>14.3f}")
+
+
+def bench_workspace(projects, tasks_per_project, directory, seed=42):
+    """
+    测量工作区第一次加载 (依次、线程池、进程池) 和文件未变化时再次查询的时间
+    (Measure a workspace's cold load, serial, with threads and with
+    processes, and a repeated query over unchanged files)
+
+    参数:
+        projects (int): 项目数
+        tasks_per_project (int): 每个项目的任务数
+        directory (str): 存放测试文件的目录
+        seed (int): 随机种子
+
+    返回:
+        list: 每种加载方式和再次查询的测试结果
+    """
+    from workspace import Workspace
+
+    for project in range(projects):
+        write_task_file(os.path.join(directory, f"project{project}.json"),
+                        generate_tasks(tasks_per_project, seed + project), "json")
+
+    size = projects * tasks_per_project
+    until = "2024-03-01"
+    results = []
+    for name, executor, workers in (("serial", "thread", 1), ("thread", "thread", None), ("process", "process", None)):
+        workspace = Workspace(directory=directory, executor=executor, max_workers=workers)
+        loaded, load_time = timed(workspace.refresh)
+        assert loaded == projects
+        results.append({"operation": f"load-{name}", "size": size, "storage": "json", "seconds": load_time})
+
+    # 第一次查询建立有序视图，之后的查询只检查指纹 (The first query builds the ordered views, later ones only check fingerprints)
+    for name in ("first", "cached"):
+        _, query_time = timed(lambda: list(workspace.due(until)))
+        results.append({"operation": f"due-{name}", "size": size, "storage": "json", "seconds": query_time})
+    return results
+
+
+def print_workspace_results(results):
+    """打印工作区测试结果表格 (Print the workspace benchmark table)"""
+    print(f"{'任务数 (Tasks)':>16} {'操作 (Operation)':>20} {'时间 (Time) s':>14}")
+    for result in results:
+        print(f"{result['size']:>16} {result['operation']:>20} {result['seconds']:>14.3f}")
+
+
+def environment():
+    """
+    记录测试环境，便于比较结果时确认条件相同
+    (Record the benchmark environment so compared results can be checked for like conditions)
+
+    返回:
+        dict: Python版本、平台、git提交和时间
+    """
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                                text=True, cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except OSError:
+        commit = ""
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "commit": commit or None,
+        "timestamp": datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+    }
+
+
+def save_results(path, command, results):
+    """
+    把测试结果保存为JSON文件
+    (Save benchmark results as a JSON file)
+
+    参数:
+        path (str): 输出文件路径
+        command (str): 测试子命令
+        results (list): 测试结果
+    """
+    data = {"command": command, "environment": environment(), "results": results}
+    with open(path, 'w', encoding='utf-8') as file:
+        json.dump(data, file, ensure_ascii=False, indent=4)
+
+
+def compare_results(baseline, current, threshold=0.2):
+    """
+    比较两次操作测试的p50延迟
+    (Compare the p50 latency of two operation benchmark runs)
+
+    参数:
+        baseline (dict): 基准结果文件的内容
+        current (dict): 当前结果文件的内容
+        threshold (float): 变慢超过这个比例视为性能退化，例如0.2表示20%
+
+    返回:
+        list: (数量, 存储模式, 操作, 基准p50, 当前p50, 比值, 是否退化) 列表
+    """
+    def key(result):
+        return result["size"], result["storage"], result["operation"]
+
+    before = {key(result): result for result in baseline["results"]}
+    rows = []
+    for result in current["results"]:
+        old = before.get(key(result))
+        if old is None:
+            continue
+        ratio = result["p50"] / old["p50"] if old["p50"] else float("inf")
+        rows.append(key(result) + (old["p50"], result["p50"], ratio, ratio > 1 + threshold))
+    return rows
+
+
+def print_comparison(rows):
+    """打印比较结果表格 (Print the comparison table)"""
+    print(f"{'任务数 (Tasks)':>16} {'存储 (Storage)':>15} {'操作 (Operation)':>22} "
+          f"{'基准 (Base) ms':>15} {'当前 (Now) ms':>14} {'比值 (Ratio)':>13}")
+    for size, storage, operation, old, new, ratio, regressed in rows:
+        marker = "  ← 退化 (regression)" if regressed else ""
+        print(f"{size:>16} {storage:>15} {operation:>22} {old * 1e3:>15.3f} "
+              f"{new * 1e3:>14.3f} {ratio:>13.2f}{marker}")
+
+
+def bench_snapshot(sizes, directory):
+    """
+    比较JSON和二进制快照的保存、加载时间和文件大小
+    (Compare save time, load time and file size of JSON and binary snapshots)
+
+    参数:
+        sizes (list): 要测试的任务数量
+        directory (str): 存放测试文件的目录
+
+    返回:
+        list: 每个 (数量, 格式) 组合的测试结果
+    """
+    results = []
+    for size in sizes:
+        data = {"next_id": size + 1, "tasks": generate_tasks(size)}
+        for snapshot_format in snapshot.FORMATS:
+            path = os.path.join(directory, f"tasks-{size}.{snapshot_format}")
+
+            def save():
+                atomic_write(path, snapshot.dumps(data, snapshot_format), durability="off")
+
+            def load():
+                with open(path, 'rb') as file:
+                    return snapshot.loads(file.read())
+
+            _, save_time = timed(save)
+            loaded, load_time = timed(load)
+            assert loaded["tasks"] == data["tasks"]
+
+            results.append({
+                "size": size,
+                "format": snapshot_format,
+                "save_seconds": save_time,
+                "load_seconds": load_time,
+                "bytes": os.path.getsize(path),
+            })
+            os.remove(path)
+    return results
+
+
+def print_snapshot_results(results):
+    """打印快照测试结果表格 (Print the snapshot benchmark table)"""
+    print(f"{'任务数 (Tasks)':>16} {'格式 (Format)':>14} {'保存 (Save) s':>14} "
+          f"{'加载 (Load) s':>14} {'大小 (Size) MB':>15}")
+    for result in results:
+        print(f"{result['size']:>16} {result['format']:>14} {result['save_seconds']:>14.3f} "
+              f"{result['load_seconds']:>14.3f} {result['bytes'] / 1e6:>15.2f}")
+
+
+def main():
+    """
+    解析命令行参数并运行性能测试
+    (Parse command line arguments and run the benchmark)
+    """
+    parser = argparse.ArgumentParser(description="任务管理器性能测试 (Task manager benchmark)")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    snapshot_parser = subparsers.add_parser("snapshot", help="比较快照格式 (Compare snapshot formats)")
+    snapshot_parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000, 1000000])
+    snapshot_parser.add_argument("--output", help="把结果保存为JSON文件 (Save results as JSON)")
+
+    ops_parser = subparsers.add_parser("ops", help="测量任务操作的延迟 (Measure task operation latency)")
+    ops_parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    ops_parser.add_argument("--storage", default="json", choices=("json", "journal", "sqlite"))
+    ops_parser.add_argument("--repeat", type=int, default=20, help="每项操作的计时次数 (Timed calls per operation)")
+    ops_parser.add_argument("--output", help="把结果保存为JSON文件 (Save results as JSON)")
+
+    startup_parser = subparsers.add_parser("startup", help="测量命令行启动时间 (Measure CLI start-up time)")
+    startup_parser.add_argument("--repeat", type=int, default=20, help="每条命令的运行次数 (Runs per command)")
+    startup_parser.add_argument("--tasks", type=int, default=100, help="任务文件中的任务数 (Tasks in the task file)")
+    startup_parser.add_argument("--budget-ms", type=float, default=150.0,
+                                help="每条命令p50的预算，单位为毫秒 (p50 budget per command in ms)")
+    startup_parser.add_argument("--output", help="把结果保存为JSON文件 (Save results as JSON)")
+
+    memory_parser = subparsers.add_parser("memory", help="比较任务记录的内存占用 (Compare task record memory)")
+    memory_parser.add_argument("--sizes", type=int, nargs="+", default=[100000, 1000000])
+    memory_parser.add_argument("--output", help="把结果保存为JSON文件 (Save results as JSON)")
+
+    compression_parser = subparsers.add_parser("compression",
+                                               help="比较压缩算法和级别 (Compare compression codecs and levels)")
+    compression_parser.add_argument("--size", type=int, default=100000)
+    compression_parser.add_argument("--format", default="json", choices=snapshot.FORMATS)
+    compression_parser.add_argument("--output", help="把结果保存为JSON文件 (Save results as JSON)")
+
+    workspace_parser = subparsers.add_parser("workspace", help="测量多项目工作区 (Measure multi-project workspaces)")
+    workspace_parser.add_argument("--projects", type=int, default=200)
+    workspace_parser.add_argument("--tasks", type=int, default=2000, help="每个项目的任务数 (Tasks per project)")
+    workspace_parser.add_argument("--output", help="把结果保存为JSON文件 (Save results as JSON)")
+
+    compare_parser = subparsers.add_parser("compare", help="比较两次测试结果 (Compare two result files)")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("current")
+    compare_parser.add_argument("--threshold", type=float, default=0.2,
+                                help="视为退化的变慢比例 (Slowdown ratio counted as a regression)")
+
+    args = parser.parse_args()
+    if args.command == "compare":
+        with open(args.baseline, 'r', encoding='utf-8') as file:
+            baseline = json.load(file)
+        with open(args.current, 'r', encoding='utf-8') as file:
+            current = json.load(file)
+        rows = compare_results(baseline, current, args.threshold)
+        print_comparison(rows)
+        # 有性能退化时以非零状态退出，便于在脚本中使用 (Exit non-zero on regressions for scripting)
+        sys.exit(1 if any(row[-1] for row in rows) else 0)
+
+    within_budget = True
+    with tempfile.TemporaryDirectory() as directory:
+        if args.command == "snapshot":
+            results = bench_snapshot(args.sizes, directory)
+            print_snapshot_results(results)
+        elif args.command == "compression":
+            results = bench_compression(args.size, directory, args.format)
+            print_compression_results(results)
+        elif args.command == "workspace":
+            results = bench_workspace(args.projects, args.tasks, directory)
+            print_workspace_results(results)
+        elif args.command == "memory":
+            results = bench_memory(args.sizes)
+            print_memory_results(results)
+        elif args.command == "startup":
+            results = bench_startup(args.repeat, args.tasks, directory)
+            within_budget = print_startup_results(results, args.budget_ms)
+        else:
+            results = bench_operations(args.sizes, args.storage, args.repeat, directory)
+            print_operation_results(results)
+    if args.output:
+        save_results(args.output, args.command, results)
+    if not within_budget:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+任务文件的透明压缩 (compression)
+根据文件扩展名选择压缩算法，读写都通过流进行，不需要在内存中保存完整的压缩数据。
+
+扩展名 (Extension)    算法 (Codec)
+    .gz               gzip (标准库 standard library)
+    .xz / .lzma       lzma (标准库 standard library)
+    .zst              zstd (需要安装zstandard包 requires the zstandard package)
+"""
+
+import io
+import os
+
+# 扩展名 -> 压缩算法 (Extension -> codec)
+EXTENSIONS = {".gz": "gzip", ".xz": "lzma", ".lzma": "lzma", ".zst": "zstd"}
+
+# 每种算法的默认压缩级别 (Default compression level of each codec)
+# JSON模式下每次修改都会重写快照，lzma的默认级别取1：压缩比接近gzip 6，
+# 而lzma 6的保存时间是它的十几倍，见 benchmark.py compression
+# (JSON mode rewrites the snapshot on every change, so lzma defaults to level
+# 1: about the ratio of gzip 6, while lzma 6 saves over ten times slower;
+# see benchmark.py compression)
+DEFAULT_LEVELS = {"gzip": 6, "lzma": 1, "zstd": 3}
+
+# 每次写入压缩流的数据块大小 (Size of each chunk written to a compression stream)
+CHUNK_SIZE = 1 << 20
+
+
+def codec_for(path):
+    """
+    根据扩展名返回压缩算法
+    (Return the codec for a file extension)
+
+    参数:
+        path (str): 文件路径
+
+    返回:
+        str: "gzip"、"lzma"或"zstd"，不压缩时返回None
+    """
+    return EXTENSIONS.get(os.path.splitext(path)[1].lower())
+
+
+def strip_extension(path):
+    """
+    去掉压缩扩展名，例如 "tasks.csv.gz" -> "tasks.csv"
+    (Remove a compression extension, e.g. "tasks.csv.gz" -> "tasks.csv")
+    """
+    root, extension = os.path.splitext(path)
+    return root if extension.lower() in EXTENSIONS else path
+
+
+def available_codecs():
+    """
+    返回当前环境中可用的压缩算法
+    (Return the codecs usable in this environment)
+
+    返回:
+        list: 压缩算法列表
+    """
+    codecs = ["gzip", "lzma"]
+    try:
+        import zstandard  # noqa: F401
+    except ImportError:
+        pass
+    else:
+        codecs.append("zstd")
+    return codecs
+
+
+def wrap(file, codec, mode='rb', level=None):
+    """
+    用压缩流包装一个已打开的二进制文件，关闭压缩流不会关闭原文件
+    (Wrap an open binary file in a compression stream; closing the stream
+    leaves the underlying file open)
+
+    参数:
+        file: 以二进制模式打开的文件
+        codec (str): "gzip"、"lzma"或"zstd"
+        mode (str): "rb"读取或"wb"写入
+        level (int, optional): 压缩级别，默认为DEFAULT_LEVELS中的值
+
+    返回:
+        二进制文件对象
+
+    异常:
+        ValueError: 未知的压缩算法
+        RuntimeError: 使用zstd但没有安装zstandard包
+    """
+    if codec not in DEFAULT_LEVELS:
+        raise ValueError(f"未知的压缩算法 (Unknown compression codec): {codec}")
+    level = DEFAULT_LEVELS[codec] if level is None else level
+    writing = mode.startswith('w')
+
+    if codec == "gzip":
+        import gzip
+        # mtime=0使相同内容的压缩结果相同 (mtime=0 makes equal content compress identically)
+        return gzip.GzipFile(fileobj=file, mode=mode, compresslevel=level, mtime=0)
+    if codec == "lzma":
+        import lzma
+        return lzma.LZMAFile(file, mode, preset=level if writing else None)
+
+    try:
+        import zstandard
+    except ImportError:
+        raise RuntimeError("zstd压缩需要安装zstandard包 (zstd compression requires the zstandard package)") from None
+    if writing:
+        return zstandard.ZstdCompressor(level=level).stream_writer(file, closefd=False)
+    return zstandard.ZstdDecompressor().stream_reader(file, closefd=False)
+
+
+def write_chunks(stream, data):
+    """
+    把数据分块写入流，压缩器每次只处理一块
+    (Write data to a stream in chunks, so the compressor handles one chunk at a time)
+
+    参数:
+        stream: 二进制文件对象
+        data (bytes): 要写入的数据
+    """
+    view = memoryview(data)
+    for start in range(0, len(view), CHUNK_SIZE):
+        stream.write(view[start:start + CHUNK_SIZE])
+
+
+def read_file(path):
+    """
+    读取文件，按扩展名透明解压
+    (Read a file, transparently decompressing by extension)
+
+    参数:
+        path (str): 文件路径
+
+    返回:
+        bytes: 解压后的内容
+
+    异常:
+        ValueError: 压缩数据已损坏
+    """
+    codec = codec_for(path)
+    with open(path, 'rb') as file:
+        if codec is None:
+            return file.read()
+        with wrap(file, codec, 'rb') as stream:
+            try:
+                return stream.read()
+            except (EOFError, OSError) + _decode_errors(codec) as e:
+                raise ValueError(f"压缩文件已损坏 (Corrupted compressed file): {e}") from e
+
+
+def _decode_errors(codec):
+    """返回解压出错时压缩库抛出的异常类型 (Return the exception types a codec raises on bad data)"""
+    if codec == "lzma":
+        import lzma
+        return (lzma.LZMAError,)
+    if codec == "zstd":
+        import zstandard
+        return (zstandard.ZstdError,)
+    return ()
+
+
+def open_text(path, mode='r', level=None):
+    """
+    以文本模式打开文件，按扩展名透明压缩或解压
+    (Open a file in text mode, transparently compressing or decompressing by extension)
+
+    参数:
+        path (str): 文件路径
+        mode (str): "r"或"w"
+        level (int, optional): 写入时的压缩级别
+
+    返回:
+        文本文件对象，关闭时同时关闭底层文件
+    """
+    codec = codec_for(path)
+    if codec is None:
+        return open(path, mode, encoding='utf-8', newline='')
+
+    file = open(path, mode + 'b')
+    try:
+        stream = wrap(file, codec, mode + 'b', level)
+    except BaseException:
+        file.close()
+        raise
+    return _ClosingTextWrapper(stream, file)
+
+
+class _ClosingTextWrapper(io.TextIOWrapper):
+    """关闭时同时关闭压缩流下面的文件 (Also closes the file under the compression stream)"""
+
+    def __init__(self, stream, file):
+        super().__init__(stream, encoding='utf-8', newline='')
+        self._underlying_file = file
+
+    def close(self):
+        try:
+            super().close()
+        finally:
+            self._underlying_file.close()
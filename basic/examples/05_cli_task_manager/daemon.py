@@ -0,0 +1,278 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+任务管理器守护进程
+长期运行的进程在内存中保存TaskManager的状态，通过UNIX域套接字提供相同的操作。
+命令行每次调用只需要一次套接字往返，而不需要重新加载和解析任务文件。
+
+协议 (Protocol): 每个连接发送一行JSON请求，收到一行JSON响应
+    请求 (Request):  {"method": "add_task", "args": [...], "kwargs": {...}}
+    响应 (Response): {"ok": true, "result": ...} 或 {"ok": false, "error": "..."}
+
+用法 (Usage):
+    python daemon.py --storage-file tasks.json
+"""
+
+import os
+import json
+import socket
+import inspect
+import argparse
+import threading
+import socketserver
+
+from task_record import to_dict
+
+# 可以通过守护进程调用的TaskManager方法 (TaskManager methods callable through the daemon)
+EXPOSED_METHODS = (
+    "add_task",
+    "get_all_tasks",
+    "get_task_by_id",
+    "update_task",
+    "mark_completed",
+    "delete_task",
+    "get_tasks_by_status",
+    "get_tasks_by_priority",
+    "get_tasks_by_due_date",
+    "list_tasks",
+    "next_due",
+    "top_priority",
+    "overdue",
+    "upcoming",
+    "stats",
+    "search",
+    "archive_completed",
+)
+
+
+def default_socket_path(storage_file):
+    """
+    返回任务文件对应的默认套接字路径
+    (Return the default socket path for a task file)
+
+    参数:
+        storage_file (str): 任务文件路径
+
+    返回:
+        str: 套接字路径
+    """
+    return os.path.abspath(storage_file) + ".sock"
+
+
+class _RequestHandler(socketserver.StreamRequestHandler):
+    """处理一个客户端连接 (Handle one client connection)"""
+
+    def handle(self):
+        line = self.rfile.readline()
+        if not line:
+            return
+        try:
+            request = json.loads(line)
+            response = {"ok": True, "result": self.server.dispatch(request)}
+        except Exception as e:
+            response = {"ok": False, "error": f"{type(e).__name__}: {e}"}
+        # 紧凑模式下任务是Task对象，转换为字典后序列化 (Tasks are Task objects in compact mode)
+        self.wfile.write(json.dumps(response, ensure_ascii=False, default=to_dict).encode('utf-8') + b"\n")
+
+
+class TaskDaemon(socketserver.UnixStreamServer):
+    """
+    任务管理器守护进程
+    (Task manager daemon)
+
+    请求按顺序逐个处理，所以TaskManager不需要额外的线程同步。
+    (Requests are handled one at a time, so the TaskManager needs no extra
+    thread synchronization.)
+    """
+
+    def __init__(self, manager, socket_path):
+        """
+        在套接字上监听
+        (Listen on the socket)
+
+        参数:
+            manager (TaskManager): 常驻内存的任务管理器
+            socket_path (str): UNIX域套接字路径
+        """
+        self.manager = manager
+        self.socket_path = socket_path
+        _remove_stale_socket(socket_path)
+        super().__init__(socket_path, _RequestHandler)
+
+    def dispatch(self, request):
+        """
+        调用请求中的方法
+        (Call the method named in a request)
+
+        参数:
+            request (dict): 请求
+
+        返回:
+            方法的返回值
+        """
+        method = request.get("method")
+        if method == "shutdown":
+            # shutdown()会等待serve_forever结束，必须在其他线程中调用
+            # (shutdown() waits for serve_forever to return, so call it from another thread)
+            threading.Thread(target=self.shutdown).start()
+            return True
+        if method not in EXPOSED_METHODS:
+            raise ValueError(f"不支持的方法 (Unsupported method): {method}")
+        result = getattr(self.manager, method)(*request.get("args", []), **request.get("kwargs", {}))
+        # 生成器在这里读完，整个结果作为一个JSON数组返回 (A generator is drained here and sent back as one JSON array)
+        return list(result) if inspect.isgenerator(result) else result
+
+    def server_close(self):
+        """关闭套接字并删除套接字文件 (Close the socket and remove the socket file)"""
+        super().server_close()
+        if os.path.exists(self.socket_path):
+            os.remove(self.socket_path)
+
+
+class TaskClient:
+    """
+    守护进程的客户端，提供与TaskManager相同的方法
+    (Client of the daemon, offering the same methods as TaskManager)
+    """
+
+    def __init__(self, socket_path, timeout=5.0):
+        """
+        参数:
+            socket_path (str): 守护进程的套接字路径
+            timeout (float): 每次调用的超时时间，单位为秒
+        """
+        self.socket_path = socket_path
+        self.timeout = timeout
+
+    def call(self, method, *args, **kwargs):
+        """
+        把一次方法调用转发给守护进程
+        (Forward one method call to the daemon)
+
+        参数:
+            method (str): 方法名
+            *args, **kwargs: 方法参数
+
+        返回:
+            方法的返回值
+
+        异常:
+            RuntimeError: 守护进程中的方法调用出错
+        """
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.settimeout(self.timeout)
+            sock.connect(self.socket_path)
+            request = {"method": method, "args": list(args), "kwargs": kwargs}
+            sock.sendall(json.dumps(request, ensure_ascii=False).encode('utf-8') + b"\n")
+            with sock.makefile('rb') as reader:
+                response = json.loads(reader.readline())
+
+        if not response["ok"]:
+            raise RuntimeError(response["error"])
+        return response["result"]
+
+    def __getattr__(self, name):
+        if name not in EXPOSED_METHODS:
+            raise AttributeError(name)
+        return lambda *args, **kwargs: self.call(name, *args, **kwargs)
+
+    def shutdown(self):
+        """请求守护进程退出 (Ask the daemon to exit)"""
+        self.call("shutdown")
+
+    def close(self):
+        """客户端不持有连接，无需关闭 (The client holds no connection, nothing to close)"""
+
+
+def find_daemon(storage_file="tasks.json", socket_path=None):
+    """
+    查找正在为任务文件服务的守护进程
+    (Find a daemon serving the task file)
+
+    参数:
+        storage_file (str): 任务文件路径
+        socket_path (str, optional): 套接字路径，默认为任务文件路径加上.sock
+
+    返回:
+        TaskClient: 守护进程的客户端，没有守护进程时返回None
+    """
+    socket_path = socket_path or default_socket_path(storage_file)
+    if _is_listening(socket_path):
+        return TaskClient(socket_path)
+    return None
+
+
+def connect(storage_file="tasks.json", socket_path=None, **manager_options):
+    """
+    如果守护进程正在运行则返回客户端，否则直接打开任务文件
+    (Return a client if a daemon is running, otherwise open the task file directly)
+
+    参数:
+        storage_file (str): 任务文件路径
+        socket_path (str, optional): 套接字路径，默认为任务文件路径加上.sock
+        **manager_options: 直接打开时传给TaskManager的参数
+
+    返回:
+        TaskClient 或 TaskManager
+    """
+    client = find_daemon(storage_file, socket_path)
+    if client is not None:
+        return client
+
+    from task_manager import TaskManager
+    return TaskManager(storage_file, **manager_options)
+
+
+def _is_listening(socket_path):
+    """检查套接字上是否有守护进程在监听 (Check whether a daemon listens on the socket)"""
+    if not os.path.exists(socket_path):
+        return False
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        try:
+            sock.connect(socket_path)
+        except OSError:
+            return False
+    return True
+
+
+def _remove_stale_socket(socket_path):
+    """
+    删除上次异常退出留下的套接字文件，如果已有守护进程在运行则报错
+    (Remove a socket file left by a crashed daemon; fail if a daemon is running)
+    """
+    if _is_listening(socket_path):
+        raise RuntimeError(f"守护进程已在运行 (A daemon is already running): {socket_path}")
+    if os.path.exists(socket_path):
+        os.remove(socket_path)
+
+
+def main():
+    """
+    解析命令行参数并运行守护进程
+    (Parse command line arguments and run the daemon)
+    """
+    parser = argparse.ArgumentParser(description="任务管理器守护进程 (Task manager daemon)")
+    parser.add_argument("--storage-file", default="tasks.json", help="任务文件路径 (Task file path)")
+    parser.add_argument("--storage", default="json", choices=("json", "journal", "sqlite"),
+                        help="存储模式 (Storage mode)")
+    parser.add_argument("--socket", help="套接字路径 (Socket path)")
+    args = parser.parse_args()
+
+    from task_manager import TaskManager
+    manager = TaskManager(args.storage_file, storage=args.storage)
+    socket_path = args.socket or default_socket_path(args.storage_file)
+    server = TaskDaemon(manager, socket_path)
+    print(f"守护进程已启动 (Daemon listening on) {socket_path}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        manager.close()
+        print("守护进程已退出 (Daemon stopped)")
+
+
+if __name__ == "__main__":
+    main()
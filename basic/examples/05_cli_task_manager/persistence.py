@@ -0,0 +1,351 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+任务文件持久化工具 (persistence)
+包含原子写入函数、后台写入线程和进程间的文件锁。
+
+原子写入先写临时文件，再用os.replace重命名为目标文件，
+程序在任何时刻崩溃，目标文件要么是旧内容，要么是完整的新内容。
+后台写入线程把短时间内的多次保存请求合并成一次写入 (group commit)。
+文件锁是建议性锁 (advisory lock)，只对同样加锁的进程有效。
+"""
+
+import os
+import time
+import errno
+import threading
+import contextlib
+
+try:
+    import fcntl
+except ImportError:
+    # Windows没有fcntl，改用msvcrt (Windows has no fcntl, msvcrt is used instead)
+    fcntl = None
+    import msvcrt
+
+# 持久化级别，与SQLite的synchronous设置同名
+# (Durability levels, named after SQLite's synchronous setting)
+#   off:    只保证原子重命名，不调用fsync (atomic rename only, no fsync)
+#   normal: 重命名前对临时文件fsync (fsync the temp file before renaming)
+#   full:   再对所在目录fsync，保证重命名本身落盘 (also fsync the directory so the rename is durable)
+DURABILITY_LEVELS = ("off", "normal", "full")
+
+# 进程的umask只能通过设置来读取，而后台写入线程运行时修改它并不安全，所以在导入时读取一次
+# (The process umask can only be read by setting it, which is unsafe while the
+# background writer thread runs, so it is read once at import time)
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
+
+def atomic_write(path, data, durability="normal", compression=None, level=None):
+    """
+    原子地把数据写入文件
+    (Atomically write data to a file)
+
+    参数:
+        path (str): 目标文件路径
+        data (bytes): 要写入的数据
+        durability (str): 持久化级别，见DURABILITY_LEVELS
+        compression (str, optional): 压缩算法，数据分块流式压缩后写入临时文件
+        level (int, optional): 压缩级别
+    """
+    if durability not in DURABILITY_LEVELS:
+        raise ValueError(f"未知的持久化级别 (Unknown durability level): {durability}")
+
+    # 只读的命令行调用用不到tempfile，延迟导入以加快启动
+    # (Read-only CLI calls never need tempfile, import it lazily for a faster start)
+    import tempfile
+
+    directory = os.path.dirname(os.path.abspath(path))
+    # 临时文件必须和目标文件在同一目录，重命名才是原子的
+    # (The temp file must live in the target directory for the rename to be atomic)
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix="." + os.path.basename(path), suffix=".tmp")
+    try:
+        with os.fdopen(fd, 'wb') as file:
+            if compression is None:
+                file.write(data)
+            else:
+                import compression as codecs
+                with codecs.wrap(file, compression, 'wb', level) as stream:
+                    codecs.write_chunks(stream, data)
+            file.flush()
+            if durability != "off":
+                os.fsync(file.fileno())
+        # mkstemp创建的文件权限是0600，改为与原文件相同，新文件则按umask设置
+        # (mkstemp creates the file with mode 0600; match the existing file's mode,
+        # or apply the umask for a new file)
+        try:
+            mode = os.stat(path).st_mode & 0o7777
+        except FileNotFoundError:
+            mode = 0o666 & ~_UMASK
+        os.chmod(temp_path, mode)
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+    if durability == "full":
+        fsync_directory(directory)
+
+
+def file_state(path):
+    """
+    返回文件的 (inode, 大小, 修改时间)，用来判断文件是否被其他进程修改过
+    原子写入会替换文件，inode随之改变，即使大小和修改时间碰巧相同也能发现
+    (Return a file's (inode, size, mtime) to tell whether another process
+    changed it; an atomic write replaces the file and changes its inode, which
+    catches changes even when size and mtime happen to match)
+
+    参数:
+        path (str): 文件路径
+
+    返回:
+        tuple: (inode, 大小, 纳秒修改时间)，文件不存在时返回None
+    """
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return stat.st_ino, stat.st_size, stat.st_mtime_ns
+
+
+class FileLock:
+    """
+    进程间的建议性文件锁
+    (Advisory inter-process file lock)
+
+    锁加在单独的锁文件上而不是任务文件本身，因为原子写入会用新文件替换任务文件。
+    同一个对象可以嵌套加锁，只有最外层真正加锁和解锁；对象本身不是线程安全的，
+    调用方需要自己保证同一时间只有一个线程使用它。
+    POSIX系统使用flock，支持共享锁；Windows使用msvcrt.locking，共享锁也按排他锁处理。
+    (The lock is taken on a separate lock file rather than the task file,
+    because atomic writes replace the task file with a new one. The same object
+    can be locked in a nested way and only the outermost level really locks
+    and unlocks; it is not thread-safe, callers must ensure one thread uses it
+    at a time. POSIX systems use flock, which supports shared locks; Windows
+    uses msvcrt.locking, where a shared lock is taken as exclusive.)
+    """
+
+    def __init__(self, path):
+        """
+        参数:
+            path (str): 锁文件路径，第一次加锁时创建
+        """
+        self.path = path
+        self._file = None
+        self._depth = 0
+        self._exclusive = False
+
+    @contextlib.contextmanager
+    def shared(self):
+        """持有共享锁，多个进程可以同时读取 (Hold a shared lock; several processes may read at once)"""
+        with self._hold(exclusive=False):
+            yield self
+
+    @contextlib.contextmanager
+    def exclusive(self):
+        """持有排他锁，用于读-改-写 (Hold an exclusive lock for load-modify-save)"""
+        with self._hold(exclusive=True):
+            yield self
+
+    @contextlib.contextmanager
+    def _hold(self, exclusive):
+        """加锁，已持有锁时只在需要时把共享锁升级为排他锁 (Lock; when already held, only upgrade shared to exclusive if needed)"""
+        if self._depth == 0:
+            self._file = self._open(exclusive)
+            if self._file is not None:
+                try:
+                    self._lock(exclusive)
+                except BaseException:
+                    self._file.close()
+                    self._file = None
+                    raise
+            # Windows上的共享锁本来就是排他锁 (A shared lock on Windows is already exclusive)
+            self._exclusive = exclusive or fcntl is None
+        elif exclusive and not self._exclusive:
+            if self._file is None:
+                # 没有锁文件的只读访问要升级时必须能创建锁文件 (Upgrading an unlocked read needs the lock file)
+                self._file = open(self.path, 'a+b')
+            self._lock(True)
+            self._exclusive = True
+
+        self._depth += 1
+        try:
+            yield
+        finally:
+            self._depth -= 1
+            if self._depth == 0 and self._file is not None:
+                try:
+                    self._unlock()
+                finally:
+                    self._file.close()
+                    self._file = None
+
+    def _open(self, exclusive):
+        """
+        打开锁文件，必要时创建
+        无法创建锁文件时（例如目录只读），共享锁改为打开已有的锁文件，
+        锁文件也不存在时返回None，读取不加锁；排他锁仍然抛出异常
+        (Open the lock file, creating it if needed. When it cannot be created,
+        e.g. in a read-only directory, a shared lock opens an existing lock file
+        instead, or returns None to read without a lock if there is none; an
+        exclusive lock still raises)
+        """
+        try:
+            return open(self.path, 'a+b')
+        except OSError as error:
+            if exclusive or error.errno not in (errno.EACCES, errno.EPERM, errno.EROFS):
+                raise
+        if fcntl is None:
+            # msvcrt只能锁定可写的文件 (msvcrt can only lock a writable file)
+            return None
+        try:
+            return open(self.path, 'rb')
+        except OSError:
+            return None
+
+    def _lock(self, exclusive):
+        """阻塞直到得到锁 (Block until the lock is acquired)"""
+        if fcntl is not None:
+            fcntl.flock(self._file.fileno(), fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            return
+        self._file.seek(0)
+        while True:
+            try:
+                msvcrt.locking(self._file.fileno(), msvcrt.LK_LOCK, 1)
+                return
+            except OSError:
+                # LK_LOCK重试约10秒后放弃，继续等待 (LK_LOCK gives up after about 10 s, keep waiting)
+                continue
+
+    def _unlock(self):
+        """释放锁 (Release the lock)"""
+        if fcntl is not None:
+            fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+            return
+        self._file.seek(0)
+        msvcrt.locking(self._file.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def fsync_directory(directory):
+    """
+    对目录调用fsync，使其中的新建和重命名操作落盘
+    Windows不支持打开目录，直接跳过
+    (fsync a directory so creations and renames in it reach the disk;
+    skipped on Windows, which cannot open directories)
+
+    参数:
+        directory (str): 目录路径
+    """
+    if not hasattr(os, "O_DIRECTORY"):
+        return
+    fd = os.open(directory, os.O_RDONLY | os.O_DIRECTORY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+class BackgroundWriter:
+    """
+    后台写入线程
+    (Background writer thread)
+
+    request()只做标记并立即返回，后台线程等待一个很短的时间窗口，
+    把窗口内到达的所有保存请求合并为一次write()调用。
+    (request() only sets a flag and returns; the thread waits for a short
+    window and coalesces every request that arrived in it into one write() call.)
+    """
+
+    def __init__(self, write, window=0.05):
+        """
+        启动后台写入线程
+        (Start the background writer thread)
+
+        参数:
+            write (callable): 执行一次实际写入的函数，不接受参数
+            window (float): 合并保存请求的时间窗口，单位为秒
+        """
+        self._write = write
+        self.window = window
+        self._condition = threading.Condition()
+        self._pending = False
+        self._writing = False
+        self._closed = False
+        self.error = None
+        # 合并后实际执行的写入次数 (Number of writes actually performed)
+        self.commits = 0
+
+        self._thread = threading.Thread(target=self._run, name="task-writer", daemon=True)
+        self._thread.start()
+
+    def request(self):
+        """
+        请求一次保存，立即返回
+        (Request a save and return immediately)
+        """
+        with self._condition:
+            self._raise_error()
+            if self._closed:
+                raise RuntimeError("后台写入线程已关闭 (Background writer is closed)")
+            self._pending = True
+            self._condition.notify_all()
+
+    def flush(self):
+        """
+        等待所有已请求的保存完成
+        (Wait until every requested save has been written)
+        """
+        with self._condition:
+            while (self._pending or self._writing) and self._thread.is_alive():
+                self._condition.wait()
+            self._raise_error()
+
+    def close(self):
+        """
+        写完剩余的保存请求并停止线程
+        (Write any outstanding save and stop the thread)
+        """
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+        self._thread.join()
+        with self._condition:
+            self._raise_error()
+
+    def _raise_error(self):
+        """把后台线程中的写入错误抛给调用方 (Re-raise a write error from the thread to the caller)"""
+        if self.error is not None:
+            error, self.error = self.error, None
+            raise error
+
+    def _run(self):
+        """后台线程主循环 (Main loop of the background thread)"""
+        while True:
+            with self._condition:
+                while not self._pending and not self._closed:
+                    self._condition.wait()
+                if not self._pending and self._closed:
+                    return
+                # 等待时间窗口结束，关闭时不再等待
+                # (Wait for the window to end, unless the writer is closing)
+                deadline = time.monotonic() + self.window
+                while not self._closed:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._condition.wait(remaining)
+                self._pending = False
+                self._writing = True
+
+            try:
+                self._write()
+                self.commits += 1
+            except Exception as e:
+                self.error = e
+            finally:
+                with self._condition:
+                    self._writing = False
+                    self._condition.notify_all()
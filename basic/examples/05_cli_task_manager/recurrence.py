@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+重复任务的规则 (recurrence)
+重复任务只保存一条记录和一条规则，未来的各次日期由生成器在查询时逐个算出，从不保存。
+
+规则 (Rules):
+    daily           每天 (every day)
+    weekly          每周，与第一次截止日期同一个星期几 (every week, on the weekday of the first due date)
+    monthly         每月，与第一次截止日期同一天，保存为 monthly:<日>
+                    (every month on the day of the first due date, stored as monthly:<day>)
+    monthly:<日>    每月的这一天，月份没有这一天时取月末 (this day of every month, the last day in shorter months)
+    cron表达式      五个字段 "分 时 日 月 星期"；任务以天为单位，只使用后三个字段
+                    (five fields "minute hour day month weekday"; tasks are per day, so only the last three are used)
+"""
+
+import heapq
+import calendar
+import datetime
+import itertools
+
+# cron的五个字段：(最小值, 最大值) (The five cron fields: (minimum, maximum))
+_CRON_FIELDS = ((0, 59), (0, 23), (1, 31), (1, 12), (0, 7))
+
+# cron规则在这么多天内都没有匹配的日期时认为它永远不会匹配，例如 "0 0 30 2 *"
+# (A cron rule with no matching day in this many days never matches, e.g. "0 0 30 2 *")
+_CRON_HORIZON_DAYS = 366 * 8
+
+
+def normalize(rule, start):
+    """
+    检查规则并把它转换为保存的形式
+    (Validate a rule and convert it to its stored form)
+
+    参数:
+        rule (str): 规则，见模块说明
+        start (str): 第一次截止日期，格式为YYYY-MM-DD
+
+    返回:
+        str: 保存的规则
+
+    异常:
+        ValueError: 规则无效
+    """
+    rule = " ".join(rule.strip().lower().split())
+    if rule in ("daily", "weekly"):
+        return rule
+    if rule == "monthly":
+        return f"monthly:{_parse_date(start).day}"
+    if rule.startswith("monthly:"):
+        day = rule[len("monthly:"):]
+        if not day.isdigit() or not 1 <= int(day) <= 31:
+            raise ValueError(f"无效的每月日期 (Invalid day of month): {day}")
+        return f"monthly:{int(day)}"
+    _parse_cron(rule)
+    return rule
+
+
+def occurrences(rule, start):
+    """
+    从start开始逐个生成规则的日期，包括start当天；生成器是无限的，调用方决定取多少
+    (Generate the dates of a rule one at a time from start, inclusive; the
+    generator is infinite and the caller decides how many to take)
+
+    参数:
+        rule (str): 保存的规则，见normalize
+        start (str): 开始日期，格式为YYYY-MM-DD
+
+    返回:
+        generator: 日期字符串，格式为YYYY-MM-DD
+    """
+    day = _parse_date(start)
+    if rule == "daily":
+        step = datetime.timedelta(days=1)
+        while True:
+            yield day.isoformat()
+            day += step
+    elif rule == "weekly":
+        step = datetime.timedelta(days=7)
+        while True:
+            yield day.isoformat()
+            day += step
+    elif rule.startswith("monthly:"):
+        yield from _monthly(int(rule[len("monthly:"):]), day)
+    else:
+        yield from _cron(_parse_cron(rule), day)
+
+
+def next_occurrence(rule, previous):
+    """
+    返回规则在上一次日期之后的下一个日期
+    (Return the date of a rule that follows the previous one)
+
+    参数:
+        rule (str): 保存的规则
+        previous (str): 上一次的日期，格式为YYYY-MM-DD；weekly规则以它的星期几为准
+
+    返回:
+        str: 日期，规则不再有日期时返回None
+    """
+    return next((day for day in occurrences(rule, previous) if day > previous), None)
+
+
+def upcoming(store, until, since=None):
+    """
+    按截止日期逐个返回任务存储中截止日期不晚于until的待办任务，包括重复任务未来的各次
+    未来的各次在读取时才由生成器算出，不会保存；它们的recurrence_of是重复任务的ID
+    (Yield the pending tasks of a store due no later than until, in due date
+    order, including future occurrences of recurring tasks. Those occurrences
+    are computed by generators as they are read and never stored; their
+    recurrence_of is the ID of the recurring task)
+
+    参数:
+        store (TaskStore 或 SQLiteTaskStore): 任务存储
+        until (str): 最后一天，格式为YYYY-MM-DD
+        since (str, optional): 第一天，更早的过期任务不包括在内；为None时包括所有过期任务
+
+    返回:
+        generator: 任务，按截止日期和ID排序
+    """
+    day_after = (_parse_date(until) + datetime.timedelta(days=1)).isoformat()
+    # 已保存的待办任务，包括每个重复任务的当前这一次 (Stored pending tasks, including the current occurrence of each recurring task)
+    due = store.overdue(day_after)
+    if since is not None:
+        due = (task for task in due if task['due_date'] >= since)
+    streams = [((task['due_date'], task['id'], task) for task in due)]
+
+    for task in store.recurring():
+        # 总是从任务自己的截止日期开始生成，保持它的星期几和每月的日期，再跳过since之前的日期
+        # (Always generate from the task's own due date so its weekday and day of month
+        # are kept, then skip the dates before since)
+        dates = occurrences(task['recurrence'], task['due_date'])
+        if since is not None:
+            dates = itertools.dropwhile(lambda day: day < since, dates)
+        dates = itertools.takewhile(lambda day: day <= until, dates)
+        streams.append(_future_occurrences(task, dates))
+
+    for _, _, task in heapq.merge(*streams, key=lambda item: item[:2]):
+        yield task
+
+
+def _future_occurrences(task, dates):
+    """为重复任务的未来各次生成 (截止日期, ID, 任务) (Yield (due date, id, task) for future occurrences of a recurring task)"""
+    for day in dates:
+        if day != task['due_date']:
+            yield day, task['id'], dict(task, due_date=day, recurrence_of=task['id'])
+
+
+def _monthly(day_of_month, start):
+    """每月的某一天，短的月份取月末 (A day of every month, the last day in shorter months)"""
+    year, month = start.year, start.month
+    while True:
+        day = datetime.date(year, month, min(day_of_month, calendar.monthrange(year, month)[1]))
+        if day >= start:
+            yield day.isoformat()
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+
+
+def _cron(fields, start):
+    """逐日检查cron的日期字段 (Check the cron date fields day by day)"""
+    days, months, weekdays, days_restricted, weekdays_restricted = fields
+    step = datetime.timedelta(days=1)
+    day = start
+    misses = 0
+    while misses < _CRON_HORIZON_DAYS:
+        if day.month in months:
+            # cron的星期日是0，isoweekday的星期日是7 (cron's Sunday is 0, isoweekday's is 7)
+            weekday_match = day.isoweekday() % 7 in weekdays
+            if days_restricted and weekdays_restricted:
+                # 日和星期都有限制时满足其一即可，与cron相同 (When both are restricted either may match, as in cron)
+                match = day.day in days or weekday_match
+            else:
+                match = day.day in days and weekday_match
+            if match:
+                misses = 0
+                yield day.isoformat()
+            else:
+                misses += 1
+        else:
+            misses += 1
+        day += step
+
+
+def _parse_cron(rule):
+    """
+    解析cron表达式的日期字段
+    (Parse the date fields of a cron expression)
+
+    返回:
+        tuple: (日集合, 月集合, 星期集合, 日是否有限制, 星期是否有限制)
+
+    异常:
+        ValueError: 不是有效的规则
+    """
+    parts = rule.split()
+    if len(parts) != 5:
+        raise ValueError(f"未知的重复规则 (Unknown recurrence rule): {rule}")
+    # 分和时只做检查 (Minute and hour are only validated)
+    _, _, days, months, weekdays = (_parse_cron_field(part, low, high)
+                                    for part, (low, high) in zip(parts, _CRON_FIELDS))
+    if 7 in weekdays:
+        weekdays = (weekdays - {7}) | {0}
+    return days, months, weekdays, parts[2] != "*", parts[4] != "*"
+
+
+def _parse_cron_field(field, low, high):
+    """解析一个cron字段，支持 *、a-b、*/n、a-b/n 和逗号分隔的列表 (Parse one cron field)"""
+    values = set()
+    for item in field.split(","):
+        value_range, _, step = item.partition("/")
+        try:
+            step = int(step) if step else 1
+            if value_range == "*":
+                first, last = low, high
+            elif "-" in value_range:
+                first, last = (int(value) for value in value_range.split("-", 1))
+            else:
+                first = last = int(value_range)
+        except ValueError:
+            raise ValueError(f"无效的cron字段 (Invalid cron field): {field}") from None
+        if step < 1 or not low <= first <= last <= high:
+            raise ValueError(f"无效的cron字段 (Invalid cron field): {field}")
+        values.update(range(first, last + 1, step))
+    return frozenset(values)
+
+
+def _parse_date(value):
+    """把YYYY-MM-DD解析为date (Parse YYYY-MM-DD into a date)"""
+    try:
+        return datetime.date.fromisoformat(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"日期格式无效，应为YYYY-MM-DD (Invalid date format, expected YYYY-MM-DD): {value}") from None
@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+任务全文搜索索引 (search_index)
+为任务的标题和描述维护倒排索引，按BM25算法对结果排序。
+
+中文、日文等CJK文本没有空格分词，按相邻两个字组成的二元组 (bigram) 切分；
+英文和数字按单词切分并转为小写。
+"""
+
+import re
+import json
+import math
+import heapq
+
+# 标题中的词计两次，使标题匹配排在描述匹配之前
+# (Title terms count twice so title matches rank above description matches)
+TITLE_WEIGHT = 2
+
+# BM25参数 (BM25 parameters)
+K1 = 1.2
+B = 0.75
+
+_CJK = "぀-ヿ㐀-䶿一-鿿豈-﫿가-힯"
+_TOKEN_PATTERN = re.compile(f"[{_CJK}]+|[^\\W{_CJK}]+")
+_CJK_PATTERN = re.compile(f"[{_CJK}]")
+
+
+def tokenize(text):
+    """
+    把文本切分为搜索词
+    (Split text into search terms)
+
+    参数:
+        text (str): 要切分的文本
+
+    返回:
+        list: 搜索词列表，例如 "写周报 report" -> ["写周", "周报", "report"]
+    """
+    terms = []
+    for run in _TOKEN_PATTERN.findall((text or "").lower()):
+        if not _CJK_PATTERN.match(run):
+            terms.append(run)
+        elif len(run) == 1:
+            terms.append(run)
+        else:
+            terms.extend(run[i:i + 2] for i in range(len(run) - 1))
+    return terms
+
+
+def task_terms(task):
+    """
+    统计任务标题和描述中每个搜索词的加权次数
+    (Count the weighted occurrences of each term in a task's title and description)
+
+    参数:
+        task (dict): 任务
+
+    返回:
+        dict: 搜索词 -> 加权次数
+    """
+    counts = {}
+    for term in tokenize(task.get('title')):
+        counts[term] = counts.get(term, 0) + TITLE_WEIGHT
+    for term in tokenize(task.get('description')):
+        counts[term] = counts.get(term, 0) + 1
+    return counts
+
+
+class InvertedIndex:
+    """
+    倒排索引类
+    (Inverted index)
+
+    postings把搜索词映射到 {任务ID: 加权次数}，lengths保存每个任务的加权词数。
+    (postings maps a term to {task id: weighted count}; lengths holds the
+    weighted term count of every task.)
+    """
+
+    def __init__(self, revision=0):
+        """
+        参数:
+            revision (int): 索引对应的任务数据版本号，用于判断持久化的索引是否过期
+        """
+        self.postings = {}
+        self.lengths = {}
+        self.revision = revision
+        self._total_length = 0
+
+    def __len__(self):
+        return len(self.lengths)
+
+    def add(self, task):
+        """
+        把任务加入索引
+        (Add a task to the index)
+
+        参数:
+            task (dict): 任务
+        """
+        counts = task_terms(task)
+        for term, count in counts.items():
+            self.postings.setdefault(term, {})[task['id']] = count
+        length = sum(counts.values())
+        self.lengths[task['id']] = length
+        self._total_length += length
+
+    def remove(self, task):
+        """
+        把任务从索引中移除，需要传入任务被索引时的内容
+        (Remove a task from the index; the task must have the content it was indexed with)
+
+        参数:
+            task (dict): 任务
+        """
+        length = self.lengths.pop(task['id'], None)
+        if length is None:
+            return
+        self._total_length -= length
+        for term in task_terms(task):
+            bucket = self.postings.get(term)
+            if bucket is not None:
+                bucket.pop(task['id'], None)
+                if not bucket:
+                    del self.postings[term]
+
+    def search(self, query, limit=20):
+        """
+        搜索并按相关度排序
+        (Search and rank by relevance)
+
+        参数:
+            query (str): 查询文本
+            limit (int): 最多返回的结果数
+
+        返回:
+            list: (任务ID, 得分) 列表，得分从高到低
+        """
+        if not self.lengths:
+            return []
+
+        count = len(self.lengths)
+        average_length = self._total_length / count
+        scores = {}
+        for term in set(tokenize(query)):
+            for bucket in self._buckets(term):
+                idf = math.log(1 + (count - len(bucket) + 0.5) / (len(bucket) + 0.5))
+                for task_id, frequency in bucket.items():
+                    norm = K1 * (1 - B + B * self.lengths[task_id] / average_length)
+                    score = idf * frequency * (K1 + 1) / (frequency + norm)
+                    scores[task_id] = scores.get(task_id, 0.0) + score
+
+        return heapq.nlargest(limit, scores.items(), key=lambda item: (item[1], -item[0]))
+
+    def _buckets(self, term):
+        """
+        返回搜索词对应的倒排列表
+        单个汉字不会出现在二元组索引中，改为匹配包含它的所有二元组
+        (Return the posting lists for a term; a single CJK character is not a
+        bigram, so every bigram containing it is matched instead)
+        """
+        if term in self.postings:
+            return [self.postings[term]]
+        if len(term) == 1 and _CJK_PATTERN.match(term):
+            return [bucket for key, bucket in self.postings.items() if term in key]
+        return []
+
+    def dumps(self):
+        """
+        序列化索引
+        (Serialize the index)
+
+        返回:
+            bytes: JSON格式的索引
+        """
+        data = {"revision": self.revision, "postings": self.postings, "lengths": self.lengths}
+        return json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+    @classmethod
+    def loads(cls, content):
+        """
+        从序列化的内容恢复索引
+        (Restore an index from serialized content)
+
+        参数:
+            content (bytes): dumps()的结果
+
+        返回:
+            InvertedIndex: 索引
+        """
+        data = json.loads(content)
+        index = cls(data["revision"])
+        # JSON的键都是字符串，任务ID需要转回整数 (JSON keys are strings, convert task IDs back)
+        index.postings = {term: {int(task_id): count for task_id, count in bucket.items()}
+                          for term, bucket in data["postings"].items()}
+        index.lengths = {int(task_id): length for task_id, length in data["lengths"].items()}
+        index._total_length = sum(index.lengths.values())
+        return index
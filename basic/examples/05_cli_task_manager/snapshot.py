@@ -0,0 +1,268 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+任务快照的编码与解码 (snapshot)
+支持两种格式：可读的JSON格式和紧凑的二进制格式，读取时根据文件开头自动识别。
+
+二进制格式 (版本1) 的布局 (Binary format layout, version 1):
+    魔数 b"TSKB" (4字节) | 版本号 uint16 | 头部长度 uint32 | 头部JSON
+    然后按头部schema中的字段顺序，每个字段一个列段：段长度 uint64 | 列数据
+    最后是一个JSON段，保存schema之外的额外字段
+所有整数均为小端序 (All integers are little-endian)。
+
+任务中没有的字段读回后仍然没有 (A field a task lacks is still absent after loading)：
+所有任务都没有的字段不写入头部schema，也没有列段；部分任务没有的字段，
+头部的missing中按字段名记录这些任务的行号
+(a field no task has is left out of the header schema and gets no section;
+for a field only some tasks lack, the header's missing map lists their row numbers)
+
+字符串列段 (String column section):
+    模式 uint8 | 每行一个字节的None标记 | UTF-8文本
+    模式0：文本用"\0"分隔，解码时一次split即可 (text separated by "\0", split once on decode)
+    模式1：有字符串包含"\0"时使用，文本前是每行的int32字符长度
+          (used when a string contains "\0"; the text is preceded by int32 character lengths)
+
+按列存储使每一列都能用一次C级别的操作整体解码，
+而不需要像JSON那样逐个字符地解析。
+"""
+
+import sys
+import json
+import array
+import struct
+import itertools
+
+from task_record import to_dict
+
+MAGIC = b"TSKB"
+VERSION = 1
+FORMATS = ("json", "binary")
+
+# 任务字段的schema：字段名和列类型
+# (Schema of the task fields: field name and column type)
+#   int:  int64数组 (int64 array)
+#   str:  可为None的字符串列 (nullable string column)
+#   enum: 每个值一个字节，指向头部中的取值表 (one byte per value, indexing a table in the header)
+#   bool: 每个值一个字节 (one byte per value)
+SCHEMA = (
+    ("id", "int"),
+    ("title", "str"),
+    ("description", "str"),
+    ("created_at", "str"),
+    ("due_date", "str"),
+    ("priority", "enum"),
+    ("completed", "bool"),
+    ("completed_at", "str"),
+)
+
+_PREFIX = struct.Struct("<4sHI")
+_SECTION = struct.Struct("<Q")
+
+
+def detect_format(content):
+    """
+    根据内容开头识别快照格式
+    (Detect the snapshot format from the start of the content)
+
+    参数:
+        content (bytes): 快照内容
+
+    返回:
+        str: "binary"或"json"
+    """
+    return "binary" if content[:len(MAGIC)] == MAGIC else "json"
+
+
+def dumps(data, snapshot_format="json"):
+    """
+    把快照数据编码为字节串
+    (Encode snapshot data to bytes)
+
+    参数:
+        data (dict): 快照数据，格式为 {"next_id": ..., "revision": ..., "tasks": [...]}
+        snapshot_format (str): "json"或"binary"
+
+    返回:
+        bytes: 编码后的快照
+    """
+    if snapshot_format == "binary":
+        return _dumps_binary(data)
+    if snapshot_format == "json":
+        return json.dumps(data, ensure_ascii=False, indent=4, default=to_dict).encode('utf-8')
+    raise ValueError(f"未知的快照格式 (Unknown snapshot format): {snapshot_format}")
+
+
+def loads(content):
+    """
+    解码快照，自动识别格式
+    旧版本保存的纯任务列表会被转换为 {"tasks": [...]}
+    (Decode a snapshot, detecting its format; a bare task list saved by
+    older versions is converted to {"tasks": [...]})
+
+    参数:
+        content (bytes): 快照内容
+
+    返回:
+        dict: 快照数据
+
+    异常:
+        ValueError: 快照内容无法解码
+    """
+    if detect_format(content) == "binary":
+        try:
+            return _loads_binary(content)
+        except (struct.error, IndexError, KeyError) as e:
+            raise ValueError(f"二进制快照已损坏 (Corrupted binary snapshot): {e}") from e
+
+    data = json.loads(content)
+    if isinstance(data, list):
+        data = {"tasks": data}
+    return data
+
+
+def _dumps_binary(data):
+    """编码二进制快照 (Encode a binary snapshot)"""
+    tasks = data.get("tasks", [])
+    field_names = {name for name, _ in SCHEMA}
+    schema = []
+    missing = {}
+    enums = {}
+    sections = []
+
+    for name, column_type in SCHEMA:
+        rows = [row for row, task in enumerate(tasks) if name not in task]
+        if tasks and len(rows) == len(tasks):
+            continue
+        schema.append([name, column_type])
+        if rows:
+            missing[name] = rows
+
+        # 缺少的值用占位值编码，读取时再删除 (Missing values are encoded as placeholders and removed on load)
+        placeholder = 0 if column_type == "int" else None
+        values = [task.get(name, placeholder) for task in tasks]
+        if column_type == "int":
+            sections.append(_to_little_endian(array.array('q', values)).tobytes())
+        elif column_type == "bool":
+            sections.append(bytes(1 if value else 0 for value in values))
+        elif column_type == "enum":
+            table = list(dict.fromkeys(values))
+            if len(table) > 255:
+                raise ValueError(f"字段 {name} 的取值过多 (Too many distinct values for {name})")
+            positions = {value: i for i, value in enumerate(table)}
+            enums[name] = table
+            sections.append(bytes(positions[value] for value in values))
+        else:
+            sections.append(_encode_strings(values))
+
+    # schema之外的字段按行号保存 (Fields outside the schema are stored by row number)
+    extras = {}
+    for row, task in enumerate(tasks):
+        extra = {key: value for key, value in task.items() if key not in field_names}
+        if extra:
+            extras[row] = extra
+    sections.append(json.dumps(extras, ensure_ascii=False).encode('utf-8'))
+
+    header = json.dumps({
+        "next_id": data.get("next_id", 1),
+        "revision": data.get("revision", 0),
+        "count": len(tasks),
+        "schema": schema,
+        "missing": missing,
+        "enums": enums,
+    }, ensure_ascii=False).encode('utf-8')
+
+    parts = [_PREFIX.pack(MAGIC, VERSION, len(header)), header]
+    for section in sections:
+        parts.append(_SECTION.pack(len(section)))
+        parts.append(section)
+    return b"".join(parts)
+
+
+def _loads_binary(content):
+    """解码二进制快照 (Decode a binary snapshot)"""
+    view = memoryview(content)
+    _, version, header_length = _PREFIX.unpack_from(view, 0)
+    if version > VERSION:
+        raise ValueError(f"不支持的快照版本 (Unsupported snapshot version): {version}")
+
+    offset = _PREFIX.size
+    header = json.loads(bytes(view[offset:offset + header_length]))
+    offset += header_length
+    count = header["count"]
+
+    def next_section():
+        nonlocal offset
+        (length,) = _SECTION.unpack_from(view, offset)
+        offset += _SECTION.size
+        section = view[offset:offset + length]
+        offset += length
+        return section
+
+    names = []
+    columns = []
+    for name, column_type in header["schema"]:
+        section = next_section()
+        names.append(name)
+        if column_type == "int":
+            values = array.array('q')
+            values.frombytes(section)
+            columns.append(_to_little_endian(values).tolist())
+        elif column_type == "bool":
+            columns.append([value == 1 for value in bytes(section)])
+        elif column_type == "enum":
+            table = header["enums"][name]
+            columns.append([table[value] for value in bytes(section)])
+        else:
+            columns.append(_decode_strings(section, count))
+
+    if columns:
+        tasks = list(map(dict, map(zip, itertools.repeat(names), zip(*columns))))
+    else:
+        # 任务只有schema之外的字段 (The tasks have only fields outside the schema)
+        tasks = [{} for _ in range(count)]
+    for name, rows in header.get("missing", {}).items():
+        for row in rows:
+            del tasks[row][name]
+    for row, extra in json.loads(bytes(next_section())).items():
+        tasks[int(row)].update(extra)
+
+    return {"next_id": header["next_id"], "revision": header.get("revision", 0), "tasks": tasks}
+
+
+def _encode_strings(values):
+    """编码字符串列 (Encode a string column)"""
+    nulls = bytes(1 if value is None else 0 for value in values)
+    strings = ["" if value is None else value for value in values]
+    if not any("\0" in value for value in strings):
+        return b"\0" + nulls + "\0".join(strings).encode('utf-8')
+
+    lengths = _to_little_endian(array.array('i', map(len, strings)))
+    return b"\1" + nulls + lengths.tobytes() + "".join(strings).encode('utf-8')
+
+
+def _decode_strings(section, count):
+    """解码字符串列 (Decode a string column)"""
+    mode = section[0]
+    nulls = bytes(section[1:count + 1])
+    body = section[count + 1:]
+
+    if mode == 0:
+        strings = str(body, 'utf-8').split("\0") if count else []
+    else:
+        lengths = array.array('i')
+        lengths.frombytes(body[:count * lengths.itemsize])
+        text = str(body[count * lengths.itemsize:], 'utf-8')
+        ends = list(itertools.accumulate(_to_little_endian(lengths)))
+        strings = [text[end - length:end] for length, end in zip(lengths, ends)]
+
+    if 1 in nulls:
+        strings = [None if null else value for value, null in zip(strings, nulls)]
+    return strings
+
+
+def _to_little_endian(values):
+    """在大端序机器上转换字节序，array会原地修改 (Swap byte order on big-endian machines, in place)"""
+    if sys.byteorder == "big":
+        values.byteswap()
+    return values
@@ -0,0 +1,431 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+SQLite任务存储 (sqlite_store)
+提供与TaskStore相同的接口，但任务保存在带索引的SQLite数据库中。
+启动时不需要解析整个任务文件，每次修改也只写入一行数据。
+"""
+
+import json
+import time
+import sqlite3
+import contextlib
+
+# 任务表中有独立列的字段，其他字段以JSON形式保存在extra列中
+# (Task fields with their own column; any other field is kept as JSON in the extra column)
+COLUMNS = ("id", "title", "description", "created_at", "due_date", "priority", "completed")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tasks (
+    id INTEGER PRIMARY KEY,
+    title TEXT NOT NULL,
+    description TEXT,
+    created_at TEXT,
+    due_date TEXT,
+    priority TEXT,
+    completed INTEGER NOT NULL DEFAULT 0,
+    extra TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_tasks_completed ON tasks (completed);
+CREATE INDEX IF NOT EXISTS idx_tasks_priority ON tasks (priority);
+CREATE INDEX IF NOT EXISTS idx_tasks_due_date ON tasks (due_date);
+CREATE INDEX IF NOT EXISTS idx_tasks_pending_due ON tasks (completed, due_date, id);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value
+);
+"""
+
+
+class SQLiteTaskStore:
+    """
+    基于SQLite的任务存储类
+    (SQLite-backed task store)
+
+    接口与TaskStore一致：get、put、update、remove、find，
+    返回的任务是普通字典，修改字典本身不会写回数据库。
+    """
+
+    # 可以通过find查询的字段 (Fields that can be queried with find)
+    INDEXED_FIELDS = ("completed", "priority", "due_date")
+
+    def __init__(self, db_file):
+        """
+        打开（必要时创建）任务数据库
+        (Open, and create if needed, the task database)
+
+        参数:
+            db_file (str): SQLite数据库文件路径
+        """
+        self.db_file = db_file
+        self._in_transaction = False
+        self.connection = sqlite3.connect(db_file)
+        self._enable_wal()
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.executescript(SCHEMA)
+
+        # 没有ID计数器说明数据库是第一次打开 (No ID counter means the database is new)
+        self.is_new = self.connection.execute(
+            "SELECT 1 FROM meta WHERE key = 'next_id'").fetchone() is None
+        # 事务中使用的ID计数器和数据版本号，在事务开始时从数据库读取
+        # (ID counter and data revision used inside a transaction, read from the database when it begins)
+        self._next_id, self._revision = self._read_meta()
+
+    @property
+    def next_id(self):
+        """
+        下一个任务ID；事务外每次从数据库读取，其他连接的修改也会反映出来
+        (Next task ID; read from the database outside a transaction, so changes
+        made through other connections are seen)
+        """
+        return self._next_id if self._in_transaction else self._read_meta()[0]
+
+    @property
+    def revision(self):
+        """
+        数据版本号，每次修改时加一；与next_id一样在事务外从数据库读取
+        (Data revision, incremented by every mutation; read from the database
+        outside a transaction like next_id)
+        """
+        return self._revision if self._in_transaction else self._read_meta()[1]
+
+    @contextlib.contextmanager
+    def transaction(self):
+        """
+        把多次修改合并为一个事务，出错时全部回滚
+        事务以BEGIN IMMEDIATE开始，立即取得写锁，其他连接的写入要等它提交；
+        ID计数器和数据版本号在取得写锁后重新读取，多个进程不会分配同一个ID
+        (Group several mutations into one transaction, rolled back as a whole on
+        error. It starts with BEGIN IMMEDIATE, taking the write lock at once so
+        writers on other connections wait for the commit; the ID counter and
+        data revision are re-read under that lock, so two processes never hand
+        out the same ID)
+        """
+        if self._in_transaction:
+            # 嵌套时并入外层事务 (Nested use joins the outer transaction)
+            yield self
+            return
+
+        with self.connection:
+            self.connection.execute("BEGIN IMMEDIATE")
+            self._next_id, self._revision = self._read_meta()
+            self._in_transaction = True
+            try:
+                yield self
+            finally:
+                self._in_transaction = False
+
+    def __len__(self):
+        return self.connection.execute("SELECT COUNT(*) FROM tasks").fetchone()[0]
+
+    def __iter__(self):
+        cursor = self.connection.execute("SELECT * FROM tasks ORDER BY id")
+        for row in cursor:
+            yield self._row_to_task(row)
+
+    def __contains__(self, task_id):
+        return self.connection.execute(
+            "SELECT 1 FROM tasks WHERE id = ?", (task_id,)
+        ).fetchone() is not None
+
+    def get(self, task_id):
+        """
+        根据ID获取任务
+        (Get a task by ID)
+
+        参数:
+            task_id (int): 任务ID
+
+        返回:
+            dict: 任务，如果找不到则返回None
+        """
+        row = self.connection.execute(
+            "SELECT * FROM tasks WHERE id = ?", (task_id,)
+        ).fetchone()
+        return self._row_to_task(row) if row else None
+
+    def put(self, task):
+        """
+        添加任务
+        (Add a task)
+
+        参数:
+            task (dict): 要保存的任务
+
+        返回:
+            dict: 保存后的任务
+
+        异常:
+            sqlite3.IntegrityError: 已有相同ID的任务，原任务不会被覆盖
+        """
+        with self.transaction():
+            self._insert(task)
+            self._bump_revision()
+        return task
+
+    def import_tasks(self, tasks, next_id):
+        """
+        在一个事务中导入全部任务，用于从JSON文件迁移
+        (Import all tasks in a single transaction, used to migrate from a JSON file)
+
+        参数:
+            tasks (iterable): 要导入的任务
+            next_id (int): 导入后的ID计数器
+        """
+        with self.transaction():
+            # 其他进程可能已经先完成了导入 (Another process may have finished the import first)
+            if self.connection.execute("SELECT 1 FROM meta WHERE key = 'next_id'").fetchone() is None:
+                for task in tasks:
+                    self._insert(task)
+                self._set_next_id(next_id)
+        self.is_new = False
+
+    def update(self, task_id, fields):
+        """
+        更新任务的字段
+        (Update fields of a task)
+
+        参数:
+            task_id (int): 任务ID
+            fields (dict): 要更新的字段和值
+
+        返回:
+            dict: 更新后的任务，如果找不到则返回None
+        """
+        with self.transaction():
+            task = self.get(task_id)
+            if task is None:
+                return None
+
+            task.update(fields)
+            self._insert(task, replace=True)
+            self._bump_revision()
+        return task
+
+    def remove(self, task_id):
+        """
+        删除任务
+        (Remove a task)
+
+        参数:
+            task_id (int): 任务ID
+
+        返回:
+            dict: 被删除的任务，如果找不到则返回None
+        """
+        with self.transaction():
+            task = self.get(task_id)
+            if task is not None:
+                self.connection.execute("DELETE FROM tasks WHERE id = ?", (task_id,))
+                self._bump_revision()
+        return task
+
+    def find(self, field, value):
+        """
+        通过索引查找字段等于某个值的任务
+        (Find tasks whose field equals a value using an index)
+
+        参数:
+            field (str): 字段名，必须是INDEXED_FIELDS之一
+            value: 字段值
+
+        返回:
+            list: 符合条件的任务列表，按ID排序
+        """
+        return list(self.iter_find(field, value))
+
+    def iter_find(self, field, value):
+        """
+        与find相同，但从游标逐行读取，调用方停止读取后剩下的行不会被取出
+        (Same as find, but reads rows from the cursor one at a time; the
+        remaining rows are never fetched once the caller stops reading)
+
+        参数:
+            field (str): 字段名，必须是INDEXED_FIELDS之一
+            value: 字段值
+
+        返回:
+            generator: 符合条件的任务，按ID排序
+        """
+        if field not in self.INDEXED_FIELDS:
+            raise KeyError(field)
+
+        cursor = self.connection.execute(
+            f"SELECT * FROM tasks WHERE {field} IS ? ORDER BY id", (value,)
+        )
+        for row in cursor:
+            yield self._row_to_task(row)
+
+    def next_due(self, k):
+        """
+        返回截止日期最近的k个待办任务
+        (Return the k pending tasks with the nearest due dates)
+
+        参数:
+            k (int): 任务数
+
+        返回:
+            list: 任务列表，按截止日期排序，相同日期按ID排序
+        """
+        rows = self.connection.execute(
+            "SELECT * FROM tasks WHERE completed = 0 AND due_date IS NOT NULL "
+            "ORDER BY due_date, id LIMIT ?", (k,)
+        ).fetchall()
+        return [self._row_to_task(row) for row in rows]
+
+    def top_priority(self, k):
+        """
+        返回优先级最高的k个待办任务
+        SQLite对带LIMIT的排序只保留前k行，不会排序全部待办任务
+        (Return the k pending tasks with the highest priority; SQLite keeps only
+        the first k rows when sorting with a LIMIT instead of sorting every pending task)
+
+        参数:
+            k (int): 任务数
+
+        返回:
+            list: 任务列表，按优先级排序，相同优先级按截止日期和ID排序
+        """
+        rows = self.connection.execute(
+            "SELECT * FROM tasks WHERE completed = 0 "
+            "ORDER BY CASE priority WHEN 'high' THEN 0 WHEN 'medium' THEN 1 WHEN 'low' THEN 2 ELSE 3 END, "
+            "due_date IS NULL, due_date, id LIMIT ?", (k,)
+        ).fetchall()
+        return [self._row_to_task(row) for row in rows]
+
+    def overdue(self, today):
+        """
+        返回截止日期早于今天的待办任务
+        (Return pending tasks whose due date is before today)
+
+        参数:
+            today (str): 今天的日期，格式为YYYY-MM-DD
+
+        返回:
+            list: 任务列表，按截止日期排序
+        """
+        rows = self.connection.execute(
+            "SELECT * FROM tasks WHERE completed = 0 AND due_date < ? ORDER BY due_date, id", (today,)
+        ).fetchall()
+        return [self._row_to_task(row) for row in rows]
+
+    def recurring(self):
+        """
+        返回待办的重复任务
+        (Return the pending recurring tasks)
+
+        返回:
+            list: 任务列表，按ID排序
+        """
+        rows = self.connection.execute(
+            "SELECT * FROM tasks WHERE completed = 0 AND json_extract(extra, '$.recurrence') IS NOT NULL ORDER BY id"
+        ).fetchall()
+        return [self._row_to_task(row) for row in rows]
+
+    def count_overdue(self, today):
+        """
+        返回截止日期早于今天的待办任务数
+        (Return the number of pending tasks whose due date is before today)
+
+        参数:
+            today (str): 今天的日期，格式为YYYY-MM-DD
+
+        返回:
+            int: 任务数
+        """
+        return self.connection.execute(
+            "SELECT COUNT(*) FROM tasks WHERE completed = 0 AND due_date < ?", (today,)
+        ).fetchone()[0]
+
+    def statistics(self):
+        """
+        用聚合查询计算任务统计，数据库只返回分组后的少量行
+        (Compute task statistics with aggregate queries; the database returns
+        only a few grouped rows)
+
+        返回:
+            TaskStats: 统计计数器
+        """
+        from task_stats import TaskStats
+
+        stats = TaskStats()
+        for priority, completed, count in self.connection.execute(
+                "SELECT priority, completed, COUNT(*) FROM tasks GROUP BY priority, completed"):
+            stats.counts[(priority, bool(completed))] = count
+        # 完成时间保存在extra列中，按天分组后在Python中换算为ISO周
+        # (The completion time lives in the extra column; group by day, then map days to ISO weeks)
+        for date, count in self.connection.execute(
+                "SELECT substr(json_extract(extra, '$.completed_at'), 1, 10) AS day, COUNT(*) "
+                "FROM tasks WHERE completed = 1 AND day IS NOT NULL GROUP BY day"):
+            stats.add_completions(date, count)
+        return stats
+
+    def close(self):
+        """关闭数据库连接 (Close the database connection)"""
+        self.connection.close()
+
+    def _enable_wal(self, timeout=5.0):
+        """
+        切换到WAL模式；切换需要排他锁，且SQLite不会为它等待，
+        多个进程同时打开新数据库时可能遇到锁，稍后重试
+        (Switch to WAL mode. The switch needs an exclusive lock that SQLite does
+        not wait for, so processes opening a new database at the same time may
+        find it locked; retry shortly)
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                self.connection.execute("PRAGMA journal_mode=WAL")
+                return
+            except sqlite3.OperationalError:
+                if time.monotonic() > deadline:
+                    raise
+                time.sleep(0.01)
+
+    def _read_meta(self):
+        """从数据库读取 (ID计数器, 数据版本号) (Read (ID counter, data revision) from the database)"""
+        meta = dict(self.connection.execute("SELECT key, value FROM meta"))
+        return meta.get("next_id", 1), meta.get("revision", 0)
+
+    def _insert(self, task, replace=False):
+        """
+        在当前事务中写入一行任务；只有replace为True时才覆盖已有的同ID任务
+        (Write one task row in the current transaction; an existing task with the
+        same ID is only overwritten when replace is True)
+        """
+        extra = {key: value for key, value in task.items() if key not in COLUMNS}
+        self.connection.execute(
+            f"INSERT {'OR REPLACE ' if replace else ''}INTO tasks "
+            "(id, title, description, created_at, due_date, priority, completed, extra) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (task['id'], task['title'], task.get('description'), task.get('created_at'),
+             task.get('due_date'), task.get('priority'), int(bool(task.get('completed'))),
+             json.dumps(extra, ensure_ascii=False) if extra else None)
+        )
+        # ID计数器只增不减 (The ID counter only grows)
+        if task['id'] >= self._next_id:
+            self._set_next_id(task['id'] + 1)
+
+    def _set_next_id(self, next_id):
+        """在当前事务中保存ID计数器 (Save the ID counter in the current transaction)"""
+        self.connection.execute(
+            "INSERT OR REPLACE INTO meta (key, value) VALUES ('next_id', ?)", (next_id,)
+        )
+        self._next_id = next_id
+
+    def _bump_revision(self):
+        """在当前事务中把数据版本号加一 (Increment the data revision in the current transaction)"""
+        self._revision += 1
+        self.connection.execute(
+            "INSERT OR REPLACE INTO meta (key, value) VALUES ('revision', ?)", (self._revision,)
+        )
+
+    @staticmethod
+    def _row_to_task(row):
+        """把数据库行转换为任务字典 (Convert a database row to a task dict)"""
+        task = dict(zip(COLUMNS, row[:len(COLUMNS)]))
+        task['completed'] = bool(task['completed'])
+        if row[len(COLUMNS)]:
+            task.update(json.loads(row[len(COLUMNS)]))
+        return task
@@ -5,59 +5,743 @@
 命令行任务管理器
 一个简单的命令行界面的任务管理应用，可以添加、查看、标记完成和删除任务。
 任务存储在JSON文件中，实现了持久化存储。
+
+日志模式 (storage="journal") 下，每次修改只向日志文件追加一行JSON记录，
+日志达到一定长度后再合并 (compact) 到JSON快照中。
+(In journal mode every mutation appends a single JSON line to a journal file,
+which is folded back into the JSON snapshot once it grows long enough.)
+
+SQLite模式 (storage="sqlite") 下，任务保存在带索引的SQLite数据库中，
+第一次打开时会自动导入已有的JSON任务文件。
+(In SQLite mode tasks live in an indexed SQLite database; an existing JSON
+task file is imported automatically the first time it is opened.)
+
+快照总是先写临时文件再重命名，崩溃时不会留下写了一半的文件。
+快照可以是JSON格式或紧凑的二进制格式，加载时自动识别。
+(Snapshots are always written to a temp file and renamed into place, so a
+crash never leaves a half-written file. A snapshot is either JSON or a compact
+binary format, detected automatically on load.)
+
+完成很久的任务可以归档到按月分区的归档文件中，查询历史时才加载。
+(Tasks completed long ago can be archived into month-partitioned files,
+which are only loaded when a query needs history.)
+
+任务文件以.gz、.xz或.zst结尾时，快照在保存时流式压缩，加载时流式解压。
+(A task file ending in .gz, .xz or .zst is stream-compressed on save and
+stream-decompressed on load.)
+
+用法 (Usage):
+    python task_manager.py                           # 交互式菜单 (interactive menu)
+    python task_manager.py add "写周报" --due 2024-06-07 -p high
+    python task_manager.py list --status all         # 列出任务 (list tasks)
+    python task_manager.py list -n 50 --offset 50    # 第二页 (second page)
+    python task_manager.py add "倒垃圾" --repeat weekly # 重复任务 (recurring task)
+    python task_manager.py upcoming --days 14        # 未来两周 (next two weeks)
+    python task_manager.py done 3                    # 标记完成 (mark completed)
+    python task_manager.py rm 3                      # 删除任务 (delete a task)
+    python task_manager.py search 周报               # 搜索任务 (search tasks)
+    python task_manager.py stats --weeks 8           # 任务统计 (task statistics)
+    python task_manager.py import tasks.jsonl        # 导入任务 (import tasks)
+    python task_manager.py export tasks.csv          # 导出任务 (export tasks)
+    python task_manager.py --storage-file tasks.json.gz list
 """
 
 import os
+import sys
 import json
 import datetime
-from colorama import init, Fore, Style
+import argparse
+import itertools
+import threading
+import contextlib
+import snapshot
+import compression
+from task_store import TaskStore
+from archive import TaskArchive, merge_by_id, iter_merge_by_id
+from persistence import atomic_write, file_state, BackgroundWriter, FileLock, DURABILITY_LEVELS
+
+
+class _NoColor:
+    """不输出颜色时代替colorama的Fore和Style，所有颜色都是空字符串 (Stands in for colorama's Fore and Style when colors are off)"""
+    
+    def __getattr__(self, name):
+        return ""
+
+
+# 颜色默认关闭，enable_colors()在输出到终端时才加载colorama
+# (Colors are off by default; enable_colors() loads colorama only when writing to a terminal)
+Fore = Style = _NoColor()
+
+# 列出任务时每次格式化并写出的任务数 (Tasks formatted and written per write when listing)
+PAGE_SIZE = 50
+
+
+def enable_colors(stream=None):
+    """
+    输出到终端时加载并初始化colorama，使颜色在Windows命令行中也能正常工作
+    输出被重定向到文件或管道时不加载，也不输出颜色代码
+    (Load and initialize colorama when writing to a terminal, so colors also
+    work in the Windows command prompt; nothing is loaded and no color codes
+    are written when output is redirected to a file or pipe)
+    
+    参数:
+        stream (file, optional): 输出流，默认为sys.stdout
+        
+    返回:
+        bool: 是否启用了颜色
+    """
+    global Fore, Style
+    stream = stream or sys.stdout
+    if not stream.isatty():
+        return False
+    try:
+        import colorama
+    except ImportError:
+        return False
+    colorama.init()
+    Fore, Style = colorama.Fore, colorama.Style
+    return True
 
-# 初始化colorama，使颜色在Windows命令行中正常工作
-# (Initialize colorama for colors to work in Windows command prompt)
-init()
 
 class TaskManager:
     """任务管理器类，处理任务的添加、查看、更新和删除 (Task manager class that handles adding, viewing, updating, and deleting tasks)"""
     
-    def __init__(self, storage_file="tasks.json"):
+    def __init__(self, storage_file="tasks.json", storage="json", compact_threshold=1000,
+                 durability="normal", background_save=False, commit_window=0.05,
+                 snapshot_format=None, archive_after_days=None, compact_records=False,
+                 locking=True, compression_level=None, read_only=False):
         """
         初始化任务管理器
         (Initialize the task manager)
         
         参数:
             storage_file (str): 存储任务的JSON文件路径
+            storage (str): 存储模式，"json"每次修改重写整个文件，
+                "journal"每次修改只向日志文件追加一条记录，
+                "sqlite"把任务保存在与storage_file同名的.db数据库中
+            compact_threshold (int): 日志模式下，日志记录数达到该值时自动合并到快照
+            durability (str): 持久化级别，"off"、"normal"或"full"，
+                "full"时日志模式的每次追加也会调用fsync
+            background_save (bool): JSON模式下是否由后台线程保存，
+                时间窗口内的多次保存合并为一次写入
+            commit_window (float): 后台保存合并请求的时间窗口，单位为秒
+            snapshot_format (str): 快照格式，"json"或"binary"；
+                为None时沿用已有文件的格式，新文件使用JSON
+            archive_after_days (int, optional): 打开时自动归档完成超过该天数的任务，
+                为None时不自动归档
+            compact_records (bool): JSON和日志模式下是否用带__slots__的Task对象代替字典
+                保存任务，大量任务时可以节省内存，访问方式与字典相同
+            locking (bool): JSON和日志模式下是否用文件锁保护读-改-写，
+                使多个进程可以同时使用同一个任务文件；后台保存时不加锁
+            compression_level (int, optional): 压缩级别；storage_file以.gz、.xz或.zst结尾时
+                快照会被透明压缩，默认使用各算法的默认级别
+            read_only (bool): 只读打开，不创建锁文件，也不合并残留的日志；
+                任何修改都会抛出PermissionError。不能用于SQLite存储
         """
+        if storage not in ("json", "journal", "sqlite"):
+            raise ValueError(f"未知的存储模式 (Unknown storage mode): {storage}")
+        if durability not in DURABILITY_LEVELS:
+            raise ValueError(f"未知的持久化级别 (Unknown durability level): {durability}")
+        if snapshot_format not in (None,) + snapshot.FORMATS:
+            raise ValueError(f"未知的快照格式 (Unknown snapshot format): {snapshot_format}")
+        if read_only and (storage == "sqlite" or archive_after_days is not None):
+            raise ValueError("只读模式不支持SQLite存储和自动归档 (Read-only mode supports neither SQLite storage nor auto-archiving)")
+        
         self.storage_file = storage_file
-        self.tasks = self._load_tasks()
+        self.storage = storage
+        self.read_only = read_only
+        self.journal_file = storage_file + ".journal"
+        self.db_file = os.path.splitext(storage_file)[0] + ".db"
+        self.index_file = storage_file + ".index"
+        self.archive = TaskArchive(storage_file + ".archive")
+        self.compact_threshold = compact_threshold
+        self.durability = durability
+        self.snapshot_format = snapshot_format
+        # 按扩展名选择快照的压缩算法 (Pick the snapshot compression codec from the extension)
+        self.compression = compression.codec_for(storage_file)
+        self.compression_level = compression_level
+        self.record_type = None
+        if compact_records:
+            from task_record import Task
+            self.record_type = Task
+        self._journal_entries = 0
+        # 后台线程保存时，修改和序列化都要持有这个锁
+        # (With background saving, mutations and serialization both hold this lock)
+        self._lock = threading.RLock()
+        # 批量修改期间记录的 (修改记录, 撤销记录) 列表 (List of (record, undo record) during a batch)
+        self._batch = None
+        # 搜索索引在第一次搜索时才加载 (The search index is loaded on the first search)
+        self._search_index = None
+        self._index_saved_revision = None
+        # 进程间的文件锁，SQLite由数据库自己加锁 (Inter-process file lock; SQLite does its own locking)
+        self._file_lock = None
+        if locking and storage != "sqlite" and not read_only:
+            self._file_lock = FileLock(storage_file + ".lock")
+        # 后台保存时，从第一次未保存的修改到后台线程写完，一直持有排他锁
+        # (With background saving, the exclusive lock is held from the first
+        # unsaved change until the background writer has written it)
+        self._writer_hold = None
+        # 上次加载或保存后任务文件和日志的状态 (State of the task file and journal after the last load or save)
+        self._disk_fingerprint = None
+        self._write_depth = 0
+        self.store = self._load_tasks()
+        
+        self._writer = None
+        if background_save and storage == "json":
+            self._writer = BackgroundWriter(self._write_in_background, commit_window)
+        
+        if archive_after_days is not None:
+            self.archive_completed(archive_after_days)
+    
+    @property
+    def tasks(self):
+        """
+        所有任务的列表（兼容直接访问tasks属性的旧代码）
+        (List of all tasks, kept for code that reads the tasks attribute)
+        """
+        self._refresh()
+        return list(self.store)
     
     def _load_tasks(self):
         """
         从文件加载任务
-        (Load tasks from file)
+        快照加载完成后，会重放日志文件中的记录
+        (Load tasks from file, then replay the journal on top of the snapshot)
+        
+        返回:
+            TaskStore: 任务存储，如果文件不存在则为空
+        """
+        if self.storage == "sqlite":
+            return self._open_sqlite_store()
+        
+        # 读取只需要共享锁，多个进程可以同时加载 (Reading only needs a shared lock, so processes can load at once)
+        with self._file_lock.shared() if self._file_lock else contextlib.nullcontext():
+            self._disk_fingerprint = self._disk_state()
+            self.store = self._read_snapshot()
+            self._journal_entries = self._replay_journal()
+        
+        # JSON模式下不保留日志，把残留的日志合并到快照中；compact在排他锁下进行，
+        # 期间文件被其他进程修改过时会先重新加载
+        # (JSON mode keeps no journal, so fold any leftover journal into the
+        # snapshot; compact runs under the exclusive lock and first reloads a
+        # file another process changed in the meantime)
+        if self._journal_entries and self.storage == "json" and not self.read_only:
+            self.compact()
+        
+        return self.store
+    
+    def _disk_state(self):
+        """返回任务文件和日志的 (inode, 大小, 修改时间) (Return (inode, size, mtime) of the task file and journal)"""
+        return file_state(self.storage_file), file_state(self.journal_file)
+    
+    def _reload(self, state):
+        """
+        重新加载被其他进程修改过的任务文件，调用方必须持有文件锁
+        (Reload a task file changed by another process; the caller must hold the file lock)
+        
+        参数:
+            state (tuple): 加锁后读取的文件状态
+        """
+        self.store = self._read_snapshot()
+        self._journal_entries = self._replay_journal()
+        # 搜索索引和归档缓存可能已经过期 (The search index and archive cache may be stale)
+        self._search_index = None
+        self.archive = TaskArchive(self.archive.directory)
+        self._disk_fingerprint = state
+    
+    def _refresh(self):
+        """
+        读取前检查任务文件是否被其他进程修改过，修改过才重新解析
+        文件没有变化时只需要两次stat调用
+        (Before a read, check whether another process changed the task file and
+        re-parse it only then; an unchanged file costs just two stat calls)
+        """
+        # 后台线程还没写完时一直持有锁，文件只可能被自己修改
+        # (While the background writer still holds the lock, only this process can have changed the file)
+        if self._file_lock is None or self._write_depth or self._writer_hold is not None:
+            return
+        with self._lock:
+            if self._disk_state() == self._disk_fingerprint:
+                return
+            with self._file_lock.shared():
+                state = self._disk_state()
+                if state != self._disk_fingerprint:
+                    self._reload(state)
+    
+    @contextlib.contextmanager
+    def _exclusive(self):
+        """
+        读-改-写期间持有排他文件锁，其他进程的修改不会被覆盖
+        进入时如果文件被其他进程修改过，先重新加载；可以嵌套
+        (Hold the exclusive file lock for load-modify-save so no other
+        process's change is overwritten; on entry a file changed by another
+        process is reloaded first. May be nested)
+        
+        SQLite存储用BEGIN IMMEDIATE事务代替文件锁，事务开始时重新读取ID计数器
+        (The SQLite store uses a BEGIN IMMEDIATE transaction instead of the file
+        lock, re-reading the ID counter when it begins)
+        """
+        if self.read_only:
+            raise PermissionError(f"任务文件以只读方式打开 (Task file opened read-only): {self.storage_file}")
+        with self._lock:
+            if self.storage == "sqlite":
+                with self.store.transaction():
+                    yield
+                return
+            if self._file_lock is None:
+                yield
+                return
+            with self._file_lock.exclusive():
+                outermost = self._write_depth == 0
+                if outermost and self._writer_hold is None:
+                    state = self._disk_state()
+                    if state != self._disk_fingerprint:
+                        self._reload(state)
+                self._write_depth += 1
+                try:
+                    yield
+                finally:
+                    self._write_depth -= 1
+                    if outermost:
+                        self._disk_fingerprint = self._disk_state()
+    
+    def _read_snapshot(self):
+        """
+        读取快照，自动识别JSON或二进制格式
+        快照数据为 {"next_id": ..., "tasks": [...]}，也兼容旧版本的纯任务列表
+        (Read the snapshot, detecting JSON or binary format. The data is
+        {"next_id": ..., "tasks": [...]}; a bare task list from older versions
+        is still accepted)
+        
+        返回:
+            TaskStore: 快照中的任务，如果文件不存在则为空
+        """
+        if not os.path.exists(self.storage_file):
+            self.snapshot_format = self.snapshot_format or "json"
+            return TaskStore(record_type=self.record_type)
+        
+        try:
+            content = compression.read_file(self.storage_file)
+            data = snapshot.loads(content)
+        except (ValueError, FileNotFoundError):
+            # 如果文件格式不正确或者找不到文件，使用空的任务存储
+            # (If file format is incorrect or file not found, use an empty store)
+            self.snapshot_format = self.snapshot_format or "json"
+            return TaskStore(record_type=self.record_type)
+        
+        # 没有指定格式时沿用文件原来的格式 (Keep the file's format unless one was given)
+        self.snapshot_format = self.snapshot_format or snapshot.detect_format(content)
+        return TaskStore(data.get("tasks", []), data.get("next_id", 1), data.get("revision", 0),
+                         self.record_type)
+    
+    def _open_sqlite_store(self):
+        """
+        打开SQLite任务数据库
+        数据库第一次打开时，在一个事务中导入已有的JSON快照和日志
+        (Open the SQLite task database; on first open the existing JSON
+        snapshot and journal are imported in a single transaction)
         
         返回:
-            list: 任务列表，如果文件不存在则返回空列表
+            SQLiteTaskStore: SQLite任务存储
         """
-        if os.path.exists(self.storage_file):
+        # 只有SQLite模式才需要sqlite3，按需导入 (Only SQLite mode needs sqlite3, import on demand)
+        from sqlite_store import SQLiteTaskStore
+        
+        store = SQLiteTaskStore(self.db_file)
+        has_json = self.storage_file != self.db_file and (
+            os.path.exists(self.storage_file) or os.path.exists(self.journal_file))
+        if store.is_new and has_json:
+            # JSON文件保持不变，迁移失败时可以重新导入
+            # (The JSON files are left untouched, so a failed migration can be retried)
+            self.store = self._read_snapshot()
+            self._replay_journal()
+            store.import_tasks(self.store, self.store.next_id)
+        return store
+    
+    def _replay_journal(self):
+        """
+        将日志文件中的记录依次应用到任务列表
+        崩溃留下的不完整的最后一行会被截掉，否则下一条记录会接在它后面一起丢失
+        (Apply the records of the journal file to the task list in order. An
+        incomplete last line left by a crash is truncated away, otherwise the
+        next record would be appended to it and lost along with it)
+        
+        返回:
+            int: 成功重放的记录数
+        """
+        if not os.path.exists(self.journal_file):
+            return 0
+        
+        count = 0
+        # 最后一个完整行的结束位置 (Offset just past the last complete line)
+        end = 0
+        with open(self.journal_file, 'rb') as file:
+            for line in file:
+                if not line.endswith(b"\n"):
+                    # 程序崩溃时最后一行可能只写了一半，忽略它
+                    # (The last line may be half-written after a crash, ignore it)
+                    break
+                end += len(line)
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                self._apply_record(record)
+                self.store.revision += 1
+                count += 1
+            torn = file.tell() > end
+        
+        if torn and not self.read_only:
             try:
-                with open(self.storage_file, 'r', encoding='utf-8') as file:
-                    return json.load(file)
-            except (json.JSONDecodeError, FileNotFoundError):
-                # 如果文件格式不正确或者找不到文件，返回空列表
-                # (If file format is incorrect or file not found, return empty list)
-                return []
+                os.truncate(self.journal_file, end)
+            except OSError:
+                # 没有写权限时也无法追加，留给能写的进程处理
+                # (Without write access nothing can be appended either; leave it to a process that can write)
+                pass
+        return count
+    
+    def _apply_record(self, record):
+        """
+        把一条修改记录应用到内存中的任务存储
+        重放是幂等的，同一条记录应用两次结果不变
+        (Apply one mutation record to the in-memory task store;
+        replay is idempotent, applying a record twice gives the same result)
+        
+        参数:
+            record (dict): 修改记录，op为"add"、"update"、"delete"或"batch"
+            
+        返回:
+            dict: 修改后的任务，删除时为被删除的任务
+        """
+        op = record.get('op')
+        if op == 'batch':
+            for sub_record in record['records']:
+                self._apply_record(sub_record)
+            return None
+        
+        # 已加载搜索索引时同步更新：先移除旧内容，再加入新内容
+        # (Keep a loaded search index in sync: remove the old content, then add the new)
+        index = self._search_index
+        if index is not None:
+            old = self.store.get(record['task']['id'] if op == 'add' else record['id'])
+            if old is not None:
+                index.remove(old)
+        
+        if op == 'add':
+            task = self.store.put(record['task'])
+        elif op == 'update':
+            task = self.store.update(record['id'], record['fields'])
+        elif op == 'delete':
+            return self.store.remove(record['id'])
+        else:
+            return None
+        
+        if index is not None and task is not None:
+            index.add(task)
+        return task
+    
+    def _undo_record(self, record):
+        """
+        生成撤销一条修改记录所需的记录，必须在应用修改之前调用
+        (Build the record that undoes a mutation record; must be called before applying it)
+        
+        参数:
+            record (dict): 即将应用的修改记录
+            
+        返回:
+            dict: 撤销记录，修改不会改变任何任务时返回None
+        """
+        if record['op'] == 'add':
+            old = self.store.get(record['task']['id'])
+            if old is None:
+                return {"op": "delete", "id": record['task']['id']}
+            return {"op": "add", "task": dict(old)}
+        elif record['op'] == 'update':
+            # 旧版本保存的任务可能没有要更新的字段（例如completed_at），
+            # 因此撤销时整体恢复原来的任务，而不是只恢复这些字段
+            # (Tasks saved by older versions may lack the updated fields, e.g.
+            # completed_at, so undo restores the whole old task, not just those fields)
+            old = self.store.get(record['id'])
+            if old is None:
+                return None
+            return {"op": "add", "task": dict(old)}
         else:
-            return []
+            return {"op": "add", "task": dict(self.store.get(record['id']))}
+    
+    def _commit(self, record):
+        """
+        应用并持久化一条修改记录
+        批量修改期间只记录下来，等批量结束时统一持久化
+        (Apply and persist a mutation record; inside a batch the record is
+        only collected and persisted when the batch ends)
+        
+        参数:
+            record (dict): 修改记录
+            
+        返回:
+            dict: 修改后的任务
+        """
+        with self._lock:
+            self._index_for_update()
+            if self._batch is None:
+                with self._exclusive():
+                    task = self._apply_record(record)
+                    self._persist(record)
+                return task
+            
+            # SQLite存储由数据库事务负责回滚，不需要撤销记录
+            # (The SQLite store rolls back through its transaction, no undo record needed)
+            undo = None if self.storage == "sqlite" else self._undo_record(record)
+            task = self._apply_record(record)
+            self._batch.append((record, undo))
+            return task
+    
+    @contextlib.contextmanager
+    def batch(self):
+        """
+        批量修改上下文，期间的所有修改在退出时只写入一次
+        如果代码块抛出异常，期间的所有修改都会被回滚
+        (Batch mutation context: all changes made inside are written once on exit;
+        if the block raises, every change made inside it is rolled back)
+        
+        用法 (Usage):
+            with manager.batch():
+                for title in titles:
+                    manager.add_task(title)
+        """
+        if self._batch is not None:
+            # 嵌套的批量修改并入外层 (A nested batch joins the outer one)
+            yield self
+            return
+        
+        if self.storage == "sqlite":
+            self._batch = []
+            try:
+                with self.store.transaction():
+                    yield self
+            except BaseException:
+                # 搜索索引无法随事务回滚，丢弃后按需重建
+                # (The search index cannot follow the rollback, drop it and rebuild on demand)
+                self._search_index = None
+                raise
+            finally:
+                self._batch = None
+            self._sync_index_revision()
+            return
+        
+        with self._exclusive():
+            self._batch = []
+            next_id = self.store.next_id
+            try:
+                yield self
+            except BaseException:
+                # 按相反顺序撤销修改 (Undo the changes in reverse order)
+                with self._lock:
+                    for _, undo in reversed(self._batch):
+                        if undo is not None:
+                            self._apply_record(undo)
+                    self.store.next_id = next_id
+                raise
+            else:
+                records = [record for record, _ in self._batch]
+                if records:
+                    # 整个批量作为一行日志写入，崩溃时要么全部生效要么全部丢弃
+                    # (The whole batch is written as one journal line, so after a
+                    # crash it is either applied completely or not at all)
+                    self._persist({"op": "batch", "records": records})
+            finally:
+                self._batch = None
     
     def _save_tasks(self):
         """
-        保存任务到文件
-        (Save tasks to file)
+        保存任务到文件，启用后台保存时只提交请求并立即返回
+        (Save tasks to file; with background saving only a request is queued)
         """
-        with open(self.storage_file, 'w', encoding='utf-8') as file:
-            json.dump(self.tasks, file, ensure_ascii=False, indent=4)
+        if self._writer is None:
+            self._write_snapshot()
+            return
+        
+        # 调用方持有排他锁，这里再嵌套加一层，退出修改后锁仍然保留，由后台线程写完后释放；
+        # 否则其他进程可能在写入前修改文件，随后被这次写入覆盖
+        # (The caller holds the exclusive lock; nest one more level so the lock
+        # outlives the mutation and is released by the background writer once
+        # written. Otherwise another process could change the file before the
+        # write and have its change overwritten)
+        if self._file_lock is not None and self._writer_hold is None:
+            self._writer_hold = contextlib.ExitStack()
+            self._writer_hold.enter_context(self._file_lock.exclusive())
+        self._writer.request()
     
-    def add_task(self, title, description="", due_date=None, priority="medium"):
+    def _write_snapshot(self):
+        """
+        把任务和ID计数器原子地写入快照文件
+        (Atomically write the tasks and the ID counter to the snapshot file)
+        
+        返回:
+            int: 写入的数据版本号
+        """
+        with self._lock:
+            data = {"next_id": self.store.next_id, "revision": self.store.revision,
+                    "tasks": list(self.store)}
+            content = snapshot.dumps(data, self.snapshot_format or "json")
+        atomic_write(self.storage_file, content, self.durability, self.compression, self.compression_level)
+        return data["revision"]
+    
+    def _write_in_background(self):
+        """
+        后台线程的写入函数：写入快照，没有新的修改时释放修改时保留的排他锁
+        (Write function of the background thread: write the snapshot, then
+        release the exclusive lock kept since the mutation unless newer changes
+        are still waiting)
+        """
+        revision = None
+        try:
+            revision = self._write_snapshot()
+        finally:
+            with self._lock:
+                if self._file_lock is not None:
+                    self._disk_fingerprint = self._disk_state()
+                # 写入失败时也释放锁，错误会在下一次保存或flush时抛给调用方
+                # (Release the lock on a failed write too; the error is raised to
+                # the caller on the next save or flush)
+                if self._writer_hold is not None and revision in (None, self.store.revision):
+                    hold, self._writer_hold = self._writer_hold, None
+                    hold.close()
+    
+    def _persist(self, record):
+        """
+        持久化一次修改
+        JSON模式下重写整个文件，日志模式下只追加一行紧凑的JSON记录
+        (Persist one mutation: JSON mode rewrites the whole file,
+        journal mode appends a single compact JSON line)
+        
+        参数:
+            record (dict): 刚刚应用的修改记录
+        """
+        if self.storage == "sqlite":
+            # SQLite存储在应用修改时已经写入了数据库 (The SQLite store already wrote the change)
+            self._sync_index_revision()
+            return
+        
+        self.store.revision += 1
+        self._sync_index_revision()
+        if self.storage != "journal":
+            self._save_tasks()
+            return
+        
+        with open(self.journal_file, 'a', encoding='utf-8') as file:
+            file.write(json.dumps(record, ensure_ascii=False, separators=(',', ':')) + "\n")
+            if self.durability == "full":
+                file.flush()
+                os.fsync(file.fileno())
+        self._journal_entries += 1
+        
+        if self._journal_entries >= self.compact_threshold:
+            self.compact()
+    
+    def compact(self):
+        """
+        将日志合并到快照中，然后清空日志
+        即使在两步之间崩溃也是安全的，因为日志重放是幂等的
+        (Fold the journal into the snapshot and then clear the journal;
+        a crash between the two steps is safe because replay is idempotent)
+        """
+        if self.storage == "sqlite":
+            return
+        
+        with self._exclusive():
+            # 删除日志前快照必须已经写好，所以这里同步写入
+            # (The snapshot must be on disk before the journal is removed, so write synchronously)
+            self._write_snapshot()
+            if os.path.exists(self.journal_file):
+                os.remove(self.journal_file)
+            self._journal_entries = 0
+            self._save_search_index()
+    
+    def _sync_index_revision(self):
+        """让已加载的搜索索引记录当前的数据版本号 (Record the current data revision in a loaded search index)"""
+        if self._search_index is not None:
+            self._search_index.revision = self.store.revision
+    
+    def _index_for_update(self):
+        """
+        修改任务前，如果磁盘上已有搜索索引就先加载它，使修改同时更新索引，
+        关闭时保存的索引与数据版本号一致，下次搜索不需要重新建立
+        (Before a mutation, load the persisted search index if there is one so
+        the mutation also updates it; the index saved on close then matches the
+        data revision and the next search needs no rebuild)
+        """
+        if self._search_index is None and os.path.exists(self.index_file):
+            self._load_search_index()
+    
+    def _load_search_index(self):
+        """
+        加载搜索索引
+        持久化的索引与当前数据版本号一致时直接读取，否则重新建立
+        (Load the search index: read the persisted index if it matches the
+        current data revision, otherwise rebuild it)
+        
+        返回:
+            InvertedIndex: 搜索索引
+        """
+        if self._search_index is not None:
+            return self._search_index
+        
+        from search_index import InvertedIndex
+        
+        index = None
+        if os.path.exists(self.index_file):
+            try:
+                with open(self.index_file, 'rb') as file:
+                    index = InvertedIndex.loads(file.read())
+            except (ValueError, KeyError):
+                index = None
+        
+        if index is not None and index.revision == self.store.revision:
+            self._index_saved_revision = index.revision
+        else:
+            index = InvertedIndex(self.store.revision)
+            for task in self.store:
+                index.add(task)
+        
+        self._search_index = index
+        return index
+    
+    def _save_search_index(self):
+        """
+        保存已加载且有变化的搜索索引
+        (Save the search index if it is loaded and has changed)
+        """
+        index = self._search_index
+        if index is None or index.revision == self._index_saved_revision:
+            return
+        with self._lock:
+            content = index.dumps()
+        atomic_write(self.index_file, content, self.durability)
+        self._index_saved_revision = index.revision
+    
+    def flush(self):
+        """
+        等待后台线程完成所有保存
+        (Wait for the background writer to finish every pending save)
+        """
+        if self._writer is not None:
+            self._writer.flush()
+    
+    def close(self):
+        """
+        关闭任务管理器，写完未完成的保存并释放数据库连接等资源
+        (Close the task manager: finish pending saves and release resources
+        such as the database connection)
+        """
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+        self._save_search_index()
+        if self.storage == "sqlite":
+            self.store.close()
+    
+    def add_task(self, title, description="", due_date=None, priority="medium", recurrence=None):
         """
         添加新任务
         (Add a new task)
@@ -67,31 +751,43 @@ class TaskManager:
             description (str, optional): 任务描述
             due_date (str, optional): 截止日期，格式为YYYY-MM-DD
             priority (str, optional): 优先级，可以是"low"、"medium"或"high"
+            recurrence (str, optional): 重复规则，见recurrence模块；截止日期是第一次的日期，默认为今天
             
         返回:
             dict: 新添加的任务
+            
+        异常:
+            ValueError: 重复规则无效，或规则没有任何日期
         """
-        # 生成任务ID (Generate task ID)
-        task_id = 1
-        if self.tasks:
-            task_id = max(task['id'] for task in self.tasks) + 1
+        if recurrence:
+            import recurrence as rules
+            start = due_date or datetime.date.today().isoformat()
+            recurrence = rules.normalize(recurrence, start)
+            due_date = next(rules.occurrences(recurrence, start), None)
+            if due_date is None:
+                raise ValueError(f"重复规则没有任何日期 (Recurrence rule never matches): {recurrence}")
         
-        # 创建任务 (Create task)
-        task = {
-            "id": task_id,
-            "title": title,
-            "description": description,
-            "created_at": datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-            "due_date": due_date,
-            "priority": priority,
-            "completed": False
-        }
-        
-        # 添加任务到列表 (Add task to list)
-        self.tasks.append(task)
-        
-        # 保存任务 (Save tasks)
-        self._save_tasks()
+        with self._exclusive():
+            # 生成任务ID，计数器只增不减 (Generate task ID, the counter never goes back)
+            task_id = self.store.next_id
+            
+            # 创建任务 (Create task)
+            task = {
+                "id": task_id,
+                "title": title,
+                "description": description,
+                "created_at": datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                "due_date": due_date,
+                "priority": priority,
+                "completed": False,
+                "completed_at": None
+            }
+            # 只有重复任务才有这个字段 (Only recurring tasks have this field)
+            if recurrence:
+                task["recurrence"] = recurrence
+            
+            # 添加任务到列表并保存 (Add task to list and save)
+            self._commit({"op": "add", "task": task})
         
         return task
     
@@ -103,7 +799,10 @@ class TaskManager:
         返回:
             list: 任务列表
         """
-        return self.tasks
+        self._refresh()
+        if not self._has_archive():
+            return list(self.store)
+        return merge_by_id(sorted(self.store, key=lambda task: task['id']), self.archive.tasks())
     
     def get_task_by_id(self, task_id):
         """
@@ -116,10 +815,11 @@ class TaskManager:
         返回:
             dict: 任务，如果找不到则返回None
         """
-        for task in self.tasks:
-            if task['id'] == task_id:
-                return task
-        return None
+        self._refresh()
+        task = self.store.get(task_id)
+        if task is None and self._has_archive():
+            task = self.archive.get(task_id)
+        return task
     
     def update_task(self, task_id, **kwargs):
         """
@@ -132,19 +832,93 @@ class TaskManager:
             
         返回:
             dict: 更新后的任务，如果找不到则返回None
+            
+        已归档的任务是只读的，不能更新
+        (Archived tasks are read-only and cannot be updated)
+        
+        完成重复任务时只完成当前这一次：这一次保存为一个新的已完成任务，
+        重复任务本身的截止日期移到下一次
+        (Completing a recurring task completes only the current occurrence:
+        that occurrence is saved as a new completed task and the recurring
+        task itself moves on to the next due date)
         """
-        task = self.get_task_by_id(task_id)
-        if task:
-            # 更新提供的字段 (Update provided fields)
-            for key, value in kwargs.items():
-                if key in task:
-                    task[key] = value
+        with self._exclusive():
+            task = self.store.get(task_id)
+            if task:
+                # 只更新任务中已有的字段 (Only update fields the task already has)
+                fields = {key: value for key, value in kwargs.items() if key in task}
+                
+                if task.get('recurrence') and fields.get('completed') and not task['completed']:
+                    return self._complete_occurrence(task, fields)
+                
+                # 记录完成时间，归档时按它划分分区 (Record the completion time, used to partition the archive)
+                if 'completed' in fields:
+                    if not fields['completed']:
+                        fields['completed_at'] = None
+                    elif not task['completed']:
+                        fields['completed_at'] = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+                
+                # 更新并保存任务 (Update and save task)
+                task = self._commit({"op": "update", "id": task_id, "fields": fields})
+                
+                return task
+            return None
+    
+    def _complete_occurrence(self, task, fields):
+        """
+        完成重复任务的当前这一次，只有已完成的各次才会保存为任务
+        (Complete the current occurrence of a recurring task; only completed
+        occurrences are ever stored as tasks)
+        
+        参数:
+            task (dict): 重复任务
+            fields (dict): 要更新的字段，包括completed
             
-            # 保存任务 (Save tasks)
-            self._save_tasks()
+        返回:
+            dict: 保存下来的已完成的这一次
+        """
+        import recurrence as rules
+        
+        next_due = rules.next_occurrence(task['recurrence'], task['due_date'])
+        with self.batch():
+            if next_due is None:
+                # 规则没有更多日期，完成重复任务本身 (The rule has no more dates, complete the task itself)
+                fields['completed_at'] = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+                return self._commit({"op": "update", "id": task['id'], "fields": fields})
             
-            return task
-        return None
+            occurrence = {key: value for key, value in task.items() if key != 'recurrence'}
+            occurrence.update(fields)
+            occurrence.update({
+                "id": self.store.next_id,
+                "completed": True,
+                "completed_at": datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                "recurrence_of": task['id'],
+            })
+            occurrence = self._commit({"op": "add", "task": occurrence})
+            self._commit({"op": "update", "id": task['id'], "fields": {"due_date": next_due}})
+        return occurrence
+    
+    def upcoming(self, until, today=None):
+        """
+        按截止日期逐个返回从今天到until的待办任务，包括重复任务未来的各次
+        未来的各次在读取时才由生成器算出，不会保存；它们的recurrence_of是重复任务的ID
+        (Yield pending tasks due from today through until in due date order,
+        including future occurrences of recurring tasks. Those occurrences are
+        computed by generators as they are read and never stored; their
+        recurrence_of is the ID of the recurring task)
+        
+        参数:
+            until (str): 最后一天，格式为YYYY-MM-DD
+            today (str, optional): 今天的日期，默认为当天；更早的过期任务不包括在内
+            
+        返回:
+            generator: 任务，按截止日期和ID排序
+        """
+        import recurrence as rules
+        
+        today = today or datetime.date.today().strftime("%Y-%m-%d")
+        self._refresh()
+        yield from rules.upcoming(self.store, until, since=today)
     
     def mark_completed(self, task_id):
         """
@@ -170,12 +944,12 @@ class TaskManager:
         返回:
             bool: 如果删除成功则返回True，否则返回False
         """
-        task = self.get_task_by_id(task_id)
-        if task:
-            self.tasks.remove(task)
-            self._save_tasks()
-            return True
-        return False
+        with self._exclusive():
+            task = self.store.get(task_id)
+            if task:
+                self._commit({"op": "delete", "id": task_id})
+                return True
+            return False
     
     def get_tasks_by_status(self, completed=False):
         """
@@ -187,8 +961,67 @@ class TaskManager:
             
         返回:
             list: 符合条件的任务列表
+        
+        已完成的任务包括归档中的任务 (Completed tasks include archived ones)
         """
-        return [task for task in self.tasks if task['completed'] == completed]
+        self._refresh()
+        tasks = self.store.find('completed', completed)
+        if completed and self._has_archive():
+            tasks = merge_by_id(tasks, self.archive.tasks())
+        return tasks
+    
+    def iter_filtered(self, status="all", priority=None):
+        """
+        按状态和优先级逐个返回任务，调用方取下一个任务时才从存储中读取
+        SQLite模式下直接从游标读取；已完成的任务包括归档中的任务
+        (Yield tasks by status and priority, reading the next one from the
+        store only when the caller asks for it; in SQLite mode rows come
+        straight from a cursor. Completed tasks include archived ones)
+        
+        参数:
+            status (str): "all"、"pending"或"completed"
+            priority (str, optional): 只返回该优先级的任务
+            
+        返回:
+            generator: 任务，按ID排序
+        """
+        if status not in ("all", "pending", "completed"):
+            raise ValueError(f"未知的任务状态 (Unknown task status): {status}")
+        self._refresh()
+        if priority is not None:
+            tasks = self.store.iter_find('priority', priority)
+        elif status != "all":
+            tasks = self.store.iter_find('completed', status == "completed")
+        else:
+            tasks = iter(self.store)
+        
+        if status != "pending" and self._has_archive():
+            if priority is None and status == "all":
+                # 与get_all_tasks相同，合并前先按ID排序 (As in get_all_tasks, sort by ID before merging)
+                tasks = sorted(tasks, key=lambda task: task['id'])
+            archived = (task for task in self.archive.tasks() if priority is None or task.get('priority') == priority)
+            tasks = iter_merge_by_id(tasks, archived)
+        
+        for task in tasks:
+            if status == "all" or bool(task['completed']) == (status == "completed"):
+                yield task
+    
+    def list_tasks(self, status="all", priority=None, offset=0, limit=None):
+        """
+        返回一页任务，只从存储中读取offset+limit个任务
+        (Return one page of tasks, reading only offset+limit tasks from the store)
+        
+        参数:
+            status (str): "all"、"pending"或"completed"
+            priority (str, optional): 只返回该优先级的任务
+            offset (int): 跳过的任务数
+            limit (int, optional): 最多返回的任务数，None表示不限
+            
+        返回:
+            list: 任务列表，按ID排序
+        """
+        stop = None if limit is None else offset + limit
+        return list(itertools.islice(self.iter_filtered(status, priority), offset, stop))
     
     def get_tasks_by_priority(self, priority):
         """
@@ -201,7 +1034,231 @@ class TaskManager:
         返回:
             list: 符合条件的任务列表
         """
-        return [task for task in self.tasks if task['priority'] == priority]
+        self._refresh()
+        return self._with_archived(self.store.find('priority', priority), 'priority', priority)
+    
+    def get_tasks_by_due_date(self, due_date):
+        """
+        根据截止日期获取任务
+        (Get tasks by due date)
+        
+        参数:
+            due_date (str): 截止日期，格式为YYYY-MM-DD
+            
+        返回:
+            list: 符合条件的任务列表
+        """
+        self._refresh()
+        return self._with_archived(self.store.find('due_date', due_date), 'due_date', due_date)
+    
+    def next_due(self, k=10):
+        """
+        获取截止日期最近的k个待办任务，不对全部任务排序
+        (Get the k pending tasks with the nearest due dates, without sorting every task)
+        
+        参数:
+            k (int): 任务数
+            
+        返回:
+            list: 任务列表，按截止日期排序
+        """
+        self._refresh()
+        return self.store.next_due(k)
+    
+    def top_priority(self, k=10):
+        """
+        获取优先级最高的k个待办任务，相同优先级时截止日期近的在前
+        (Get the k pending tasks with the highest priority; nearer due dates
+        first within a priority)
+        
+        参数:
+            k (int): 任务数
+            
+        返回:
+            list: 任务列表，按优先级排序
+        """
+        self._refresh()
+        return self.store.top_priority(k)
+    
+    def overdue(self, today=None):
+        """
+        获取已过截止日期的待办任务
+        (Get pending tasks past their due date)
+        
+        参数:
+            today (str, optional): 今天的日期，格式为YYYY-MM-DD，默认为当天
+            
+        返回:
+            list: 任务列表，按截止日期排序
+        """
+        today = today or datetime.date.today().strftime("%Y-%m-%d")
+        self._refresh()
+        return self.store.overdue(today)
+    
+    def stats(self, today=None):
+        """
+        统计任务：总数、完成率、每个优先级的任务数、过期任务数和每周完成数
+        当前任务的计数器由存储维护，随每次修改增量更新；归档任务逐个流式计入，不构建列表
+        (Task statistics: totals, completion rate, per-priority counts, overdue
+        count and completions per week. Counters for current tasks are kept by
+        the store and updated on every change; archived tasks are streamed in
+        one at a time without building a list)
+        
+        参数:
+            today (str, optional): 今天的日期，格式为YYYY-MM-DD，默认为当天
+            
+        返回:
+            dict: 统计摘要，见task_stats.TaskStats.summary
+        """
+        from task_stats import TaskStats
+        
+        today = today or datetime.date.today().strftime("%Y-%m-%d")
+        self._refresh()
+        stats = TaskStats().merge(self.store.statistics())
+        for task in self._iter_archived():
+            stats.add(task)
+        return stats.summary(overdue=self.store.count_overdue(today))
+    
+    def _has_archive(self):
+        """是否存在归档 (Whether an archive exists)"""
+        return self.archive.is_loaded() or os.path.isdir(self.archive.directory)
+    
+    def _with_archived(self, tasks, field, value):
+        """
+        把字段等于某个值的归档任务合并到查询结果中
+        (Merge archived tasks whose field equals a value into a query result)
+        
+        参数:
+            tasks (list): 按ID排序的任务列表
+            field (str): 字段名
+            value: 字段值
+            
+        返回:
+            list: 合并后的任务列表
+        """
+        if not self._has_archive():
+            return tasks
+        archived = [task for task in self.archive.tasks() if task.get(field) == value]
+        return merge_by_id(tasks, archived)
+    
+    def archive_completed(self, older_than_days=30):
+        """
+        把完成超过指定天数的任务移到归档中
+        先写归档再从任务文件删除，中途崩溃时任务最多在两处各有一份，不会丢失
+        (Move tasks completed more than the given number of days ago into the
+        archive. The archive is written before the tasks are deleted, so a crash
+        in between leaves a task in both places at worst, never in neither)
+        
+        参数:
+            older_than_days (int): 完成后经过的天数
+            
+        返回:
+            int: 归档的任务数
+        """
+        cutoff = (datetime.datetime.now() - datetime.timedelta(days=older_than_days)).strftime("%Y-%m-%d %H:%M:%S")
+        with self._exclusive():
+            expired = [task for task in self.store.find('completed', True)
+                       if (task.get('completed_at') or task['created_at']) < cutoff]
+            if not expired:
+                return 0
+            
+            self.archive.append([dict(task) for task in expired], self.durability)
+            with self.batch():
+                for task in expired:
+                    self._commit({"op": "delete", "id": task['id']})
+        return len(expired)
+    
+    def search(self, query, limit=20):
+        """
+        在任务标题和描述中搜索，结果按相关度排序
+        (Search task titles and descriptions, ranked by relevance)
+        
+        参数:
+            query (str): 查询文本，中文按二元组匹配
+            limit (int): 最多返回的任务数
+            
+        返回:
+            list: 匹配的任务列表，相关度从高到低
+        """
+        self._refresh()
+        index = self._load_search_index()
+        return [self.store.get(task_id) for task_id, _ in index.search(query, limit)]
+    
+    def iter_tasks(self, include_archived=True):
+        """
+        逐个返回任务，不构建完整的任务列表
+        SQLite模式下直接从数据库游标读取；归档任务排在最后
+        (Yield tasks one at a time without building the full list; in SQLite
+        mode they come straight from a database cursor; archived tasks come last)
+        
+        参数:
+            include_archived (bool): 是否包括归档任务
+            
+        返回:
+            generator: 任务
+        """
+        self._refresh()
+        yield from self.store
+        if include_archived:
+            yield from self._iter_archived()
+    
+    def _iter_archived(self):
+        """逐个返回不在当前任务中的归档任务 (Yield archived tasks that are not among the current tasks, one at a time)"""
+        if not self._has_archive():
+            return
+        # 崩溃可能使任务同时留在任务文件和归档中，或在归档中出现两次
+        # (A crash may leave a task both in the store and the archive, or twice in the archive)
+        seen = set()
+        for task in self.archive.iter_tasks():
+            if task['id'] not in seen and task['id'] not in self.store:
+                seen.add(task['id'])
+                yield task
+    
+    def import_tasks(self, records, batch_size=1000):
+        """
+        导入任务，每batch_size条作为一次批量修改写入
+        JSON模式每次保存都要重写整个文件，按批写入的总量与任务数的平方成正比，
+        因此整个导入作为一次批量修改，结束时只写一次
+        导入的任务分配新的ID，其余字段保留，缺少的字段使用add_task的默认值
+        (Import tasks, writing every batch_size of them as one batch. JSON mode
+        rewrites the whole file on every save, so writing per batch would cost
+        bytes quadratic in the task count; there the whole import is one batch,
+        written once at the end. Imported tasks get new IDs; other fields are
+        kept, missing ones take the add_task defaults)
+        
+        参数:
+            records (iterable): 任务记录，可以是生成器，只会逐条读取
+            batch_size (int): 每个批量修改包含的任务数
+            
+        返回:
+            int: 导入的任务数
+        """
+        count = 0
+        records = iter(records)
+        # 各个批量并入外层的批量修改 (Each batch joins the outer batch)
+        with self.batch() if self.storage == "json" else contextlib.nullcontext():
+            while True:
+                added = 0
+                with self.batch():
+                    for record in itertools.islice(records, batch_size):
+                        task = {
+                            "title": record.get('title') or "",
+                            "description": record.get('description') or "",
+                            "created_at": record.get('created_at') or datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                            "due_date": record.get('due_date'),
+                            "priority": record.get('priority') or "medium",
+                            "completed": bool(record.get('completed')),
+                            "completed_at": record.get('completed_at'),
+                        }
+                        # 保留额外字段 (Keep extra fields)
+                        for key, value in record.items():
+                            task.setdefault(key, value)
+                        task['id'] = self.store.next_id
+                        self._commit({"op": "add", "task": task})
+                        added += 1
+                count += added
+                if added < batch_size:
+                    return count
 
 
 def print_task(task):
@@ -232,39 +1289,85 @@ def print_task(task):
     # 如果有截止日期，则打印 (Print due date if available)
     if task['due_date']:
         print(f"截止日期 (Due date): {task['due_date']}")
+    if task.get('recurrence'):
+        print(f"重复 (Repeats): {task['recurrence']}")
         
     print(f"优先级 (Priority): {priority_color}{task['priority']}{Style.RESET_ALL}")
     print(f"状态 (Status): {status_color}{status_text} ({status_text_en}){Style.RESET_ALL}")
 
 
-def print_task_list(tasks, title):
+def print_task_list(tasks, title, stream=None, show_due=False):
     """
     打印任务列表
-    (Print task list)
+    任务可以是生成器：每次只取一页任务格式化，整页拼成一个字符串后一次写出，
+    而不是每行调用一次print
+    (Print task list. The tasks may be a generator: one page at a time is
+    formatted and written with a single write call instead of one print per line)
     
     参数:
-        tasks (list): 任务列表
+        tasks (iterable): 任务，可以是生成器
         title (str): 列表标题
+        stream (file, optional): 输出流，默认为sys.stdout
+        show_due (bool): 是否在每行前显示截止日期
+        
+    返回:
+        int: 打印的任务数
+    """
+    stream = stream or sys.stdout
+    # 根据任务优先级设置颜色，每次调用只查一次 (Color by task priority, looked up once per call)
+    priority_colors = {
+        "high": Fore.RED,
+        "medium": Fore.YELLOW,
+        "low": Fore.GREEN
+    }
+    tasks = iter(tasks)
+    lines = [f"\n{Fore.CYAN}{title}{Style.RESET_ALL}"]
+    count = 0
+    while True:
+        page = list(itertools.islice(tasks, PAGE_SIZE))
+        for task in page:
+            # 任务简要信息，带状态标记 (Task summary with a status marker)
+            status_marker = "✓" if task['completed'] else "✗"
+            priority_color = priority_colors.get(task['priority'], Fore.WHITE)
+            due = f"{task['due_date'] or '':<10}  " if show_due else ""
+            lines.append(f"{priority_color}{due}[{status_marker}] #{task['id']} - {task['title']}{Style.RESET_ALL}")
+        count += len(page)
+        if count == 0:
+            lines.append("没有任务 (No tasks)")
+        if lines:
+            stream.write("\n".join(lines) + "\n")
+            lines = []
+        if len(page) < PAGE_SIZE:
+            break
+    stream.flush()
+    return count
+
+
+def page_task_list(task_manager, title, status="all", priority=None, page_size=None):
     """
-    if not tasks:
-        print(f"\n{Fore.CYAN}{title}{Style.RESET_ALL}")
-        print("没有任务 (No tasks)")
-        return
+    在交互式菜单中分页显示任务，每页单独从任务管理器读取，用户翻页时才读取下一页
+    (Show tasks page by page in the interactive menu; each page is fetched
+    separately and only when the user asks for it)
     
-    print(f"\n{Fore.CYAN}{title}{Style.RESET_ALL}")
-    for task in tasks:
-        # 根据任务优先级设置颜色 (Set color based on task priority)
-        priority_color = {
-            "high": Fore.RED,
-            "medium": Fore.YELLOW,
-            "low": Fore.GREEN
-        }.get(task['priority'], Fore.WHITE)
-        
-        # 设置状态标记 (Set status marker)
-        status_marker = "✓" if task['completed'] else "✗"
-        
-        # 打印任务简要信息 (Print task summary)
-        print(f"{priority_color}[{status_marker}] #{task['id']} - {task['title']}{Style.RESET_ALL}")
+    参数:
+        task_manager (TaskManager 或 TaskClient): 任务管理器
+        title (str): 列表标题
+        status (str): "all"、"pending"或"completed"
+        priority (str, optional): 只显示该优先级的任务
+        page_size (int, optional): 每页的任务数，默认为PAGE_SIZE
+    """
+    page_size = page_size or PAGE_SIZE
+    offset = 0
+    while True:
+        # 多取一个任务，用来判断是否还有下一页 (Fetch one extra task to tell whether another page exists)
+        tasks = task_manager.list_tasks(status, priority, offset, page_size + 1)
+        page_title = title if offset == 0 else f"{title} ({offset + 1}-{offset + min(len(tasks), page_size)})"
+        print_task_list(tasks[:page_size], page_title)
+        if len(tasks) <= page_size:
+            return
+        offset += page_size
+        if input("按回车键查看下一页，输入q返回 (Press Enter for the next page, q to return): ").strip().lower() == "q":
+            return
 
 
 def display_menu():
@@ -315,13 +1418,409 @@ def get_task_input():
     return title, description, due_date, priority
 
 
-def main():
+def open_task_manager(storage_file="tasks.json", **manager_options):
+    """
+    打开任务管理器：如果有守护进程在运行，返回转发请求的客户端，
+    否则直接读取任务文件
+    (Open the task manager: a client forwarding to the daemon if one is
+    running, otherwise direct access to the task file)
+    
+    参数:
+        storage_file (str): 任务文件路径
+        **manager_options: 直接打开时传给TaskManager的参数
+        
+    返回:
+        TaskClient 或 TaskManager
+    """
+    # 没有套接字文件时不可能有守护进程，跳过导入socket等模块
+    # (Without a socket file there can be no daemon, so skip importing socket and friends)
+    if not os.path.exists(os.path.abspath(storage_file) + ".sock"):
+        return TaskManager(storage_file, **manager_options)
+    
+    try:
+        import daemon
+    except (ImportError, AttributeError):
+        # 当前平台不支持UNIX域套接字 (UNIX domain sockets are unavailable on this platform)
+        return TaskManager(storage_file, **manager_options)
+    
+    client = daemon.find_daemon(storage_file)
+    return client if client is not None else TaskManager(storage_file, **manager_options)
+
+
+def add_command(task_manager, args):
+    """
+    添加任务并打印任务详情
+    (Add a task and print its details)
+    
+    参数:
+        task_manager (TaskManager): 任务管理器
+        args (argparse.Namespace): 命令行参数
+        
+    返回:
+        int: 退出状态
+    """
+    if args.due:
+        try:
+            datetime.datetime.strptime(args.due, "%Y-%m-%d")
+        except ValueError:
+            print("日期格式无效，应为YYYY-MM-DD (Invalid date format, expected YYYY-MM-DD)", file=sys.stderr)
+            return 2
+    try:
+        task = task_manager.add_task(args.title, args.description, args.due, args.priority, args.repeat)
+    except ValueError as e:
+        # 重复规则无效 (Invalid recurrence rule)
+        print(e, file=sys.stderr)
+        return 2
+    print_task(task)
+    return 0
+
+
+def list_command(task_manager, args):
+    """
+    按状态或优先级列出任务
+    (List tasks by status or priority)
+    
+    参数:
+        task_manager (TaskManager): 任务管理器
+        args (argparse.Namespace): 命令行参数
+        
+    返回:
+        int: 退出状态
+    """
+    offset = max(args.offset, 0)
+    # 多取一个任务，用来判断是否还有下一页 (Fetch one extra task to tell whether there is more)
+    limit = None if args.limit is None else args.limit + 1
+    if args.sort:
+        # 有序视图只取前offset+limit个 (Take only the first offset+limit tasks of an ordered view)
+        k = offset + (limit or 10)
+        tasks = task_manager.next_due(k) if args.sort == "due" else task_manager.top_priority(k)
+        tasks = tasks[offset:]
+        title = ("即将到期的任务 (Next Due Tasks)" if args.sort == "due"
+                 else "优先级最高的任务 (Top Priority Tasks)")
+    elif args.status == "overdue":
+        # 过期索引不按优先级区分，在结果上再按优先级过滤 (The overdue index ignores priority, filter its results)
+        overdue = (task for task in task_manager.overdue()
+                   if args.priority is None or task.get('priority') == args.priority)
+        tasks = list(itertools.islice(overdue, offset, None if limit is None else offset + limit))
+        if args.priority:
+            title = (f"{args.priority.capitalize()}优先级的已过期任务 "
+                     f"({args.priority.capitalize()} Priority Overdue Tasks)")
+        else:
+            title = "已过期任务 (Overdue Tasks)"
+    else:
+        tasks = task_manager.list_tasks(args.status, args.priority, offset, limit)
+        if args.priority:
+            title = f"{args.priority.capitalize()}优先级任务 ({args.priority.capitalize()} Priority Tasks)"
+        else:
+            title = {
+                "all": "所有任务 (All Tasks)",
+                "completed": "已完成任务 (Completed Tasks)",
+                "pending": "待办任务 (Pending Tasks)",
+            }[args.status]
+    
+    more = limit is not None and len(tasks) == limit
+    print_task_list(tasks[:args.limit], title)
+    if more:
+        next_offset = offset + args.limit
+        print(f"还有更多任务，使用 --offset {next_offset} 查看下一页 "
+              f"(More tasks available, use --offset {next_offset} for the next page)")
+    return 0
+
+
+def done_command(task_manager, args):
+    """
+    把任务标记为已完成
+    (Mark a task as completed)
+    
+    参数:
+        task_manager (TaskManager): 任务管理器
+        args (argparse.Namespace): 命令行参数
+        
+    返回:
+        int: 退出状态，找不到任务时为1
+    """
+    task = task_manager.mark_completed(args.id)
+    if not task:
+        print(f"找不到ID为 {args.id} 的任务 (Task with ID {args.id} not found)", file=sys.stderr)
+        return 1
+    print(f"{Fore.GREEN}任务已标记为已完成 (Task marked as completed){Style.RESET_ALL}")
+    return 0
+
+
+def rm_command(task_manager, args):
+    """
+    删除任务，不再确认
+    (Delete a task without asking for confirmation)
+    
+    参数:
+        task_manager (TaskManager): 任务管理器
+        args (argparse.Namespace): 命令行参数
+        
+    返回:
+        int: 退出状态，找不到任务时为1
+    """
+    if not task_manager.delete_task(args.id):
+        print(f"找不到ID为 {args.id} 的任务 (Task with ID {args.id} not found)", file=sys.stderr)
+        return 1
+    print(f"{Fore.GREEN}任务已成功删除 (Task deleted successfully){Style.RESET_ALL}")
+    return 0
+
+
+def search_command(task_manager, args):
+    """
+    搜索任务，结果按相关度排序
+    (Search tasks, ranked by relevance)
+    
+    参数:
+        task_manager (TaskManager): 任务管理器
+        args (argparse.Namespace): 命令行参数
+        
+    返回:
+        int: 退出状态
+    """
+    tasks = task_manager.search(args.query, args.limit)
+    print_task_list(tasks, f"搜索结果 (Search results): {args.query}")
+    return 0
+
+
+def upcoming_command(task_manager, args):
+    """
+    列出接下来几天到期的任务，包括重复任务未来的各次
+    (List tasks due in the next few days, including future occurrences of recurring tasks)
+    
+    参数:
+        task_manager (TaskManager): 任务管理器
+        args (argparse.Namespace): 命令行参数
+        
+    返回:
+        int: 退出状态
+    """
+    until = (datetime.date.today() + datetime.timedelta(days=max(args.days, 0))).isoformat()
+    tasks = task_manager.upcoming(until)
+    if args.limit is not None:
+        tasks = itertools.islice(tasks, args.limit)
+    print_task_list(tasks, f"到 {until} 为止的任务 (Tasks due through {until})", show_due=True)
+    return 0
+
+
+def stats_command(task_manager, args):
     """
-    主函数，运行任务管理器
-    (Main function that runs the task manager)
+    打印任务统计和每周完成数的直方图
+    (Print task statistics and a histogram of completions per week)
+    
+    参数:
+        task_manager (TaskManager): 任务管理器
+        args (argparse.Namespace): 命令行参数
+        
+    返回:
+        int: 退出状态
+    """
+    summary = task_manager.stats()
+    lines = [
+        f"\n{Fore.CYAN}===== 任务统计 (Task Statistics) ====={Style.RESET_ALL}",
+        f"总数 (Total): {summary['total']}",
+        f"已完成 (Completed): {summary['completed']}  ({summary['completion_rate']:.1%})",
+        f"待办 (Pending): {summary['pending']}",
+        f"已过期 (Overdue): {summary['overdue']}",
+        "",
+        "优先级 (Priority)    待办 (Pending)  已完成 (Completed)",
+    ]
+    for priority, counts in summary['by_priority'].items():
+        lines.append(f"{priority:<20} {counts['pending']:>14}  {counts['completed']:>18}")
+    
+    weeks = list(summary['completed_per_week'].items())[-args.weeks:] if args.weeks > 0 else []
+    if weeks:
+        lines.append("\n每周完成数 (Completed per week):")
+        width = max(count for _, count in weeks)
+        for week, count in weeks:
+            bar = "#" * max(1, round(count * 40 / width)) if count > 0 else ""
+            lines.append(f"{week}  {count:>6}  {bar}")
+    print("\n".join(lines))
+    return 0
+
+
+def import_command(args):
+    """
+    从JSONL或CSV文件导入任务，逐条读取并分批写入
+    (Import tasks from a JSONL or CSV file, read one by one and written in batches)
+    
+    参数:
+        args (argparse.Namespace): 命令行参数
+    """
+    import transfer
+    
+    try:
+        import daemon
+        if daemon.find_daemon(args.storage_file) is not None:
+            # 守护进程保存时会覆盖直接写入的任务 (The daemon would overwrite tasks written directly)
+            raise SystemExit("请先停止守护进程 (Stop the daemon first)")
+    except (ImportError, AttributeError):
+        pass
+    
+    transfer_format = args.format or transfer.detect_format(args.file)
+    task_manager = TaskManager(args.storage_file, storage=args.storage)
+    try:
+        with _open_text(args.file, 'r') as file:
+            count = task_manager.import_tasks(transfer.read_tasks(file, transfer_format), args.batch_size)
+    finally:
+        task_manager.close()
+    print(f"已导入 {count} 个任务 (Imported {count} tasks)", file=sys.stderr)
+    return 0
+
+
+def export_command(args):
+    """
+    把任务逐条导出为JSONL或CSV，不在内存中构建完整的任务列表
+    (Export tasks one by one as JSONL or CSV without building the full list in memory)
+    
+    参数:
+        args (argparse.Namespace): 命令行参数
+    """
+    import transfer
+    
+    transfer_format = args.format or transfer.detect_format(args.file)
+    task_manager = TaskManager(args.storage_file, storage=args.storage)
+    try:
+        with _open_text(args.file, 'w') as file:
+            count = transfer.write_tasks(task_manager.iter_tasks(), file, transfer_format)
+    finally:
+        task_manager.close()
+    print(f"已导出 {count} 个任务 (Exported {count} tasks)", file=sys.stderr)
+    return 0
+
+
+def _open_text(path, mode):
+    """
+    打开文本文件，"-"表示标准输入或标准输出；.gz、.xz和.zst文件透明压缩
+    (Open a text file; "-" means stdin or stdout; .gz, .xz and .zst files are
+    transparently compressed)
+    """
+    if path == "-":
+        stream = sys.stdin if mode == 'r' else sys.stdout
+        return contextlib.nullcontext(stream)
+    return compression.open_text(path, mode)
+
+
+def build_parser():
+    """
+    创建命令行参数解析器
+    (Build the command line argument parser)
+    
+    返回:
+        argparse.ArgumentParser: 参数解析器
+    """
+    parser = argparse.ArgumentParser(description="命令行任务管理器 (Command line task manager)")
+    parser.add_argument("--storage-file", default="tasks.json", help="任务文件路径 (Task file path)")
+    parser.add_argument("--storage", default="json", choices=("json", "journal", "sqlite"),
+                        help="存储模式 (Storage mode)")
+    subparsers = parser.add_subparsers(dest="command")
+    
+    add_parser = subparsers.add_parser("add", help="添加任务 (Add a task)")
+    add_parser.add_argument("title", help="任务标题 (Task title)")
+    add_parser.add_argument("-d", "--description", default="", help="任务描述 (Task description)")
+    add_parser.add_argument("--due", help="截止日期 YYYY-MM-DD (Due date)")
+    add_parser.add_argument("-p", "--priority", default="medium", choices=("low", "medium", "high"),
+                            help="优先级 (Priority)")
+    add_parser.add_argument("--repeat", metavar="RULE",
+                            help="重复规则：daily、weekly、monthly或cron表达式 "
+                                 "(Recurrence rule: daily, weekly, monthly or a cron expression)")
+    add_parser.set_defaults(task_handler=add_command)
+    
+    list_parser = subparsers.add_parser("list", help="列出任务 (List tasks)")
+    list_parser.add_argument("--status", default="pending", choices=("pending", "completed", "all", "overdue"),
+                             help="任务状态，默认为待办 (Task status, pending by default)")
+    list_parser.add_argument("-p", "--priority", choices=("low", "medium", "high"),
+                             help="只列出该优先级的任务 (Only list tasks of this priority)")
+    list_parser.add_argument("--sort", choices=("due", "priority"),
+                             help="按截止日期或优先级列出前N个待办任务 (List the first N pending tasks by due date or priority)")
+    list_parser.add_argument("-n", "--limit", type=int,
+                             help="最多显示的任务数，默认不限，与--sort一起使用时默认为10 "
+                                  "(Maximum tasks shown; unlimited by default, 10 with --sort)")
+    list_parser.add_argument("--offset", type=int, default=0,
+                             help="跳过前面的任务数，用于翻页 (Number of tasks to skip, for paging)")
+    list_parser.set_defaults(task_handler=list_command)
+    
+    done_parser = subparsers.add_parser("done", help="标记任务为已完成 (Mark a task as completed)")
+    done_parser.add_argument("id", type=int, help="任务ID (Task ID)")
+    done_parser.set_defaults(task_handler=done_command)
+    
+    rm_parser = subparsers.add_parser("rm", help="删除任务 (Delete a task)")
+    rm_parser.add_argument("id", type=int, help="任务ID (Task ID)")
+    rm_parser.set_defaults(task_handler=rm_command)
+    
+    search_parser = subparsers.add_parser("search", help="搜索任务 (Search tasks)")
+    search_parser.add_argument("query", help="查询文本 (Query text)")
+    search_parser.add_argument("-n", "--limit", type=int, default=20, help="最多显示的任务数 (Maximum tasks shown)")
+    search_parser.set_defaults(task_handler=search_command)
+    
+    upcoming_parser = subparsers.add_parser("upcoming", help="接下来几天的任务 (Tasks due in the next few days)")
+    upcoming_parser.add_argument("--days", type=int, default=7, help="天数，默认为7 (Number of days, 7 by default)")
+    upcoming_parser.add_argument("-n", "--limit", type=int, help="最多显示的任务数 (Maximum tasks shown)")
+    upcoming_parser.set_defaults(task_handler=upcoming_command)
+    
+    stats_parser = subparsers.add_parser("stats", help="任务统计 (Task statistics)")
+    stats_parser.add_argument("--weeks", type=int, default=12,
+                              help="直方图显示的最近周数 (Number of recent weeks in the histogram)")
+    stats_parser.set_defaults(task_handler=stats_command)
+    
+    import_parser = subparsers.add_parser("import", help="从JSONL或CSV导入任务 (Import tasks from JSONL or CSV)")
+    import_parser.add_argument("file", help="输入文件，\"-\"表示标准输入 (Input file, \"-\" for stdin)")
+    import_parser.add_argument("--format", choices=("jsonl", "csv"),
+                               help="文件格式，默认根据扩展名判断 (File format, detected from the extension by default)")
+    import_parser.add_argument("--batch-size", type=int, default=1000,
+                               help="每次写入的任务数 (Tasks written per batch)")
+    import_parser.set_defaults(handler=import_command)
+    
+    export_parser = subparsers.add_parser("export", help="导出任务为JSONL或CSV (Export tasks as JSONL or CSV)")
+    export_parser.add_argument("file", nargs="?", default="-",
+                               help="输出文件，默认为标准输出 (Output file, stdout by default)")
+    export_parser.add_argument("--format", choices=("jsonl", "csv"),
+                               help="文件格式，默认根据扩展名判断 (File format, detected from the extension by default)")
+    export_parser.set_defaults(handler=export_command)
+    return parser
+
+
+def main(argv=None):
+    """
+    主函数：有子命令时执行子命令，否则运行交互式菜单
+    子命令只打开任务文件并执行这一个操作，适合在脚本中调用
+    (Main function: run a subcommand if one is given, otherwise the interactive
+    menu; a subcommand only opens the task file and performs that one
+    operation, which suits scripts)
+    
+    参数:
+        argv (list, optional): 命令行参数，默认为sys.argv[1:]
+        
+    返回:
+        int: 退出状态
+    """
+    args = build_parser().parse_args(argv)
+    enable_colors()
+    
+    if args.command is None:
+        run_menu(args.storage_file, storage=args.storage)
+        return 0
+    if args.command in ("import", "export"):
+        return args.handler(args)
+    
+    task_manager = open_task_manager(args.storage_file, storage=args.storage)
+    try:
+        return args.task_handler(task_manager, args)
+    finally:
+        task_manager.close()
+
+
+def run_menu(storage_file="tasks.json", **manager_options):
+    """
+    运行交互式菜单
+    (Run the interactive menu)
+    
+    参数:
+        storage_file (str): 任务文件路径
+        **manager_options: 直接打开时传给TaskManager的参数
     """
-    # 创建任务管理器实例 (Create task manager instance)
-    task_manager = TaskManager()
+    # 创建任务管理器实例，优先使用守护进程 (Create task manager instance, preferring the daemon)
+    task_manager = open_task_manager(storage_file, **manager_options)
     
     print(f"{Fore.CYAN}欢迎使用命令行任务管理器！(Welcome to the Command Line Task Manager!){Style.RESET_ALL}")
     
@@ -329,23 +1828,21 @@ def main():
         choice = display_menu()
         
         if choice == "0":
+            task_manager.close()
             print(f"{Fore.CYAN}谢谢使用，再见！(Thank you for using the Task Manager. Goodbye!){Style.RESET_ALL}")
             break
             
         elif choice == "1":
             # 查看所有任务 (View all tasks)
-            tasks = task_manager.get_all_tasks()
-            print_task_list(tasks, "所有任务 (All Tasks)")
+            page_task_list(task_manager, "所有任务 (All Tasks)")
             
         elif choice == "2":
             # 查看待办任务 (View pending tasks)
-            tasks = task_manager.get_tasks_by_status(completed=False)
-            print_task_list(tasks, "待办任务 (Pending Tasks)")
+            page_task_list(task_manager, "待办任务 (Pending Tasks)", status="pending")
             
         elif choice == "3":
             # 查看已完成任务 (View completed tasks)
-            tasks = task_manager.get_tasks_by_status(completed=True)
-            print_task_list(tasks, "已完成任务 (Completed Tasks)")
+            page_task_list(task_manager, "已完成任务 (Completed Tasks)", status="completed")
             
         elif choice == "4":
             # 添加新任务 (Add new task)
@@ -404,8 +1901,8 @@ def main():
             # 根据优先级查看任务 (View tasks by priority)
             priority = input("请输入优先级 [low/medium/high]: ").lower()
             if priority in ["low", "medium", "high"]:
-                tasks = task_manager.get_tasks_by_priority(priority)
-                print_task_list(tasks, f"{priority.capitalize()}优先级任务 ({priority.capitalize()} Priority Tasks)")
+                page_task_list(task_manager, f"{priority.capitalize()}优先级任务 ({priority.capitalize()} Priority Tasks)",
+                               priority=priority)
             else:
                 print(f"{Fore.RED}无效的优先级 (Invalid priority){Style.RESET_ALL}")
                 
@@ -418,10 +1915,11 @@ def main():
 
 if __name__ == "__main__":
     try:
-        main()
+        sys.exit(main())
     except KeyboardInterrupt:
         # 处理Ctrl+C (Handle Ctrl+C)
         print(f"\n{Fore.CYAN}程序已中断，谢谢使用！(Program interrupted, thank you for using!){Style.RESET_ALL}")
     except Exception as e:
         # 处理其他异常 (Handle other exceptions)
-        print(f"{Fore.RED}发生错误: {str(e)} (An error occurred: {str(e)}){Style.RESET_ALL}") 
\ No newline at end of file
+        print(f"{Fore.RED}发生错误: {str(e)} (An error occurred: {str(e)}){Style.RESET_ALL}")
+        sys.exit(1) 
\ No newline at end of file
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+紧凑的任务记录 (task_record)
+每个任务用一个带__slots__的对象代替字典保存，对象中没有逐个任务的键字符串和哈希表，
+百万级任务时内存占用明显减少。
+优先级和截止日期的取值很少，字符串会被驻留 (intern)，所有任务共用同一个字符串对象。
+
+Task支持与字典相同的访问方式：task['title']、task.get()、task.update()、dict(task) 等，
+现有代码无需修改即可使用。
+(Task supports the same access as a dict: task['title'], task.get(),
+task.update(), dict(task) and so on, so existing code works unchanged.)
+"""
+
+import sys
+from collections.abc import MutableMapping
+
+# 有独立槽位的字段，其他字段保存在_extra字典中
+# (Fields with their own slot; any other field is kept in the _extra dict)
+FIELDS = ("id", "title", "description", "created_at", "due_date", "priority", "completed", "completed_at")
+_FIELD_SET = frozenset(FIELDS)
+
+# 取值很少、需要驻留的字段 (Fields with few distinct values, interned)
+INTERNED_FIELDS = frozenset(("priority", "due_date"))
+
+
+class Task(MutableMapping):
+    """
+    用__slots__保存字段的任务记录
+    (Task record storing its fields in __slots__)
+
+    没有设置的字段不存在，与字典中缺少这个键一样：task['x']抛出KeyError，'x' in task为False。
+    (An unset field is absent, like a missing dict key: task['x'] raises
+    KeyError and 'x' in task is False.)
+    """
+
+    __slots__ = FIELDS + ("_extra",)
+
+    def __init__(self, fields=(), **kwargs):
+        """
+        参数:
+            fields (dict): 任务的字段，通常是从快照中读取的字典
+        """
+        self._extra = None
+        if type(fields) is not dict or kwargs:
+            self.update(fields, **kwargs)
+            return
+
+        # 最常见的情况：直接设置槽位，跳过逐个字段的__setitem__
+        # (The common case: set the slots directly, skipping __setitem__ per field)
+        for key, value in fields.items():
+            if key in _FIELD_SET:
+                setattr(self, key, value)
+            else:
+                if self._extra is None:
+                    self._extra = {}
+                self._extra[key] = value
+        for key in INTERNED_FIELDS:
+            value = getattr(self, key, None)
+            if type(value) is str:
+                setattr(self, key, sys.intern(value))
+
+    def __getitem__(self, key):
+        if key in _FIELD_SET:
+            try:
+                return getattr(self, key)
+            except AttributeError:
+                raise KeyError(key) from None
+        if self._extra is None:
+            raise KeyError(key)
+        return self._extra[key]
+
+    def __setitem__(self, key, value):
+        if key in _FIELD_SET:
+            if key in INTERNED_FIELDS and type(value) is str:
+                value = sys.intern(value)
+            setattr(self, key, value)
+        else:
+            if self._extra is None:
+                self._extra = {}
+            self._extra[key] = value
+
+    def __delitem__(self, key):
+        if key in _FIELD_SET:
+            try:
+                delattr(self, key)
+            except AttributeError:
+                raise KeyError(key) from None
+        elif self._extra is not None and key in self._extra:
+            del self._extra[key]
+            if not self._extra:
+                self._extra = None
+        else:
+            raise KeyError(key)
+
+    def __iter__(self):
+        for name in FIELDS:
+            if hasattr(self, name):
+                yield name
+        if self._extra:
+            yield from self._extra
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def __contains__(self, key):
+        if key in _FIELD_SET:
+            return hasattr(self, key)
+        return self._extra is not None and key in self._extra
+
+    def get(self, key, default=None):
+        """与dict.get相同，但不经过异常处理 (Same as dict.get, without going through exceptions)"""
+        if key in _FIELD_SET:
+            return getattr(self, key, default)
+        if self._extra is None:
+            return default
+        return self._extra.get(key, default)
+
+    def copy(self):
+        """返回浅拷贝 (Return a shallow copy)"""
+        return Task(self)
+
+    def __repr__(self):
+        return f"Task({dict(self)!r})"
+
+
+def to_dict(task):
+    """
+    把任务转换为普通字典，用作json.dumps的default参数
+    (Convert a task to a plain dict; used as the default argument of json.dumps)
+
+    参数:
+        task (Task): 任务
+
+    返回:
+        dict: 任务的字段
+
+    异常:
+        TypeError: 参数不是Task
+    """
+    if isinstance(task, Task):
+        return dict(task)
+    raise TypeError(f"Object of type {type(task).__name__} is not JSON serializable")
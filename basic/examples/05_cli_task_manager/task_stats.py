@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+任务统计 (task_stats)
+用计数器累计任务的完成情况、每个优先级的任务数和每周完成的任务数。
+计数器可以逐个加入或移除任务，因此既能一次遍历算出统计，也能在每次修改时增量更新。
+(Counters accumulate completion, per-priority counts and tasks completed per
+week. Tasks can be added or removed one at a time, so the counters work both
+for a single pass over the tasks and for incremental updates on every change.)
+"""
+
+import datetime
+import functools
+
+PRIORITIES = ("high", "medium", "low")
+
+
+@functools.lru_cache(maxsize=4096)
+def week_of(date):
+    """
+    返回日期所在的ISO周，每个不同的日期只计算一次
+    (Return the ISO week of a date, computed once per distinct date)
+
+    参数:
+        date (str): 日期，格式为YYYY-MM-DD
+
+    返回:
+        str: ISO周，例如 "2024-W05"，无法解析时返回None
+    """
+    try:
+        year, week, _ = datetime.date.fromisoformat(date).isocalendar()
+    except (TypeError, ValueError):
+        return None
+    return f"{year}-W{week:02d}"
+
+
+class TaskStats:
+    """
+    任务统计计数器
+    (Task statistics counters)
+
+    counts把 (优先级, 是否完成) 映射到任务数，weeks把ISO周映射到该周完成的任务数。
+    (counts maps (priority, completed) to a task count; weeks maps an ISO week
+    to the number of tasks completed in it.)
+    """
+
+    def __init__(self):
+        self.counts = {}
+        self.weeks = {}
+
+    def add(self, task, sign=1):
+        """
+        把任务计入统计，sign为-1时从统计中移除
+        (Count a task; with sign -1 the task is removed from the counts)
+
+        参数:
+            task (dict): 任务
+            sign (int): 1或-1
+        """
+        completed = bool(task.get('completed'))
+        key = (task.get('priority'), completed)
+        self.counts[key] = self.counts.get(key, 0) + sign
+        if completed and task.get('completed_at'):
+            self.add_completions(task['completed_at'][:10], sign)
+
+    def remove(self, task):
+        """
+        把任务从统计中移除，需要传入任务被计入时的内容
+        (Remove a task from the counts; the task must have the content it was counted with)
+        """
+        self.add(task, -1)
+
+    def add_completions(self, date, count):
+        """
+        把某一天完成的任务数计入每周统计
+        (Add the number of tasks completed on a day to the weekly counts)
+
+        参数:
+            date (str): 完成日期，格式为YYYY-MM-DD
+            count (int): 任务数，可以为负数
+        """
+        week = week_of(date)
+        if week is None:
+            return
+        total = self.weeks.get(week, 0) + count
+        if total:
+            self.weeks[week] = total
+        else:
+            del self.weeks[week]
+
+    def merge(self, other):
+        """
+        把另一个统计加到当前统计上
+        (Add another set of counters to this one)
+
+        参数:
+            other (TaskStats): 另一个统计
+
+        返回:
+            TaskStats: 当前统计
+        """
+        for key, count in other.counts.items():
+            self.counts[key] = self.counts.get(key, 0) + count
+        for week, count in other.weeks.items():
+            self.weeks[week] = self.weeks.get(week, 0) + count
+        return self
+
+    def summary(self, overdue=0):
+        """
+        生成统计摘要
+        (Build the statistics summary)
+
+        参数:
+            overdue (int): 已过截止日期的待办任务数，由调用方根据有序视图计算
+
+        返回:
+            dict: 总数、完成数、待办数、完成率、过期数、每个优先级的任务数和每周完成数
+        """
+        by_priority = {priority: {"pending": 0, "completed": 0} for priority in PRIORITIES}
+        for (priority, completed), count in self.counts.items():
+            if count:
+                bucket = by_priority.setdefault(priority or "none", {"pending": 0, "completed": 0})
+                bucket["completed" if completed else "pending"] += count
+
+        completed = sum(bucket["completed"] for bucket in by_priority.values())
+        total = completed + sum(bucket["pending"] for bucket in by_priority.values())
+        return {
+            "total": total,
+            "completed": completed,
+            "pending": total - completed,
+            "completion_rate": completed / total if total else 0.0,
+            "overdue": overdue,
+            "by_priority": by_priority,
+            "completed_per_week": dict(sorted(self.weeks.items())),
+        }
@@ -0,0 +1,366 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+带索引的内存任务存储 (task_store)
+任务按ID保存在字典中，并为常用的查询字段维护二级索引，
+使按ID查找、按状态或优先级筛选都不需要扫描整个任务列表。
+
+待办任务另外按截止日期和优先级维护有序视图，取前k个任务不需要每次排序。
+(Pending tasks also have views ordered by due date and by priority, so taking
+the first k tasks needs no sort per call.)
+"""
+
+import bisect
+import datetime
+import functools
+
+from task_stats import TaskStats
+
+# 优先级从高到低的排名 (Rank of priorities, highest first)
+PRIORITY_RANK = {"high": 0, "medium": 1, "low": 2}
+
+# 没有截止日期的任务排在最后 (Tasks without a due date sort last)
+NO_DUE_DATE = float("inf")
+
+
+@functools.lru_cache(maxsize=4096)
+def due_key(due_date):
+    """
+    把截止日期解析为可比较的整数，每个不同的日期字符串只解析一次
+    (Parse a due date into a comparable integer; each distinct date string is
+    parsed only once)
+
+    参数:
+        due_date (str): 截止日期，格式为YYYY-MM-DD
+
+    返回:
+        int: 日期的序数，没有或无法解析时返回NO_DUE_DATE
+    """
+    if not due_date:
+        return NO_DUE_DATE
+    try:
+        return datetime.date.fromisoformat(due_date).toordinal()
+    except (TypeError, ValueError):
+        return NO_DUE_DATE
+
+
+class TaskStore:
+    """
+    带索引的任务存储类
+    (Indexed task store)
+
+    主索引是以任务ID为键的字典，二级索引把字段值映射到任务ID集合。
+    每次修改都会同步更新二级索引。
+    """
+
+    # 维护二级索引的字段 (Fields that have a secondary index)
+    INDEXED_FIELDS = ("completed", "priority", "due_date")
+
+    def __init__(self, tasks=(), next_id=1, revision=0, record_type=None):
+        """
+        初始化任务存储
+        (Initialize the task store)
+
+        参数:
+            tasks (iterable): 初始任务
+            next_id (int): 下一个可用的任务ID，只增不减
+            revision (int): 数据版本号，每次持久化修改时加一
+            record_type (type, optional): 保存任务时转换成的类型，例如task_record.Task；
+                为None时直接保存传入的字典
+        """
+        self._tasks = {}
+        self.record_type = record_type
+        # 二级索引，第一次查询时才建立，只加载任务而不查询时 (例如工作区) 不需要付出建立索引的开销
+        # 字段值 -> {任务ID: None}，用字典充当有序集合
+        # (Secondary indexes, built on the first query so that loading tasks
+        # without querying them, e.g. in a workspace, never pays for them;
+        # field value -> {task id: None}, a dict used as an ordered set)
+        self._indexes = None
+        # 待办任务的有序视图，第一次查询时才建立，之后随修改用bisect维护
+        # (Ordered views of pending tasks, built on the first query and then
+        # maintained with bisect on every change)
+        #   due:      [(截止日期序数, 任务ID)]，只包括有截止日期的任务
+        #   priority: [(优先级排名, 截止日期序数, 任务ID)]
+        self._orders = None
+        # 统计计数器，第一次查询时遍历一次建立，之后随修改增量更新
+        # (Statistics counters, built in one pass on the first query and then updated on every change)
+        self._stats = None
+        # 待办的重复任务的ID，用字典充当有序集合，第一次查询时建立
+        # (IDs of pending recurring tasks, a dict used as an ordered set, built on the first query)
+        self._recurring = None
+        self.next_id = next_id
+        self.revision = revision
+
+        for task in tasks:
+            self.put(task)
+
+    def __len__(self):
+        return len(self._tasks)
+
+    def __iter__(self):
+        return iter(self._tasks.values())
+
+    def __contains__(self, task_id):
+        return task_id in self._tasks
+
+    def get(self, task_id):
+        """
+        根据ID获取任务
+        (Get a task by ID)
+
+        参数:
+            task_id (int): 任务ID
+
+        返回:
+            dict: 任务，如果找不到则返回None
+        """
+        return self._tasks.get(task_id)
+
+    def put(self, task):
+        """
+        添加任务，如果ID已存在则替换原任务
+        (Add a task, replacing any task with the same ID)
+
+        参数:
+            task (dict): 要保存的任务
+
+        返回:
+            dict: 保存后的任务
+        """
+        existing = self._tasks.get(task['id'])
+        if existing is not None:
+            self._unindex(existing)
+            existing.clear()
+            existing.update(task)
+            task = existing
+        else:
+            if self.record_type is not None and not isinstance(task, self.record_type):
+                task = self.record_type(task)
+            self._tasks[task['id']] = task
+
+        self._index(task)
+        # ID计数器只增不减，删除的ID不会被重新使用
+        # (The ID counter only grows, deleted IDs are never reused)
+        self.next_id = max(self.next_id, task['id'] + 1)
+        return task
+
+    def update(self, task_id, fields):
+        """
+        更新任务的字段
+        (Update fields of a task)
+
+        参数:
+            task_id (int): 任务ID
+            fields (dict): 要更新的字段和值
+
+        返回:
+            dict: 更新后的任务，如果找不到则返回None
+        """
+        task = self._tasks.get(task_id)
+        if task is None:
+            return None
+
+        self._unindex(task)
+        task.update(fields)
+        self._index(task)
+        return task
+
+    def remove(self, task_id):
+        """
+        删除任务
+        (Remove a task)
+
+        参数:
+            task_id (int): 任务ID
+
+        返回:
+            dict: 被删除的任务，如果找不到则返回None
+        """
+        task = self._tasks.pop(task_id, None)
+        if task is not None:
+            self._unindex(task)
+        return task
+
+    def find(self, field, value):
+        """
+        通过二级索引查找字段等于某个值的任务
+        (Find tasks whose field equals a value using the secondary index)
+
+        参数:
+            field (str): 字段名，必须是INDEXED_FIELDS之一
+            value: 字段值
+
+        返回:
+            list: 符合条件的任务列表，按ID排序
+        """
+        task_ids = self._indexed()[field].get(value, {})
+        return [self._tasks[task_id] for task_id in sorted(task_ids)]
+
+    def iter_find(self, field, value):
+        """
+        与find相同，但逐个返回任务，调用方停止读取后不再访问剩下的任务
+        (Same as find, but yields tasks one at a time; the remaining tasks are
+        never touched once the caller stops reading)
+
+        参数:
+            field (str): 字段名，必须是INDEXED_FIELDS之一
+            value: 字段值
+
+        返回:
+            generator: 符合条件的任务，按ID排序
+        """
+        for task_id in sorted(self._indexed()[field].get(value, {})):
+            task = self._tasks.get(task_id)
+            # 读取期间被删除的任务直接跳过 (Skip tasks deleted while the caller was reading)
+            if task is not None:
+                yield task
+
+    def next_due(self, k):
+        """
+        返回截止日期最近的k个待办任务
+        (Return the k pending tasks with the nearest due dates)
+
+        参数:
+            k (int): 任务数
+
+        返回:
+            list: 任务列表，按截止日期排序，相同日期按ID排序
+        """
+        return [self._tasks[task_id] for _, task_id in self._ordered()["due"][:k]]
+
+    def top_priority(self, k):
+        """
+        返回优先级最高的k个待办任务
+        (Return the k pending tasks with the highest priority)
+
+        参数:
+            k (int): 任务数
+
+        返回:
+            list: 任务列表，按优先级排序，相同优先级按截止日期和ID排序
+        """
+        return [self._tasks[key[-1]] for key in self._ordered()["priority"][:k]]
+
+    def overdue(self, today):
+        """
+        返回截止日期早于今天的待办任务
+        (Return pending tasks whose due date is before today)
+
+        参数:
+            today (str): 今天的日期，格式为YYYY-MM-DD
+
+        返回:
+            list: 任务列表，按截止日期排序
+        """
+        due = self._ordered()["due"]
+        end = bisect.bisect_left(due, (due_key(today),))
+        return [self._tasks[task_id] for _, task_id in due[:end]]
+
+    def recurring(self):
+        """
+        返回待办的重复任务，不需要遍历所有任务
+        (Return the pending recurring tasks without scanning every task)
+
+        返回:
+            list: 任务列表，按ID排序
+        """
+        if self._recurring is None:
+            self._recurring = {task['id']: None for task in self._tasks.values()
+                               if task.get('recurrence') and not task.get('completed')}
+        return [self._tasks[task_id] for task_id in sorted(self._recurring)]
+
+    def count_overdue(self, today):
+        """
+        返回截止日期早于今天的待办任务数
+        (Return the number of pending tasks whose due date is before today)
+
+        参数:
+            today (str): 今天的日期，格式为YYYY-MM-DD
+
+        返回:
+            int: 任务数
+        """
+        return bisect.bisect_left(self._ordered()["due"], (due_key(today),))
+
+    def statistics(self):
+        """
+        返回任务统计计数器，调用方不能修改它
+        (Return the task statistics counters; callers must not modify them)
+
+        返回:
+            TaskStats: 统计计数器
+        """
+        if self._stats is None:
+            self._stats = TaskStats()
+            for task in self._tasks.values():
+                self._stats.add(task)
+        return self._stats
+
+    def _indexed(self):
+        """第一次查询时遍历一次建立二级索引 (Build the secondary indexes in one pass on first query)"""
+        if self._indexes is None:
+            indexes = {}
+            for field in self.INDEXED_FIELDS:
+                index = indexes[field] = {}
+                for task_id, task in self._tasks.items():
+                    index.setdefault(task.get(field), {})[task_id] = None
+            self._indexes = indexes
+        return self._indexes
+
+    def _ordered(self):
+        """第一次查询时一次性排序建立有序视图 (Build the ordered views with one sort on first query)"""
+        if self._orders is None:
+            unranked = len(PRIORITY_RANK)
+            by_priority = [(PRIORITY_RANK.get(task.get('priority'), unranked), due_key(task.get('due_date')), task['id'])
+                           for task in self._tasks.values() if not task.get('completed')]
+            by_due = [(due, task_id) for _, due, task_id in by_priority if due != NO_DUE_DATE]
+            by_priority.sort()
+            by_due.sort()
+            self._orders = {"due": by_due, "priority": by_priority}
+        return self._orders
+
+    @staticmethod
+    def _order_keys(task, orders, add):
+        """对待办任务的每个有序视图调用add(视图, 键) (Call add(view, key) for each ordered view of a pending task)"""
+        if task.get('completed'):
+            return
+        due = due_key(task.get('due_date'))
+        if due != NO_DUE_DATE:
+            add(orders["due"], (due, task['id']))
+        add(orders["priority"], (PRIORITY_RANK.get(task.get('priority'), len(PRIORITY_RANK)), due, task['id']))
+
+    def _index(self, task):
+        """把任务加入已建立的二级索引 (Add a task to the secondary indexes that have been built)"""
+        if self._indexes is not None:
+            for field, index in self._indexes.items():
+                index.setdefault(task.get(field), {})[task['id']] = None
+        if self._orders is not None:
+            self._order_keys(task, self._orders, bisect.insort)
+        if self._stats is not None:
+            self._stats.add(task)
+        if self._recurring is not None and task.get('recurrence') and not task.get('completed'):
+            self._recurring[task['id']] = None
+
+    def _unindex(self, task):
+        """把任务从已建立的二级索引中移除 (Remove a task from the secondary indexes that have been built)"""
+        if self._indexes is not None:
+            for field, index in self._indexes.items():
+                bucket = index.get(task.get(field))
+                if bucket is not None:
+                    bucket.pop(task['id'], None)
+                    if not bucket:
+                        del index[task.get(field)]
+        if self._orders is not None:
+            self._order_keys(task, self._orders, _discard)
+        if self._stats is not None:
+            self._stats.remove(task)
+        if self._recurring is not None:
+            self._recurring.pop(task['id'], None)
+
+
+def _discard(keys, key):
+    """从有序列表中删除一个键 (Remove a key from a sorted list)"""
+    position = bisect.bisect_left(keys, key)
+    if position < len(keys) and keys[position] == key:
+        del keys[position]
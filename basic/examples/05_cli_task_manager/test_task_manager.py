@@ -0,0 +1,900 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+命令行任务管理器测试模块
+
+本模块包含对TaskManager的单元测试，使用pytest测试框架。
+测试内容包括任务的增删改查以及不同存储模式下的持久化。
+"""
+
+import os
+import json
+import pytest
+from task_manager import TaskManager
+
+# 测试用的任务文件
+@pytest.fixture
+def storage_file(tmp_path):
+    """返回临时目录中的任务文件路径"""
+    return str(tmp_path / "tasks.json")
+
+# 测试JSON模式下的基本操作
+def test_json_storage_roundtrip(storage_file):
+    """测试JSON模式下添加、更新和删除任务后可以重新加载"""
+    manager = TaskManager(storage_file)
+    first = manager.add_task("写报告", priority="high")
+    second = manager.add_task("买牛奶")
+    manager.mark_completed(first['id'])
+    manager.delete_task(second['id'])
+
+    reloaded = TaskManager(storage_file)
+    assert len(reloaded.get_all_tasks()) == 1
+    assert reloaded.get_task_by_id(first['id'])['completed'] is True
+    assert not os.path.exists(storage_file + ".journal")
+
+# 测试日志模式只追加记录
+def test_journal_appends_records(storage_file):
+    """测试日志模式下修改只追加日志，不重写快照"""
+    manager = TaskManager(storage_file, storage="journal")
+    task = manager.add_task("写报告")
+    manager.update_task(task['id'], title="写周报")
+
+    # 快照还不存在，所有修改都在日志中
+    assert not os.path.exists(storage_file)
+    with open(storage_file + ".journal", encoding='utf-8') as file:
+        records = [json.loads(line) for line in file]
+    assert [record['op'] for record in records] == ["add", "update"]
+
+    # 重新加载时重放日志
+    reloaded = TaskManager(storage_file, storage="journal")
+    assert reloaded.get_task_by_id(task['id'])['title'] == "写周报"
+
+# 测试日志合并
+def test_journal_compaction(storage_file):
+    """测试日志达到阈值后自动合并到快照"""
+    manager = TaskManager(storage_file, storage="journal", compact_threshold=3)
+    for i in range(4):
+        manager.add_task(f"任务{i}")
+
+    # 前三条记录已合并到快照，日志中只剩一条
+    with open(storage_file, encoding='utf-8') as file:
+        assert len(json.load(file)['tasks']) == 3
+    with open(storage_file + ".journal", encoding='utf-8') as file:
+        assert len(file.readlines()) == 1
+
+    manager.compact()
+    assert not os.path.exists(storage_file + ".journal")
+    assert len(TaskManager(storage_file).get_all_tasks()) == 4
+
+# 测试日志重放的容错
+def test_journal_ignores_torn_last_line(storage_file):
+    """测试崩溃留下的半行日志会被忽略"""
+    manager = TaskManager(storage_file, storage="journal")
+    manager.add_task("写报告")
+    with open(storage_file + ".journal", 'a', encoding='utf-8') as file:
+        file.write('{"op": "add", "task": {"id": 2')
+
+    reloaded = TaskManager(storage_file, storage="journal")
+    assert [task['title'] for task in reloaded.get_all_tasks()] == ["写报告"]
+
+    # 半行被截掉，之后追加的记录在重新加载后仍然存在
+    reloaded.add_task("开会")
+    again = TaskManager(storage_file, storage="journal")
+    assert [task['title'] for task in again.get_all_tasks()] == ["写报告", "开会"]
+
+# 测试ID计数器
+def test_task_ids_are_never_reused(storage_file):
+    """测试删除最大ID的任务后，新任务不会复用它的ID"""
+    manager = TaskManager(storage_file)
+    manager.add_task("任务1")
+    last = manager.add_task("任务2")
+    manager.delete_task(last['id'])
+
+    reloaded = TaskManager(storage_file)
+    assert reloaded.add_task("任务3")['id'] == last['id'] + 1
+
+# 测试旧版本的任务文件
+def test_loads_legacy_task_list(storage_file):
+    """测试可以加载旧版本保存的纯任务列表"""
+    legacy = [{"id": 5, "title": "旧任务", "description": "", "created_at": "2024-01-01 00:00:00",
+               "due_date": None, "priority": "low", "completed": False}]
+    with open(storage_file, 'w', encoding='utf-8') as file:
+        json.dump(legacy, file)
+
+    manager = TaskManager(storage_file)
+    assert manager.get_task_by_id(5)['title'] == "旧任务"
+    assert manager.add_task("新任务")['id'] == 6
+
+# 测试旧版本任务的批量修改
+def test_batch_on_legacy_tasks(storage_file):
+    """测试旧版本的任务没有completed_at时，批量修改可以提交，回滚后任务与原来完全相同"""
+    legacy = [{"id": task_id, "title": f"旧任务{task_id}", "description": "", "created_at": "2024-01-01 00:00:00",
+               "due_date": None, "priority": "low", "completed": False} for task_id in (1, 2)]
+    with open(storage_file, 'w', encoding='utf-8') as file:
+        json.dump(legacy, file)
+
+    manager = TaskManager(storage_file)
+    with manager.batch():
+        manager.mark_completed(1)
+    assert manager.get_task_by_id(1)['completed'] is True
+
+    with pytest.raises(RuntimeError):
+        with manager.batch():
+            manager.mark_completed(2)
+            raise RuntimeError("回滚 (roll back)")
+    assert dict(manager.get_task_by_id(2)) == legacy[1]
+    manager.close()
+    assert dict(TaskManager(storage_file).get_task_by_id(2)) == legacy[1]
+
+# 测试二级索引
+def test_secondary_indexes_follow_mutations(storage_file):
+    """测试更新和删除任务后，按状态、优先级和截止日期的查询结果保持正确"""
+    manager = TaskManager(storage_file)
+    first = manager.add_task("任务1", due_date="2024-05-01", priority="high")
+    second = manager.add_task("任务2", due_date="2024-05-01")
+    manager.mark_completed(first['id'])
+    manager.update_task(second['id'], priority="high", due_date="2024-06-01")
+
+    assert manager.get_tasks_by_status(completed=True) == [first]
+    assert manager.get_tasks_by_status(completed=False) == [second]
+    assert manager.get_tasks_by_priority("high") == [first, second]
+    assert manager.get_tasks_by_priority("medium") == []
+    assert manager.get_tasks_by_due_date("2024-05-01") == [first]
+
+    manager.delete_task(first['id'])
+    assert manager.get_tasks_by_priority("high") == [second]
+
+# 测试SQLite模式
+@pytest.mark.parametrize("storage", ["json", "journal", "sqlite"])
+def test_storage_modes_share_behaviour(storage_file, storage):
+    """测试所有存储模式下查询和修改的结果一致"""
+    manager = TaskManager(storage_file, storage=storage)
+    first = manager.add_task("任务1", priority="high")
+    second = manager.add_task("任务2", due_date="2024-05-01")
+    updated = manager.mark_completed(first['id'])
+    assert updated['completed'] is True
+    manager.close()
+
+    reloaded = TaskManager(storage_file, storage=storage)
+    assert [task['id'] for task in reloaded.get_tasks_by_status(completed=True)] == [first['id']]
+    assert reloaded.get_tasks_by_due_date("2024-05-01") == [second]
+    assert reloaded.delete_task(first['id']) is True
+    assert reloaded.get_task_by_id(first['id']) is None
+    assert reloaded.add_task("任务3")['id'] == 3
+    reloaded.close()
+
+# 测试从JSON迁移到SQLite
+def test_sqlite_imports_existing_json(storage_file):
+    """测试第一次以SQLite模式打开时导入已有的JSON快照和日志"""
+    manager = TaskManager(storage_file, storage="journal")
+    manager.add_task("任务1")
+    manager.compact()
+    manager.add_task("任务2", priority="low")
+
+    migrated = TaskManager(storage_file, storage="sqlite")
+    assert [task['title'] for task in migrated.get_all_tasks()] == ["任务1", "任务2"]
+    assert migrated.get_tasks_by_priority("low")[0]['title'] == "任务2"
+    migrated.delete_task(1)
+    migrated.close()
+
+    # 数据库已存在时不再重复导入
+    reopened = TaskManager(storage_file, storage="sqlite")
+    assert len(reopened.get_all_tasks()) == 1
+    reopened.close()
+
+# 测试批量修改
+@pytest.mark.parametrize("storage", ["json", "journal"])
+def test_batch_writes_once(storage_file, storage, monkeypatch):
+    """测试批量修改期间不写文件，退出时只写一次"""
+    manager = TaskManager(storage_file, storage=storage)
+    writes = []
+    original_persist = manager._persist
+    monkeypatch.setattr(manager, "_persist", lambda record: writes.append(record) or original_persist(record))
+
+    with manager.batch():
+        for i in range(5):
+            task = manager.add_task(f"任务{i}")
+        manager.update_task(task['id'], priority="high")
+        assert writes == []
+
+    assert len(writes) == 1
+    reloaded = TaskManager(storage_file, storage=storage)
+    assert len(reloaded.get_all_tasks()) == 5
+    assert reloaded.get_tasks_by_priority("high")[0]['id'] == task['id']
+
+# 测试批量修改的回滚
+@pytest.mark.parametrize("storage", ["json", "journal", "sqlite"])
+def test_batch_rolls_back_on_error(storage_file, storage):
+    """测试批量修改中抛出异常时，所有修改都被撤销"""
+    manager = TaskManager(storage_file, storage=storage)
+    kept = manager.add_task("保留的任务")
+
+    with pytest.raises(RuntimeError):
+        with manager.batch():
+            manager.add_task("新任务")
+            manager.mark_completed(kept['id'])
+            manager.delete_task(kept['id'])
+            raise RuntimeError("中断")
+
+    assert [task['title'] for task in manager.get_all_tasks()] == ["保留的任务"]
+    assert manager.get_tasks_by_status(completed=False)[0]['id'] == kept['id']
+    assert manager.add_task("之后的任务")['id'] == 2
+    manager.close()
+
+# 测试原子写入
+def test_failed_save_keeps_previous_file(storage_file, monkeypatch):
+    """测试写入失败时，原来的任务文件保持完整，也不会留下临时文件"""
+    manager = TaskManager(storage_file)
+    manager.add_task("任务1")
+
+    def broken_fsync(fd):
+        raise OSError("磁盘已满")
+    monkeypatch.setattr(os, "fsync", broken_fsync)
+    with pytest.raises(OSError):
+        manager.add_task("任务2")
+    monkeypatch.undo()
+
+    assert [task['title'] for task in TaskManager(storage_file).get_all_tasks()] == ["任务1"]
+    # 只剩任务文件和锁文件，没有临时文件 (Only the task file and lock file remain, no temp file)
+    assert sorted(os.listdir(os.path.dirname(storage_file))) == ["tasks.json", "tasks.json.lock"]
+
+
+@pytest.mark.skipif(os.name != "posix", reason="只有POSIX系统有完整的权限位")
+def test_save_keeps_file_mode(storage_file):
+    """测试原子写入后任务文件的权限不变，新文件按umask设置"""
+    umask = os.umask(0)
+    os.umask(umask)
+    manager = TaskManager(storage_file)
+    manager.add_task("任务1")
+    assert os.stat(storage_file).st_mode & 0o777 == 0o666 & ~umask
+
+    os.chmod(storage_file, 0o640)
+    manager.add_task("任务2")
+    assert os.stat(storage_file).st_mode & 0o777 == 0o640
+
+# 测试后台保存
+def test_background_save_coalesces_writes(storage_file):
+    """测试后台保存把时间窗口内的多次保存合并为一次写入"""
+    manager = TaskManager(storage_file, background_save=True, commit_window=0.5)
+    for i in range(20):
+        manager.add_task(f"任务{i}")
+    manager.flush()
+    assert manager._writer.commits == 1
+
+    manager.mark_completed(1)
+    manager.close()
+    reloaded = TaskManager(storage_file)
+    assert len(reloaded.get_all_tasks()) == 20
+    assert reloaded.get_task_by_id(1)['completed'] is True
+
+
+def test_background_save_keeps_the_file_lock(storage_file):
+    """测试后台保存时，写完之前其他实例不能修改文件，两个实例的修改都被保存"""
+    first = TaskManager(storage_file, background_save=True, commit_window=0.2)
+    first.add_task("来自A")
+    # 加载要等第一个实例写完才能得到共享锁 (Loading waits for the first instance's write to get the shared lock)
+    second = TaskManager(storage_file, background_save=True, commit_window=0.2)
+    assert [task['title'] for task in second.get_all_tasks()] == ["来自A"]
+    second.add_task("来自B")
+    first.add_task("又来自A")
+    first.close()
+    second.close()
+
+    tasks = TaskManager(storage_file).get_all_tasks()
+    assert [(task['id'], task['title']) for task in tasks] == [(1, "来自A"), (2, "来自B"), (3, "又来自A")]
+
+# 测试二进制快照
+def test_binary_snapshot_is_detected_on_load(storage_file):
+    """测试二进制快照可以被自动识别，并且之后的保存沿用二进制格式"""
+    manager = TaskManager(storage_file, snapshot_format="binary")
+    task = manager.add_task("写周报", description=None, due_date="2024-05-01", priority="high")
+    manager.add_task("买牛奶")
+    with open(storage_file, 'rb') as file:
+        assert file.read(4) == b"TSKB"
+
+    reloaded = TaskManager(storage_file)
+    assert reloaded.snapshot_format == "binary"
+    assert reloaded.get_task_by_id(task['id']) == task
+    reloaded.mark_completed(task['id'])
+    with open(storage_file, 'rb') as file:
+        assert file.read(4) == b"TSKB"
+    assert TaskManager(storage_file).get_tasks_by_status(completed=True)[0]['title'] == "写周报"
+
+
+@pytest.mark.parametrize("snapshot_format", ["json", "binary"])
+def test_snapshot_roundtrip(snapshot_format):
+    """测试快照编码后解码得到相同的数据：None值保持为None，缺少的字段仍然缺少"""
+    import snapshot
+    data = {"next_id": 4, "revision": 7, "tasks": [
+        {"id": 1, "title": "写周报", "description": "含\0的文本", "due_date": None, "priority": "high",
+         "completed": True, "completed_at": "2024-05-01 10:00:00", "recurrence": "weekly"},
+        {"id": 2, "title": "买牛奶", "priority": "low", "completed": False},
+        {"id": 3, "title": "开会", "description": None, "created_at": "2024-05-02 09:00:00"},
+    ]}
+    assert snapshot.loads(snapshot.dumps(data, snapshot_format)) == data
+
+# 测试守护进程
+def test_daemon_serves_task_manager(storage_file):
+    """测试客户端通过守护进程操作任务，没有守护进程时直接打开任务文件"""
+    import threading
+    import daemon
+
+    assert daemon.find_daemon(storage_file) is None
+    assert isinstance(daemon.connect(storage_file), TaskManager)
+
+    server = daemon.TaskDaemon(TaskManager(storage_file), daemon.default_socket_path(storage_file))
+    thread = threading.Thread(target=server.serve_forever)
+    thread.start()
+    try:
+        client = daemon.connect(storage_file)
+        assert isinstance(client, daemon.TaskClient)
+        task = client.add_task("写周报", priority="high")
+        client.mark_completed(task['id'])
+        assert client.get_tasks_by_status(completed=True)[0]['title'] == "写周报"
+        with pytest.raises(RuntimeError):
+            client.call("_save_tasks")
+        client.shutdown()
+    finally:
+        thread.join(timeout=5)
+        server.server_close()
+
+    assert not os.path.exists(daemon.default_socket_path(storage_file))
+    assert TaskManager(storage_file).get_task_by_id(task['id'])['completed'] is True
+
+# 测试全文搜索
+@pytest.mark.parametrize("storage", ["json", "journal", "sqlite"])
+def test_search_ranks_and_follows_mutations(storage_file, storage):
+    """测试中文二元组搜索的排序，以及增删改后索引保持正确"""
+    manager = TaskManager(storage_file, storage=storage)
+    report = manager.add_task("写周报", description="整理本周工作")
+    meeting = manager.add_task("准备会议", description="会议前写周报提纲")
+    milk = manager.add_task("买牛奶", description="buy milk")
+
+    # 标题匹配排在描述匹配之前
+    assert [task['id'] for task in manager.search("周报")] == [report['id'], meeting['id']]
+    assert manager.search("MILK") == [milk]
+    assert sorted(task['id'] for task in manager.search("报")) == [report['id'], meeting['id']]
+
+    manager.update_task(milk['id'], title="写月报")
+    manager.delete_task(report['id'])
+    assert manager.search("牛奶") == []
+    assert [task['id'] for task in manager.search("周报")] == [meeting['id']]
+    manager.close()
+
+    # 重新打开时直接读取持久化的索引
+    reloaded = TaskManager(storage_file, storage=storage)
+    assert [task['title'] for task in reloaded.search("月报")] == ["写月报"]
+    assert reloaded._index_saved_revision == reloaded.store.revision
+    reloaded.close()
+
+# 测试过期的索引
+def test_stale_search_index_is_rebuilt(storage_file):
+    """测试任务文件在索引保存后被修改时，索引会重新建立"""
+    manager = TaskManager(storage_file)
+    manager.add_task("写周报")
+    manager.search("周报")
+    manager.close()
+
+    # 不加载索引的修改不会更新索引文件
+    TaskManager(storage_file).add_task("周报评审")
+
+    reloaded = TaskManager(storage_file)
+    assert len(reloaded.search("周报")) == 2
+
+# 测试索引的增量更新
+@pytest.mark.parametrize("storage", ["json", "journal", "sqlite"])
+def test_search_index_stays_current_across_managers(storage_file, storage, monkeypatch):
+    """测试没有搜索过的任务管理器修改任务后，下一个任务管理器搜索时不需要重新建立索引"""
+    from search_index import InvertedIndex
+    manager = TaskManager(storage_file, storage=storage)
+    with manager.batch():
+        for number in range(200):
+            manager.add_task(f"任务{number}", description="周报")
+    manager.search("周报")
+    manager.close()
+
+    added = []
+    original_add = InvertedIndex.add
+    monkeypatch.setattr(InvertedIndex, "add", lambda index, task: added.append(task['id']) or original_add(index, task))
+
+    writer = TaskManager(storage_file, storage=storage)
+    new_task = writer.add_task("写周报")
+    writer.close()
+    reader = TaskManager(storage_file, storage=storage)
+    assert len(reader.search("周报", limit=500)) == 201
+    reader.close()
+    # 只有新任务被加入索引 (Only the new task was indexed)
+    assert added == [new_task['id']]
+
+# 测试归档
+@pytest.mark.parametrize("storage", ["json", "sqlite"])
+def test_archive_moves_old_completed_tasks(storage_file, storage):
+    """测试完成很久的任务被移到按月分区的归档中，查询历史时仍能找到"""
+    manager = TaskManager(storage_file, storage=storage)
+    old = manager.add_task("去年的任务", priority="high")
+    recent = manager.add_task("最近的任务", priority="high")
+    pending = manager.add_task("待办任务")
+    manager.mark_completed(recent['id'])
+    manager._commit({"op": "update", "id": old['id'],
+                     "fields": {"completed": True, "completed_at": "2023-03-05 10:00:00"}})
+
+    assert manager.archive_completed(older_than_days=30) == 1
+    assert manager.archive.partitions() == ["2023-03"]
+    assert manager.store.get(old['id']) is None
+    manager.close()
+
+    reloaded = TaskManager(storage_file, storage=storage)
+    assert [task['id'] for task in reloaded.get_tasks_by_status(completed=False)] == [pending['id']]
+    assert not reloaded.archive.is_loaded()
+
+    # 需要历史数据的查询会加载归档
+    assert [task['id'] for task in reloaded.get_tasks_by_status(completed=True)] == [old['id'], recent['id']]
+    assert [task['id'] for task in reloaded.get_tasks_by_priority("high")] == [old['id'], recent['id']]
+    assert reloaded.get_task_by_id(old['id'])['title'] == "去年的任务"
+    assert len(reloaded.get_all_tasks()) == 3
+    assert reloaded.update_task(old['id'], title="改不了") is None
+    reloaded.close()
+
+# 测试性能测试结果的比较
+def test_benchmark_compare_flags_regressions(tmp_path):
+    """测试性能测试能输出可比较的结果，并标记变慢超过阈值的操作"""
+    import benchmark
+    results = benchmark.bench_operations([50], "json", 3, str(tmp_path))
+    assert {result['operation'] for result in results} >= {"load", "add_task", "print_task_list"}
+    assert all(result['min'] <= result['p50'] <= result['max'] for result in results)
+
+    baseline = {"results": results}
+    slower = {"results": [dict(result, p50=result['p50'] * 2) for result in results]}
+    assert not any(row[-1] for row in benchmark.compare_results(baseline, baseline))
+    assert all(row[-1] for row in benchmark.compare_results(baseline, slower, threshold=0.5))
+
+# 测试导入和导出
+@pytest.mark.parametrize("storage", ["json", "journal", "sqlite"])
+@pytest.mark.parametrize("transfer_format", ["jsonl", "csv"])
+def test_import_export_roundtrip(tmp_path, storage_file, storage, transfer_format):
+    """测试任务可以逐条导出再分批导入，导入时每批只持久化一次，JSON模式整个导入只写一次"""
+    import transfer
+    from task_manager import main
+    source = TaskManager(storage_file, storage=storage)
+    source.add_task("写周报", "每周五", "2024-06-07", "high")
+    source.mark_completed(source.add_task("买牛奶")['id'])
+    source.add_task("修复bug", priority="low")
+    source.close()
+
+    dump = str(tmp_path / f"tasks.{transfer_format}")
+    main(["--storage-file", storage_file, "--storage", storage, "export", dump])
+    with open(dump, 'r', encoding='utf-8', newline='') as file:
+        records = list(transfer.read_tasks(file, transfer_format))
+    assert [record['title'] for record in records] == ["写周报", "买牛奶", "修复bug"]
+
+    target_file = str(tmp_path / "target.json")
+    target = TaskManager(target_file, storage=storage)
+    revision = target.store.revision
+    assert target.import_tasks(iter(records), batch_size=2) == 3
+    if storage == "journal":
+        # 3个任务分两批写入 (Three tasks written in two batches)
+        assert target.store.revision == revision + 2
+    elif storage == "json":
+        # 每次写入都重写整个文件，只在导入结束时写一次 (Every write rewrites the file, so only one at the end)
+        assert target.store.revision == revision + 1
+    target.close()
+
+    reloaded = TaskManager(target_file, storage=storage)
+    tasks = reloaded.get_all_tasks()
+    assert [task['id'] for task in tasks] == [1, 2, 3]
+    assert tasks[0]['due_date'] == "2024-06-07" and tasks[0]['priority'] == "high"
+    assert [task['completed'] for task in tasks] == [False, True, False]
+    assert tasks[2]['description'] == ""
+    reloaded.close()
+
+# 测试非交互式子命令
+def test_cli_subcommands(storage_file, capsys):
+    """测试add、list、done、rm和search子命令，输出不是终端时不带颜色代码"""
+    from task_manager import main
+    assert main(["--storage-file", storage_file, "add", "写周报", "--due", "2024-06-07", "-p", "high"]) == 0
+    assert main(["--storage-file", storage_file, "add", "买牛奶"]) == 0
+    assert main(["--storage-file", storage_file, "done", "1"]) == 0
+    capsys.readouterr()
+
+    assert main(["--storage-file", storage_file, "list"]) == 0
+    output = capsys.readouterr().out
+    assert "#2 - 买牛奶" in output and "#1" not in output
+    assert "\033[" not in output
+
+    assert main(["--storage-file", storage_file, "search", "周报"]) == 0
+    assert "#1 - 写周报" in capsys.readouterr().out
+
+    assert main(["--storage-file", storage_file, "rm", "2"]) == 0
+    assert main(["--storage-file", storage_file, "rm", "2"]) == 1
+    assert main(["--storage-file", storage_file, "add", "坏日期", "--due", "明天"]) == 2
+    assert [task['id'] for task in TaskManager(storage_file).get_all_tasks()] == [1]
+
+# 测试分页列出任务
+@pytest.mark.parametrize("storage", ["json", "sqlite"])
+def test_list_paging(storage_file, storage, capsys):
+    """测试--limit/--offset只显示一页，iter_filtered按需读取并合并归档任务"""
+    from task_manager import main
+    manager = TaskManager(storage_file, storage=storage)
+    for i in range(1, 8):
+        manager.add_task(f"任务{i}", priority="high" if i % 2 else "low")
+    for task_id in (1, 2, 3):
+        manager.mark_completed(task_id)
+    if storage == "json":
+        manager.archive_completed(older_than_days=0)
+
+    assert [task['id'] for task in manager.list_tasks("all", offset=2, limit=3)] == [3, 4, 5]
+    assert [task['id'] for task in manager.list_tasks("completed", "high")] == [1, 3]
+    tasks = manager.iter_filtered("pending")
+    assert next(tasks)['id'] == 4
+    manager.close()
+
+    argv = ["--storage-file", storage_file, "--storage", storage, "list", "--status", "all"]
+    assert main(argv + ["-n", "3", "--offset", "3"]) == 0
+    output = capsys.readouterr().out
+    assert [line.split(" - ")[0][-2:] for line in output.splitlines() if " - " in line] == ["#4", "#5", "#6"]
+    assert "--offset 6" in output
+    assert main(argv + ["-n", "3", "--offset", "6"]) == 0
+    assert "--offset" not in capsys.readouterr().out
+
+
+@pytest.mark.parametrize("storage", ["json", "sqlite"])
+def test_list_overdue_honours_priority(storage_file, storage, capsys):
+    """测试列出过期任务时也按--priority过滤，分页在过滤之后进行"""
+    from task_manager import main
+    manager = TaskManager(storage_file, storage=storage)
+    for i in range(1, 6):
+        manager.add_task(f"任务{i}", due_date=f"2024-01-0{i}", priority="high" if i % 2 else "low")
+    manager.add_task("未过期", due_date="2999-01-01", priority="high")
+    manager.close()
+
+    argv = ["--storage-file", storage_file, "--storage", storage, "list", "--status", "overdue", "-p", "high"]
+    assert main(argv + ["-n", "2", "--offset", "1"]) == 0
+    output = capsys.readouterr().out
+    assert [line.split(" - ")[0][-2:] for line in output.splitlines() if " - " in line] == ["#3", "#5"]
+
+# 测试任务列表按页写出
+def test_print_task_list_writes_pages(monkeypatch):
+    """测试每页任务只调用一次write，生成器只被读取需要的部分"""
+    import io
+    import task_manager
+    monkeypatch.setattr(task_manager, "PAGE_SIZE", 2)
+    stream = io.StringIO()
+    writes = []
+    monkeypatch.setattr(stream, "write", writes.append)
+    tasks = ({"id": i, "title": f"任务{i}", "priority": "low", "completed": False} for i in range(5))
+    assert task_manager.print_task_list(tasks, "标题", stream) == 5
+    assert len(writes) == 3
+    assert "#4 - 任务4" in writes[-1]
+
+# 测试按截止日期和优先级排序的视图
+@pytest.mark.parametrize("storage", ["json", "sqlite"])
+def test_next_due_top_priority_and_overdue(storage_file, storage):
+    """测试有序视图在修改后仍然正确，已完成的任务不出现在结果中"""
+    manager = TaskManager(storage_file, storage=storage)
+    late = manager.add_task("逾期", due_date="2024-01-05", priority="low")
+    soon = manager.add_task("本周", due_date="2024-03-01", priority="high")
+    later = manager.add_task("下月", due_date="2024-04-01", priority="high")
+    undated = manager.add_task("无日期", priority="medium")
+    done = manager.add_task("已完成", due_date="2024-01-01", priority="high")
+    manager.mark_completed(done['id'])
+
+    def ids(tasks):
+        return [task['id'] for task in tasks]
+
+    assert ids(manager.next_due(2)) == [late['id'], soon['id']]
+    assert ids(manager.top_priority(10)) == [soon['id'], later['id'], undated['id'], late['id']]
+    assert ids(manager.overdue("2024-03-01")) == [late['id']]
+
+    # 视图建立之后的修改也要反映出来 (Changes after the views are built must show up)
+    manager.update_task(later['id'], due_date="2024-02-01")
+    manager.mark_completed(late['id'])
+    manager.delete_task(soon['id'])
+    early = manager.add_task("新任务", due_date="2023-12-31", priority="low")
+    assert ids(manager.next_due(10)) == [early['id'], later['id']]
+    assert ids(manager.top_priority(1)) == [later['id']]
+    assert ids(manager.overdue("2024-03-01")) == [early['id'], later['id']]
+    manager.close()
+
+# 测试任务统计
+@pytest.mark.parametrize("storage", ["json", "sqlite"])
+def test_stats(storage_file, storage):
+    """测试统计摘要，计数器随修改增量更新，结果与重新加载后一遍计算的相同"""
+    manager = TaskManager(storage_file, storage=storage)
+    first = manager.add_task("写周报", due_date="2024-01-05", priority="high")
+    manager.add_task("交材料", due_date="2024-01-10", priority="high")
+    third = manager.add_task("买牛奶", priority="low")
+    fourth = manager.add_task("读书")
+    manager.mark_completed(first['id'])
+    manager.update_task(first['id'], completed_at="2024-01-03 09:00:00")
+    manager.mark_completed(third['id'])
+    manager.update_task(third['id'], completed_at="2024-01-09 18:00:00")
+
+    summary = manager.stats(today="2024-03-01")
+    assert (summary['total'], summary['completed'], summary['pending'], summary['overdue']) == (4, 2, 2, 1)
+    assert summary['completion_rate'] == 0.5
+    assert summary['by_priority']['high'] == {"pending": 1, "completed": 1}
+    assert summary['by_priority']['medium'] == {"pending": 1, "completed": 0}
+    assert summary['completed_per_week'] == {"2024-W01": 1, "2024-W02": 1}
+
+    # 统计建立之后的修改 (Changes after the counters are built)
+    manager.delete_task(third['id'])
+    manager.mark_completed(fourth['id'])
+    manager.update_task(fourth['id'], completed_at="2024-01-04 12:00:00")
+    if storage == "json":
+        assert manager.archive_completed(older_than_days=0) == 2
+    summary = manager.stats(today="2024-03-01")
+    assert summary['completed_per_week'] == {"2024-W01": 2}
+    assert summary['by_priority']['low'] == {"pending": 0, "completed": 0}
+    manager.close()
+
+    assert TaskManager(storage_file, storage=storage).stats(today="2024-03-01") == summary
+
+# 测试重复任务
+@pytest.mark.parametrize("storage", ["json", "journal", "sqlite"])
+def test_recurring_tasks(storage_file, storage):
+    """测试重复任务只保存一条记录，未来各次在查询时生成，完成时只保存完成的这一次"""
+    manager = TaskManager(storage_file, storage=storage)
+    weekly = manager.add_task("倒垃圾", due_date="2024-06-03", recurrence="weekly")
+    manager.add_task("交报告", due_date="2024-06-05")
+    assert weekly['recurrence'] == "weekly"
+
+    def agenda():
+        return [(task['due_date'], task['title']) for task in manager.upcoming("2024-06-17", today="2024-06-01")]
+
+    assert agenda() == [("2024-06-03", "倒垃圾"), ("2024-06-05", "交报告"),
+                        ("2024-06-10", "倒垃圾"), ("2024-06-17", "倒垃圾")]
+
+    done = manager.mark_completed(weekly['id'])
+    assert (done['due_date'], done['completed'], done['recurrence_of']) == ("2024-06-03", True, weekly['id'])
+    assert 'recurrence' not in done
+    assert manager.get_task_by_id(weekly['id'])['due_date'] == "2024-06-10"
+    assert len(manager.get_all_tasks()) == 3
+    manager.close()
+
+    reloaded = TaskManager(storage_file, storage=storage)
+    upcoming = [task['due_date'] for task in reloaded.upcoming("2024-06-17", today="2024-06-01") if task['title'] == "倒垃圾"]
+    assert upcoming == ["2024-06-10", "2024-06-17"]
+    assert len(reloaded.get_all_tasks()) == 3
+    reloaded.close()
+
+# 测试过期的重复任务
+@pytest.mark.parametrize("storage", ["json", "sqlite"])
+def test_overdue_recurring_tasks_keep_their_schedule(storage_file, storage):
+    """测试过期的重复任务未来各次仍在原来的星期几和每月的日期，而不是从今天开始"""
+    manager = TaskManager(storage_file, storage=storage)
+    # 2026-10-07是星期三，2026-10-18是星期日 (2026-10-07 is a Wednesday, 2026-10-18 a Sunday)
+    manager.add_task("周会", due_date="2026-10-07", recurrence="weekly")
+    manager.add_task("交房租", due_date="2026-09-05", recurrence="monthly")
+
+    agenda = [(task['title'], task['due_date'])
+              for task in manager.upcoming("2026-11-10", today="2026-10-18")]
+    assert [day for title, day in agenda if title == "周会"] == ["2026-10-21", "2026-10-28", "2026-11-04"]
+    assert [day for title, day in agenda if title == "交房租"] == ["2026-11-05"]
+    manager.close()
+
+# 测试重复规则
+def test_recurrence_rules(storage_file):
+    """测试每月规则在短月份取月末，cron规则按星期匹配，不可能的规则被拒绝"""
+    import itertools
+    import recurrence
+    monthly = recurrence.normalize("monthly", "2024-01-31")
+    assert list(itertools.islice(recurrence.occurrences(monthly, "2024-01-31"), 3)) == ["2024-01-31", "2024-02-29", "2024-03-31"]
+    assert recurrence.next_occurrence("0 9 * * 1-5", "2024-06-07") == "2024-06-10"
+    with pytest.raises(ValueError):
+        recurrence.normalize("every tuesday", "2024-06-07")
+    with pytest.raises(ValueError):
+        TaskManager(storage_file).add_task("不可能", due_date="2024-01-01", recurrence="0 0 30 2 *")
+
+# 测试多项目工作区
+@pytest.mark.parametrize("executor", ["thread", "process"])
+def test_workspace(tmp_path, executor):
+    """测试工作区合并各项目的查询结果，只重新加载变化过的项目"""
+    from workspace import Workspace
+    for name, due_dates in (("website", ["2024-06-03", "2024-06-10"]), ("backend", ["2024-06-05"]), ("docs", [])):
+        manager = TaskManager(str(tmp_path / f"{name}.json"))
+        for due_date in due_dates:
+            manager.add_task(f"{name}任务", due_date=due_date)
+        manager.close()
+
+    workspace = Workspace(directory=str(tmp_path), executor=executor, max_workers=2)
+    due = [(name, task['due_date']) for name, task in workspace.due("2024-06-07")]
+    assert due == [("website", "2024-06-03"), ("backend", "2024-06-05")]
+    assert [name for name, _ in workspace.next_due(2)] == ["website", "backend"]
+    assert workspace.refresh() == 0
+
+    # 只有修改过的项目会重新加载，删除的项目被丢弃 (Only changed projects reload, removed ones are dropped)
+    manager = TaskManager(str(tmp_path / "docs.json"))
+    manager.add_task("写文档", due_date="2024-06-01")
+    manager.close()
+    os.remove(tmp_path / "website.json")
+    assert workspace.refresh() == 1
+    assert [(name, task['due_date']) for name, task in workspace.due("2024-06-07")] == [
+        ("docs", "2024-06-01"), ("backend", "2024-06-05")]
+
+# 测试共享读锁
+def test_loading_takes_a_shared_lock(storage_file, monkeypatch):
+    """测试加载任务只加共享锁，不会等待其他读取者；无法创建锁文件时不加锁读取"""
+    import errno
+    import threading
+    import persistence
+    if persistence.fcntl is None:
+        pytest.skip("需要flock (Needs flock)")
+    manager = TaskManager(storage_file)
+    manager.add_task("写周报")
+    manager.close()
+
+    # 另一个读取者持有共享锁时，加载不需要等待 (Loading does not wait for another reader's shared lock)
+    reader = persistence.FileLock(storage_file + ".lock")
+    loaded = []
+    with reader.shared():
+        thread = threading.Thread(target=lambda: loaded.append(TaskManager(storage_file).get_all_tasks()))
+        thread.start()
+        thread.join(5)
+        assert not thread.is_alive()
+    thread.join()
+    assert [task['title'] for task in loaded[0]] == ["写周报"]
+
+    # 模拟不能写入的目录：锁文件无法创建 (Simulate an unwritable directory: the lock file cannot be created)
+    os.remove(storage_file + ".lock")
+
+    def read_only_open(path, mode='r', *args, **kwargs):
+        if path.endswith(".lock") and mode != 'rb':
+            raise PermissionError(errno.EACCES, "Permission denied", path)
+        return open(path, mode, *args, **kwargs)
+
+    monkeypatch.setattr(persistence, "open", read_only_open, raising=False)
+    manager = TaskManager(storage_file)
+    assert [task['title'] for task in manager.get_all_tasks()] == ["写周报"]
+    with pytest.raises(PermissionError):
+        manager.add_task("不能保存")
+    assert not os.path.exists(storage_file + ".lock")
+
+# 测试工作区不修改项目
+def test_workspace_is_read_only(tmp_path):
+    """测试工作区加载项目时不创建锁文件、不合并日志，也拒绝SQLite存储"""
+    from workspace import Workspace
+    project = tmp_path / "website.json"
+    manager = TaskManager(str(project), storage="journal", compact_threshold=100)
+    manager.add_task("首页改版", due_date="2024-06-03")
+    manager.compact()
+    manager.add_task("修复登录", due_date="2024-06-04")
+    manager.close()
+    os.remove(str(project) + ".lock")
+
+    # 项目目录设为只读；留下的日志在普通JSON模式打开时会被合并
+    # (Make the project directory read-only; the leftover journal would be compacted by a normal JSON-mode open)
+    before = {path.name: (path.stat().st_mtime_ns, path.read_bytes()) for path in tmp_path.iterdir()}
+    os.chmod(tmp_path, 0o555)
+    try:
+        workspace = Workspace(directory=str(tmp_path), max_workers=1)
+        assert [task['title'] for _, task in workspace.due("2024-06-30")] == ["首页改版", "修复登录"]
+    finally:
+        os.chmod(tmp_path, 0o755)
+    assert {path.name: (path.stat().st_mtime_ns, path.read_bytes()) for path in tmp_path.iterdir()} == before
+
+    with pytest.raises(PermissionError):
+        TaskManager(str(project), read_only=True).add_task("不能添加")
+    with pytest.raises(ValueError):
+        Workspace(directory=str(tmp_path), storage="sqlite")
+
+# 测试紧凑的任务记录
+@pytest.mark.parametrize("storage", ["json", "journal"])
+@pytest.mark.parametrize("snapshot_format", ["json", "binary"])
+def test_compact_records(storage_file, storage, snapshot_format):
+    """测试紧凑模式下任务用Task对象保存，访问方式和持久化结果与字典相同"""
+    from task_record import Task
+    manager = TaskManager(storage_file, storage=storage, snapshot_format=snapshot_format, compact_records=True)
+    task = manager.add_task("写周报", "周五前", "2024-06-07", "high")
+    manager.mark_completed(task['id'])
+    manager.add_task("买牛奶")
+    manager.compact()
+    manager.close()
+
+    reloaded = TaskManager(storage_file, storage=storage, compact_records=True)
+    stored = reloaded.get_task_by_id(task['id'])
+    assert isinstance(stored, Task)
+    assert stored['title'] == "写周报" and stored.get('completed') is True
+    assert stored.get('missing', "默认") == "默认" and 'missing' not in stored
+    assert dict(stored) == dict(TaskManager(storage_file, storage=storage).get_task_by_id(task['id']))
+    assert json.loads(json.dumps(reloaded.get_all_tasks(), default=dict))[1]['title'] == "买牛奶"
+
+    # 取值很少的字段被驻留，所有任务共用同一个字符串 (Low-cardinality fields are interned)
+    other = reloaded.add_task("另一个", priority="".join(["hi", "gh"]))
+    assert other['priority'] is not stored['priority']
+    assert reloaded.store.get(other['id'])['priority'] is stored['priority']
+    reloaded.close()
+
+# 测试多个进程同时使用同一个任务文件
+def _add_tasks_in_process(storage_file, storage, prefix, count):
+    """在子进程中添加任务 (Add tasks from a child process)"""
+    manager = TaskManager(storage_file, storage=storage, durability="off")
+    for i in range(count):
+        manager.add_task(f"{prefix}-{i}")
+    manager.close()
+
+
+@pytest.mark.parametrize("storage", ["json", "journal", "sqlite"])
+def test_concurrent_processes_do_not_clobber(storage_file, storage):
+    """测试多个进程同时添加任务时，所有任务都被保存且ID不重复"""
+    import multiprocessing
+    processes = [multiprocessing.Process(target=_add_tasks_in_process, args=(storage_file, storage, name, 25))
+                 for name in ("a", "b", "c")]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+        assert process.exitcode == 0
+
+    tasks = TaskManager(storage_file, storage=storage).get_all_tasks()
+    assert len(tasks) == 75
+    assert sorted(task['id'] for task in tasks) == list(range(1, 76))
+
+
+def test_sqlite_stores_share_one_database(storage_file):
+    """测试两个实例交替向同一个数据库添加任务时ID不重复，已有的任务不会被覆盖"""
+    import sqlite3
+    first = TaskManager(storage_file, storage="sqlite")
+    second = TaskManager(storage_file, storage="sqlite")
+    first.add_task("来自A")
+    second.add_task("来自B")
+    first.add_task("又来自A")
+
+    assert [(task['id'], task['title']) for task in second.get_all_tasks()] == [
+        (1, "来自A"), (2, "来自B"), (3, "又来自A")]
+    # 数据版本号反映两个实例的全部修改 (The revision reflects the changes of both instances)
+    assert first.store.revision == second.store.revision == 3
+    with pytest.raises(sqlite3.IntegrityError):
+        second.store.put({"id": 1, "title": "覆盖"})
+    assert first.get_task_by_id(1)['title'] == "来自A"
+
+
+@pytest.mark.parametrize("storage", ["json", "journal"])
+def test_reload_only_when_file_changed(storage_file, storage, monkeypatch):
+    """测试文件没有变化时读取不重新解析，被其他实例修改后自动重新加载"""
+    reader = TaskManager(storage_file, storage=storage)
+    writer = TaskManager(storage_file, storage=storage)
+    writer.add_task("写周报")
+
+    reloads = []
+    original = TaskManager._read_snapshot
+    monkeypatch.setattr(TaskManager, "_read_snapshot", lambda self: reloads.append(1) or original(self))
+
+    assert [task['title'] for task in reader.get_all_tasks()] == ["写周报"]
+    assert [task['title'] for task in reader.get_all_tasks()] == ["写周报"]
+    assert len(reloads) == 1
+
+    # 读取方的修改不会覆盖写入方的修改 (The reader's change does not overwrite the writer's)
+    writer.add_task("买牛奶")
+    reader.mark_completed(1)
+    assert len(reloads) == 2
+    assert [(task['title'], task['completed']) for task in writer.get_all_tasks()] == [("写周报", True), ("买牛奶", False)]
+
+# 测试压缩的任务文件
+@pytest.mark.parametrize("extension", [".gz", ".xz"])
+@pytest.mark.parametrize("storage", ["json", "journal"])
+def test_compressed_storage(tmp_path, extension, storage):
+    """测试按扩展名透明压缩任务文件，导出文件也可以压缩"""
+    import gzip
+    import lzma
+    from task_manager import main
+    storage_file = str(tmp_path / ("tasks.json" + extension))
+    manager = TaskManager(storage_file, storage=storage)
+    for i in range(50):
+        manager.add_task(f"整理文档 {i}", "重复的描述" * 5)
+    manager.compact()
+    manager.close()
+
+    opener = gzip.open if extension == ".gz" else lzma.open
+    with opener(storage_file, 'rb') as file:
+        assert len(json.loads(file.read())["tasks"]) == 50
+    assert os.path.getsize(storage_file) < 5000
+
+    reloaded = TaskManager(storage_file, storage=storage)
+    assert len(reloaded.get_all_tasks()) == 50
+    reloaded.close()
+
+    dump = str(tmp_path / ("tasks.csv" + extension))
+    main(["--storage-file", storage_file, "--storage", storage, "export", dump])
+    with opener(dump, 'rt', encoding='utf-8') as file:
+        assert file.readline().startswith("id,title")
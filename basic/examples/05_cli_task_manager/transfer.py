@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+任务的导入与导出 (transfer)
+以JSONL (每行一个JSON对象) 或CSV格式逐条读写任务。
+读写都通过生成器进行，任何时候内存中只有一条记录，可以处理上百万条任务的文件。
+
+CSV文件的第一行是表头，列为FIELDS中的字段；
+JSONL格式保留任务的所有字段。
+(A CSV file starts with a header row of the FIELDS columns; JSONL keeps every field of a task.)
+"""
+
+import csv
+import json
+
+import compression
+from task_record import to_dict
+
+FORMATS = ("jsonl", "csv")
+
+# CSV的列 (CSV columns)
+FIELDS = ("id", "title", "description", "created_at", "due_date", "priority", "completed", "completed_at")
+
+
+def detect_format(path):
+    """
+    根据文件扩展名判断格式，默认为JSONL；压缩扩展名会被忽略，例如tasks.csv.gz是CSV
+    (Detect the format from the file extension, JSONL by default; a
+    compression extension is ignored, so tasks.csv.gz is CSV)
+
+    参数:
+        path (str): 文件路径
+
+    返回:
+        str: "csv"或"jsonl"
+    """
+    return "csv" if compression.strip_extension(path).lower().endswith(".csv") else "jsonl"
+
+
+def read_tasks(file, transfer_format="jsonl"):
+    """
+    逐条读取任务记录
+    (Read task records one at a time)
+
+    参数:
+        file: 以文本模式打开的文件
+        transfer_format (str): "jsonl"或"csv"
+
+    返回:
+        generator: 任务字典
+
+    异常:
+        ValueError: 某一行无法解析
+    """
+    if transfer_format == "csv":
+        for row in csv.DictReader(file):
+            yield _from_csv_row(row)
+        return
+
+    for line_number, line in enumerate(file, 1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"第 {line_number} 行不是有效的JSON (Line {line_number} is not valid JSON): {e}") from e
+        if not isinstance(record, dict):
+            raise ValueError(f"第 {line_number} 行不是任务对象 (Line {line_number} is not a task object)")
+        yield record
+
+
+def write_tasks(tasks, file, transfer_format="jsonl"):
+    """
+    逐条写出任务记录
+    (Write task records one at a time)
+
+    参数:
+        tasks (iterable): 任务，可以是生成器
+        file: 以文本模式打开的文件
+        transfer_format (str): "jsonl"或"csv"
+
+    返回:
+        int: 写出的任务数
+    """
+    count = 0
+    if transfer_format == "csv":
+        writer = csv.DictWriter(file, fieldnames=FIELDS, extrasaction="ignore")
+        writer.writeheader()
+        for task in tasks:
+            writer.writerow(task)
+            count += 1
+        return count
+
+    for task in tasks:
+        file.write(json.dumps(task, ensure_ascii=False, separators=(',', ':'), default=to_dict))
+        file.write("\n")
+        count += 1
+    return count
+
+
+def _from_csv_row(row):
+    """
+    把CSV中的字符串还原为任务字段的类型
+    (Convert the strings of a CSV row back to task field types)
+    """
+    task = {key: (value if value != "" else None) for key, value in row.items() if key in FIELDS}
+    if task.get('id') is not None:
+        task['id'] = int(task['id'])
+    task['completed'] = (task.get('completed') or "").lower() in ("true", "1", "yes")
+    return task
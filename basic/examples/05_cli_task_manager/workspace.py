@@ -0,0 +1,321 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+多项目工作区 (workspace)
+每个项目一个任务文件，工作区把许多任务文件放在一起查询。
+任务文件在线程池或进程池中并行加载和解析；解析结果按文件指纹缓存，
+文件没有变化时再次查询只需要对每个文件调用stat。
+跨项目的查询结果用heapq.merge逐个合并，不构建完整的结果列表。
+
+用法 (Usage):
+    python workspace.py projects/ due --days 7       # 所有项目一周内到期的任务 (due within a week)
+    python workspace.py projects/ next -n 20         # 截止日期最近的任务 (nearest due dates)
+    python workspace.py projects/ --processes overdue
+"""
+
+import os
+import sys
+import glob
+import heapq
+import argparse
+import datetime
+import itertools
+import concurrent.futures
+
+import compression
+import recurrence
+from persistence import file_state
+from task_store import PRIORITY_RANK, due_key
+
+EXECUTORS = ("thread", "process")
+
+
+def project_name(path):
+    """
+    返回任务文件对应的项目名，例如 "projects/website.json.gz" -> "website"
+    (Return the project name of a task file, e.g. "projects/website.json.gz" -> "website")
+    """
+    name = os.path.basename(compression.strip_extension(path))
+    return os.path.splitext(name)[0] or name
+
+
+def project_fingerprint(path):
+    """
+    返回任务文件和日志的 (inode, 大小, 修改时间)，任何一个变化都说明需要重新解析
+    (Return (inode, size, mtime) of a task file and its journal; a change in
+    either means the project must be parsed again)
+    """
+    return file_state(path), file_state(path + ".journal")
+
+
+def load_project(path, manager_options):
+    """
+    加载一个项目并返回它的任务存储，在线程池或子进程中运行
+    指纹在加载前读取，加载期间文件被修改时，下次查询会发现指纹不同并重新加载
+    (Load one project and return its task store; runs in a pool thread or a
+    child process. The fingerprint is read before loading, so a file changed
+    during the load is noticed by the next query and loaded again)
+
+    参数:
+        path (str): 任务文件路径
+        manager_options (dict): 传给TaskManager的参数
+
+    返回:
+        tuple: (指纹, TaskStore)
+    """
+    from task_manager import TaskManager
+
+    fingerprint = project_fingerprint(path)
+    # 只读打开：不创建锁文件，也不合并日志 (Open read-only: no lock file, no journal compaction)
+    manager = TaskManager(path, **dict(manager_options, read_only=True))
+    try:
+        return fingerprint, manager.store
+    finally:
+        manager.close()
+
+
+class Workspace:
+    """
+    多项目工作区类
+    (Multi-project workspace)
+
+    工作区是只读的：项目以只读方式加载，不会在项目目录中创建锁文件或合并日志；
+    修改任务仍然通过每个项目的TaskManager进行。查询结果是 (项目名, 任务) 元组。
+    (A workspace is read-only: projects are loaded read-only, so no lock files
+    are created and no journals are compacted in the project directories;
+    changes still go through each project's TaskManager. Query results are
+    (project name, task) tuples.)
+    """
+
+    def __init__(self, task_files=(), directory=None, pattern="*.json", executor="thread",
+                 max_workers=None, **manager_options):
+        """
+        参数:
+            task_files (iterable): 任务文件路径
+            directory (str, optional): 项目目录，每次查询前重新列出其中匹配pattern的文件
+            pattern (str): 项目目录中任务文件的通配符
+            executor (str): "thread"用线程池加载，"process"用进程池加载；
+                JSON解析受GIL限制，文件很多或很大时进程池更快
+            max_workers (int, optional): 并行加载的线程或进程数，默认线程池为CPU数+4、进程池为CPU数；
+                为1时在当前线程中依次加载
+            **manager_options: 加载项目时传给TaskManager的参数，例如storage="journal"；
+                不支持storage="sqlite"，指纹只跟踪任务文件和日志
+
+        异常:
+            ValueError: 未知的executor，或storage为"sqlite"
+        """
+        if executor not in EXECUTORS:
+            raise ValueError(f"未知的执行器 (Unknown executor): {executor}")
+        if manager_options.get("storage") == "sqlite":
+            raise ValueError("工作区不支持SQLite存储 (Workspaces do not support SQLite storage)")
+        self.task_files = [os.path.abspath(path) for path in task_files]
+        self.directory = directory
+        self.pattern = pattern
+        self.executor = executor
+        cpus = os.cpu_count() or 1
+        self.max_workers = max_workers or (min(32, cpus + 4) if executor == "thread" else cpus)
+        self.manager_options = manager_options
+        # 任务文件路径 -> (指纹, TaskStore) (Task file path -> (fingerprint, TaskStore))
+        self._cache = {}
+
+    def paths(self):
+        """
+        返回工作区中的所有任务文件路径
+        (Return the paths of every task file in the workspace)
+
+        返回:
+            list: 任务文件路径，按路径排序
+        """
+        paths = set(self.task_files)
+        if self.directory is not None:
+            paths.update(os.path.abspath(path) for path in glob.glob(os.path.join(self.directory, self.pattern)))
+        return sorted(paths)
+
+    def refresh(self):
+        """
+        并行加载新增或变化过的项目，丢弃已删除的项目
+        (Load new or changed projects in parallel and drop removed ones)
+
+        返回:
+            int: 重新加载的项目数
+        """
+        fingerprints = {path: project_fingerprint(path) for path in self.paths()}
+        stale = [path for path, fingerprint in fingerprints.items()
+                 if path not in self._cache or self._cache[path][0] != fingerprint]
+        for path, state in zip(stale, self._load(stale)):
+            self._cache[path] = state
+        for path in set(self._cache) - fingerprints.keys():
+            del self._cache[path]
+        return len(stale)
+
+    def _load(self, paths):
+        """加载多个项目，返回 (指纹, TaskStore) 的列表 (Load several projects into a list of (fingerprint, TaskStore))"""
+        options = itertools.repeat(self.manager_options)
+        if len(paths) <= 1 or self.max_workers == 1:
+            return list(map(load_project, paths, options))
+
+        if self.executor == "thread":
+            with concurrent.futures.ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+                return list(pool.map(load_project, paths, options))
+        workers = min(self.max_workers, len(paths))
+        # 每个子进程一次领取多个文件，减少进程间通信的次数 (Hand each child several files at a time to cut IPC round trips)
+        chunksize = max(1, len(paths) // (workers * 4))
+        with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as pool:
+            return list(pool.map(load_project, paths, options, chunksize=chunksize))
+
+    def projects(self):
+        """
+        刷新后返回每个项目的任务存储
+        (Refresh, then return the task store of every project)
+
+        返回:
+            list: (项目名, TaskStore) 列表，按路径排序
+        """
+        self.refresh()
+        names = {}
+        projects = []
+        for path in sorted(self._cache):
+            name = project_name(path)
+            # 不同目录中的同名文件用完整路径区分 (Same-named files in different directories are told apart by path)
+            name = path if names.setdefault(name, path) != path else name
+            projects.append((name, self._cache[path][1]))
+        return projects
+
+    def iter_tasks(self):
+        """
+        逐个返回所有项目的任务
+        (Yield the tasks of every project one at a time)
+
+        返回:
+            generator: (项目名, 任务)
+        """
+        for name, store in self.projects():
+            for task in store:
+                yield name, task
+
+    def due(self, until, since=None):
+        """
+        按截止日期逐个返回所有项目中截止日期不晚于until的待办任务，包括重复任务未来的各次
+        (Yield pending tasks of every project due no later than until, in due
+        date order, including future occurrences of recurring tasks)
+
+        参数:
+            until (str): 最后一天，格式为YYYY-MM-DD
+            since (str, optional): 第一天；为None时包括所有过期任务
+
+        返回:
+            generator: (项目名, 任务)
+        """
+        streams = [self._tagged(name, recurrence.upcoming(store, until, since)) for name, store in self.projects()]
+        return self._merge(streams, lambda task: (task['due_date'],))
+
+    def next_due(self, k=10):
+        """
+        返回所有项目中截止日期最近的k个待办任务
+        (Return the k pending tasks with the nearest due dates across all projects)
+
+        返回:
+            list: (项目名, 任务) 列表
+        """
+        streams = [self._tagged(name, store.next_due(k)) for name, store in self.projects()]
+        return list(itertools.islice(self._merge(streams, lambda task: (due_key(task.get('due_date')),)), k))
+
+    def top_priority(self, k=10):
+        """
+        返回所有项目中优先级最高的k个待办任务，相同优先级按截止日期排序
+        (Return the k highest-priority pending tasks across all projects, ties broken by due date)
+
+        返回:
+            list: (项目名, 任务) 列表
+        """
+        def order(task):
+            return PRIORITY_RANK.get(task.get('priority'), len(PRIORITY_RANK)), due_key(task.get('due_date'))
+
+        streams = [self._tagged(name, store.top_priority(k)) for name, store in self.projects()]
+        return list(itertools.islice(self._merge(streams, order), k))
+
+    def overdue(self, today=None):
+        """
+        按截止日期逐个返回所有项目中已过截止日期的待办任务
+        (Yield overdue pending tasks of every project in due date order)
+
+        参数:
+            today (str, optional): 今天的日期，格式为YYYY-MM-DD，默认为当天
+
+        返回:
+            generator: (项目名, 任务)
+        """
+        today = today or datetime.date.today().strftime("%Y-%m-%d")
+        streams = [self._tagged(name, store.overdue(today)) for name, store in self.projects()]
+        return self._merge(streams, lambda task: (task['due_date'],))
+
+    @staticmethod
+    def _tagged(name, tasks):
+        """给每个任务加上项目名 (Tag each task with its project name)"""
+        return ((name, task) for task in tasks)
+
+    @staticmethod
+    def _merge(streams, order):
+        """按order(任务)、项目名和任务ID合并各项目已排序的结果 (Merge per-project sorted results by order(task), project and task ID)"""
+        return heapq.merge(*streams, key=lambda item: (*order(item[1]), item[0], item[1]['id']))
+
+
+def main(argv=None):
+    """
+    命令行入口
+    (Command line entry point)
+
+    返回:
+        int: 退出状态
+    """
+    parser = argparse.ArgumentParser(description="多项目工作区 (Multi-project workspace)")
+    parser.add_argument("directory", help="项目目录 (Project directory)")
+    parser.add_argument("--pattern", default="*.json", help="任务文件的通配符 (Task file pattern)")
+    parser.add_argument("--storage", choices=("json", "journal"), default="json", help="存储模式 (Storage mode)")
+    parser.add_argument("--processes", action="store_true", help="用进程池加载 (Load with a process pool)")
+    parser.add_argument("--workers", type=int, help="并行加载数 (Parallel loaders)")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    due_parser = subparsers.add_parser("due", help="即将到期和已过期的任务 (Tasks due soon or overdue)")
+    due_parser.add_argument("--days", type=int, default=7, help="天数，默认为7 (Number of days, 7 by default)")
+    next_parser = subparsers.add_parser("next", help="截止日期最近的任务 (Nearest due dates)")
+    next_parser.add_argument("-n", "--limit", type=int, default=10, help="任务数 (Number of tasks)")
+    priority_parser = subparsers.add_parser("priority", help="优先级最高的任务 (Highest priority)")
+    priority_parser.add_argument("-n", "--limit", type=int, default=10, help="任务数 (Number of tasks)")
+    subparsers.add_parser("overdue", help="已过期的任务 (Overdue tasks)")
+    args = parser.parse_args(argv)
+
+    workspace = Workspace(directory=args.directory, pattern=args.pattern,
+                          executor="process" if args.processes else "thread",
+                          max_workers=args.workers, storage=args.storage)
+    if args.command == "due":
+        until = (datetime.date.today() + datetime.timedelta(days=max(args.days, 0))).isoformat()
+        results = workspace.due(until)
+    elif args.command == "next":
+        results = workspace.next_due(args.limit)
+    elif args.command == "priority":
+        results = workspace.top_priority(args.limit)
+    else:
+        results = workspace.overdue()
+
+    from task_manager import PAGE_SIZE
+
+    # 每次格式化一页，整页一次写出 (Format one page at a time and write it in one call)
+    results = iter(results)
+    count = 0
+    while True:
+        page = list(itertools.islice(results, PAGE_SIZE))
+        if page:
+            sys.stdout.write("".join(f"{task.get('due_date') or '':<10}  {name}  #{task['id']} - {task['title']}\n"
+                                     for name, task in page))
+        count += len(page)
+        if len(page) < PAGE_SIZE:
+            break
+    if count == 0:
+        print("没有任务 (No tasks)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
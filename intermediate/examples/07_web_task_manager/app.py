@@ -8,83 +8,414 @@ Web任务管理器项目
 """
 
 import os
+import json
+import time
+import base64
 import sqlite3
+import threading
+from collections import OrderedDict
 from flask import Flask, render_template, request, redirect, url_for, flash, session, g
 from werkzeug.security import generate_password_hash, check_password_hash
-from datetime import datetime
+from datetime import datetime, timedelta
 
 # 创建Flask应用实例
 app = Flask(__name__)
 app.config.update(
     SECRET_KEY='dev_key_for_session',
-    DATABASE=os.path.join(app.root_path, 'tasks.db')
+    DATABASE=os.path.join(app.root_path, 'tasks.db'),
+    # 连接池中最多保留的空闲连接数
+    DB_POOL_SIZE=8,
+    # 连接使用超过这么多秒后关闭并重新建立
+    DB_MAX_CONNECTION_AGE=3600,
+    # 连接空闲超过这么多秒后，取出时先用 SELECT 1 检查
+    DB_HEALTH_CHECK_INTERVAL=30,
+    # 每个连接缓存的预编译语句数
+    DB_CACHED_STATEMENTS=256,
+    # 仪表板统计缓存的有效秒数和最多缓存的用户数
+    DASHBOARD_CACHE_TTL=60,
+    DASHBOARD_CACHE_SIZE=1024,
+    # 任务列表每页的默认任务数和最大任务数
+    TASKS_PER_PAGE=20,
+    TASKS_MAX_PER_PAGE=100
 )
 
+# 每个新连接执行一次的PRAGMA：WAL允许读写并发，synchronous=NORMAL在WAL模式下仍然安全，
+# 页缓存为负数时单位是KiB（这里是16MB），mmap让读取直接访问映射的文件（这里是256MB）
+CONNECTION_PRAGMAS = (
+    'PRAGMA journal_mode=WAL',
+    'PRAGMA synchronous=NORMAL',
+    'PRAGMA cache_size=-16384',
+    'PRAGMA mmap_size=268435456',
+    'PRAGMA busy_timeout=5000',
+)
+
+class ConnectionPool:
+    """
+    SQLite连接池
+    连接只在第一次使用时建立和设置，请求结束后放回池中供后面的请求使用，
+    因此每个请求不再需要打开数据库、执行PRAGMA和重新编译SQL语句。
+    """
+
+    def __init__(self, database, size=8, max_age=3600, health_check_interval=30,
+                 cached_statements=256):
+        self.database = database
+        self.size = size
+        self.max_age = max_age
+        self.health_check_interval = health_check_interval
+        self.cached_statements = cached_statements
+        # 进程ID：fork出的子进程不能使用父进程的连接
+        self.pid = os.getpid()
+        self._lock = threading.Lock()
+        # 空闲连接：(连接, 建立时间, 放回时间)，后放回的先取出，空闲太久的连接不会被反复使用
+        self._idle = []
+
+    def connect(self):
+        """建立并设置一个新连接"""
+        # 连接会在不同的请求线程中使用，但同一时间只属于一个请求
+        db = sqlite3.connect(
+            self.database,
+            detect_types=sqlite3.PARSE_DECLTYPES,
+            cached_statements=self.cached_statements,
+            check_same_thread=False
+        )
+        db.row_factory = sqlite3.Row
+        for pragma in CONNECTION_PRAGMAS:
+            db.execute(pragma)
+        return db
+
+    def acquire(self):
+        """
+        取出一个可用的连接，池中没有空闲连接时建立新连接
+        返回: (连接, 建立时间)
+        """
+        now = time.monotonic()
+        while True:
+            with self._lock:
+                if not self._idle:
+                    break
+                db, created, released = self._idle.pop()
+            if now - created >= self.max_age:
+                db.close()
+            elif now - released < self.health_check_interval or self._is_healthy(db):
+                return db, created
+        return self.connect(), now
+
+    def release(self, db, created):
+        """把连接放回池中；连接已损坏、太旧或池已满时关闭它"""
+        now = time.monotonic()
+        try:
+            # 请求出错时可能留下未提交的事务
+            if db.in_transaction:
+                db.rollback()
+        except sqlite3.Error:
+            db.close()
+            return
+        if now - created >= self.max_age or os.getpid() != self.pid:
+            db.close()
+            return
+        with self._lock:
+            if len(self._idle) < self.size:
+                self._idle.append((db, created, now))
+                return
+        db.close()
+
+    def close_all(self):
+        """关闭所有空闲连接"""
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for db, _, _ in idle:
+            db.close()
+
+    @staticmethod
+    def _is_healthy(db):
+        """检查连接是否还能使用，不能使用时关闭它"""
+        try:
+            db.execute('SELECT 1').fetchone()
+            return True
+        except sqlite3.Error:
+            db.close()
+            return False
+
+_pool_lock = threading.Lock()
+
+def get_pool():
+    """
+    获取当前应用的连接池
+    数据库路径改变（例如测试中）或在fork出的子进程中时建立新的连接池
+    """
+    pool = app.extensions.get('sqlite_pool')
+    if pool is None or pool.database != app.config['DATABASE'] or pool.pid != os.getpid():
+        with _pool_lock:
+            pool = app.extensions.get('sqlite_pool')
+            if pool is None or pool.database != app.config['DATABASE'] or pool.pid != os.getpid():
+                if pool is not None and pool.pid == os.getpid():
+                    pool.close_all()
+                pool = ConnectionPool(
+                    app.config['DATABASE'],
+                    size=app.config['DB_POOL_SIZE'],
+                    max_age=app.config['DB_MAX_CONNECTION_AGE'],
+                    health_check_interval=app.config['DB_HEALTH_CHECK_INTERVAL'],
+                    cached_statements=app.config['DB_CACHED_STATEMENTS']
+                )
+                app.extensions['sqlite_pool'] = pool
+    return pool
+
 # 数据库连接函数
 def get_db():
     """
     获取数据库连接
-    如果不存在，则创建一个新的连接
+    如果当前请求还没有连接，则从连接池中取出一个
     """
     if 'db' not in g:
-        g.db = sqlite3.connect(
-            app.config['DATABASE'],
-            detect_types=sqlite3.PARSE_DECLTYPES
-        )
-        g.db.row_factory = sqlite3.Row
+        pool = get_pool()
+        g.db, g.db_created = pool.acquire()
+        g.db_pool = pool
     return g.db
 
 @app.teardown_appcontext
 def close_db(e=None):
-    """如果存在，关闭数据库连接"""
+    """如果存在，把数据库连接放回连接池"""
     db = g.pop('db', None)
     if db is not None:
-        db.close()
+        g.pop('db_pool').release(db, g.pop('db_created'))
 
-def init_db():
-    """初始化数据库表结构"""
-    db = get_db()
-    
-    # 创建用户表
-    db.execute('''
-    CREATE TABLE IF NOT EXISTS users (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        username TEXT UNIQUE NOT NULL,
-        password TEXT NOT NULL,
-        email TEXT UNIQUE NOT NULL,
-        created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
-    )
-    ''')
-    
-    # 创建任务分类表
-    db.execute('''
-    CREATE TABLE IF NOT EXISTS categories (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        name TEXT NOT NULL,
-        user_id INTEGER NOT NULL,
-        FOREIGN KEY (user_id) REFERENCES users (id)
-    )
-    ''')
-    
-    # 创建任务表
+# 数据库迁移：(版本号, 说明, SQL语句)，版本号只增不减，已发布的迁移不再修改
+MIGRATIONS = [
+    (1, '创建用户、分类和任务表', (
+        '''
+        CREATE TABLE IF NOT EXISTS users (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            username TEXT UNIQUE NOT NULL,
+            password TEXT NOT NULL,
+            email TEXT UNIQUE NOT NULL,
+            created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS categories (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            user_id INTEGER NOT NULL,
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS tasks (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            title TEXT NOT NULL,
+            description TEXT,
+            created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            due_date TIMESTAMP,
+            priority INTEGER DEFAULT 0,
+            completed INTEGER DEFAULT 0,
+            user_id INTEGER NOT NULL,
+            category_id INTEGER,
+            FOREIGN KEY (user_id) REFERENCES users (id),
+            FOREIGN KEY (category_id) REFERENCES categories (id)
+        )
+        ''',
+    )),
+    # 按页面的实际查询建立索引，避免按用户过滤时扫描整张表
+    (2, '为仪表盘、任务列表和分类列表的查询添加索引', (
+        # 仪表盘的计数和任务列表的状态过滤、按截止日期排序
+        'CREATE INDEX IF NOT EXISTS idx_tasks_user_status_due ON tasks (user_id, completed, due_date, priority)',
+        # 仪表盘的最近任务
+        'CREATE INDEX IF NOT EXISTS idx_tasks_user_created ON tasks (user_id, created_at)',
+        # 分类列表按分类统计任务，删除分类时重置任务的分类
+        'CREATE INDEX IF NOT EXISTS idx_tasks_category ON tasks (category_id, completed)',
+        'CREATE INDEX IF NOT EXISTS idx_categories_user ON categories (user_id, name)',
+    )),
+    # 触发器维护的计数表，页面直接读取计数，不再统计任务行
+    # completed和priority可能为NULL，用IFNULL避免计数变成NULL
+    (3, '添加由触发器维护的用户和分类任务计数表', (
+        '''
+        CREATE TABLE IF NOT EXISTS user_task_stats (
+            user_id INTEGER PRIMARY KEY,
+            total INTEGER NOT NULL DEFAULT 0,
+            completed INTEGER NOT NULL DEFAULT 0,
+            pending INTEGER NOT NULL DEFAULT 0,
+            high_priority INTEGER NOT NULL DEFAULT 0,
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS category_stats (
+            category_id INTEGER PRIMARY KEY,
+            total INTEGER NOT NULL DEFAULT 0,
+            completed INTEGER NOT NULL DEFAULT 0,
+            pending INTEGER NOT NULL DEFAULT 0,
+            high_priority INTEGER NOT NULL DEFAULT 0,
+            FOREIGN KEY (category_id) REFERENCES categories (id)
+        )
+        ''',
+        # 统计已有的任务
+        '''
+        INSERT INTO user_task_stats (user_id, total, completed, pending, high_priority)
+        SELECT user_id, COUNT(*),
+               SUM(IFNULL(completed, 0) = 1),
+               SUM(IFNULL(completed, 0) = 0),
+               SUM(IFNULL(completed, 0) = 0 AND IFNULL(priority, 0) = 2)
+        FROM tasks
+        GROUP BY user_id
+        ''',
+        '''
+        INSERT INTO category_stats (category_id, total, completed, pending, high_priority)
+        SELECT category_id, COUNT(*),
+               SUM(IFNULL(completed, 0) = 1),
+               SUM(IFNULL(completed, 0) = 0),
+               SUM(IFNULL(completed, 0) = 0 AND IFNULL(priority, 0) = 2)
+        FROM tasks
+        WHERE category_id IS NOT NULL
+        GROUP BY category_id
+        ''',
+        # 新任务计入它的用户和分类
+        '''
+        CREATE TRIGGER IF NOT EXISTS tasks_stats_insert AFTER INSERT ON tasks
+        BEGIN
+            INSERT INTO user_task_stats (user_id, total, completed, pending, high_priority)
+            VALUES (NEW.user_id, 1,
+                    IFNULL(NEW.completed, 0) = 1,
+                    IFNULL(NEW.completed, 0) = 0,
+                    IFNULL(NEW.completed, 0) = 0 AND IFNULL(NEW.priority, 0) = 2)
+            ON CONFLICT (user_id) DO UPDATE SET
+                total = total + excluded.total,
+                completed = completed + excluded.completed,
+                pending = pending + excluded.pending,
+                high_priority = high_priority + excluded.high_priority;
+            INSERT INTO category_stats (category_id, total, completed, pending, high_priority)
+            SELECT NEW.category_id, 1,
+                   IFNULL(NEW.completed, 0) = 1,
+                   IFNULL(NEW.completed, 0) = 0,
+                   IFNULL(NEW.completed, 0) = 0 AND IFNULL(NEW.priority, 0) = 2
+            WHERE NEW.category_id IS NOT NULL
+            ON CONFLICT (category_id) DO UPDATE SET
+                total = total + excluded.total,
+                completed = completed + excluded.completed,
+                pending = pending + excluded.pending,
+                high_priority = high_priority + excluded.high_priority;
+        END
+        ''',
+        # 删除的任务从它的用户和分类中减去
+        '''
+        CREATE TRIGGER IF NOT EXISTS tasks_stats_delete AFTER DELETE ON tasks
+        BEGIN
+            UPDATE user_task_stats SET
+                total = total - 1,
+                completed = completed - (IFNULL(OLD.completed, 0) = 1),
+                pending = pending - (IFNULL(OLD.completed, 0) = 0),
+                high_priority = high_priority - (IFNULL(OLD.completed, 0) = 0 AND IFNULL(OLD.priority, 0) = 2)
+            WHERE user_id = OLD.user_id;
+            UPDATE category_stats SET
+                total = total - 1,
+                completed = completed - (IFNULL(OLD.completed, 0) = 1),
+                pending = pending - (IFNULL(OLD.completed, 0) = 0),
+                high_priority = high_priority - (IFNULL(OLD.completed, 0) = 0 AND IFNULL(OLD.priority, 0) = 2)
+            WHERE category_id = OLD.category_id;
+        END
+        ''',
+        # 修改计数相关的字段时，先减去旧值再加上新值
+        '''
+        CREATE TRIGGER IF NOT EXISTS tasks_stats_update
+        AFTER UPDATE OF completed, priority, user_id, category_id ON tasks
+        BEGIN
+            UPDATE user_task_stats SET
+                total = total - 1,
+                completed = completed - (IFNULL(OLD.completed, 0) = 1),
+                pending = pending - (IFNULL(OLD.completed, 0) = 0),
+                high_priority = high_priority - (IFNULL(OLD.completed, 0) = 0 AND IFNULL(OLD.priority, 0) = 2)
+            WHERE user_id = OLD.user_id;
+            UPDATE category_stats SET
+                total = total - 1,
+                completed = completed - (IFNULL(OLD.completed, 0) = 1),
+                pending = pending - (IFNULL(OLD.completed, 0) = 0),
+                high_priority = high_priority - (IFNULL(OLD.completed, 0) = 0 AND IFNULL(OLD.priority, 0) = 2)
+            WHERE category_id = OLD.category_id;
+            INSERT INTO user_task_stats (user_id, total, completed, pending, high_priority)
+            VALUES (NEW.user_id, 1,
+                    IFNULL(NEW.completed, 0) = 1,
+                    IFNULL(NEW.completed, 0) = 0,
+                    IFNULL(NEW.completed, 0) = 0 AND IFNULL(NEW.priority, 0) = 2)
+            ON CONFLICT (user_id) DO UPDATE SET
+                total = total + excluded.total,
+                completed = completed + excluded.completed,
+                pending = pending + excluded.pending,
+                high_priority = high_priority + excluded.high_priority;
+            INSERT INTO category_stats (category_id, total, completed, pending, high_priority)
+            SELECT NEW.category_id, 1,
+                   IFNULL(NEW.completed, 0) = 1,
+                   IFNULL(NEW.completed, 0) = 0,
+                   IFNULL(NEW.completed, 0) = 0 AND IFNULL(NEW.priority, 0) = 2
+            WHERE NEW.category_id IS NOT NULL
+            ON CONFLICT (category_id) DO UPDATE SET
+                total = total + excluded.total,
+                completed = completed + excluded.completed,
+                pending = pending + excluded.pending,
+                high_priority = high_priority + excluded.high_priority;
+        END
+        ''',
+        # 分类删除后它的计数也不再需要
+        '''
+        CREATE TRIGGER IF NOT EXISTS categories_stats_delete AFTER DELETE ON categories
+        BEGIN
+            DELETE FROM category_stats WHERE category_id = OLD.id;
+        END
+        ''',
+    )),
+    # 任务列表按 (截止日期, 优先级降序, ID) 分页，索引与排序完全一致，每页只读取需要的索引项；
+    # 没有截止日期的任务排在最前面，用IFNULL把NULL换成空字符串，使翻页条件可以直接定位
+    (4, '为任务列表的分页添加索引', (
+        "CREATE INDEX IF NOT EXISTS idx_tasks_user_page "
+        "ON tasks (user_id, IFNULL(due_date, ''), IFNULL(priority, 0) DESC)",
+        "CREATE INDEX IF NOT EXISTS idx_tasks_user_status_page "
+        "ON tasks (user_id, completed, IFNULL(due_date, ''), IFNULL(priority, 0) DESC)",
+    )),
+]
+
+def migrate(db):
+    """
+    执行尚未执行的数据库迁移
+    每个迁移在一个事务中执行并记录到schema_version表，出错时整个迁移回滚
+    返回: 本次执行的迁移版本号列表
+    """
     db.execute('''
-    CREATE TABLE IF NOT EXISTS tasks (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        title TEXT NOT NULL,
-        description TEXT,
-        created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
-        due_date TIMESTAMP,
-        priority INTEGER DEFAULT 0,
-        completed INTEGER DEFAULT 0,
-        user_id INTEGER NOT NULL,
-        category_id INTEGER,
-        FOREIGN KEY (user_id) REFERENCES users (id),
-        FOREIGN KEY (category_id) REFERENCES categories (id)
+    CREATE TABLE IF NOT EXISTS schema_version (
+        version INTEGER PRIMARY KEY,
+        description TEXT NOT NULL,
+        applied_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
     )
     ''')
-    
-    # 提交事务
     db.commit()
+    current = db.execute('SELECT COALESCE(MAX(version), 0) FROM schema_version').fetchone()[0]
+
+    applied = []
+    for version, description, statements in MIGRATIONS:
+        if version <= current:
+            continue
+        # IMMEDIATE先取得写锁，多个进程同时启动时只有一个执行迁移
+        db.execute('BEGIN IMMEDIATE')
+        try:
+            if db.execute('SELECT 1 FROM schema_version WHERE version = ?', (version,)).fetchone():
+                db.rollback()
+                continue
+            for statement in statements:
+                db.execute(statement)
+            db.execute(
+                'INSERT INTO schema_version (version, description) VALUES (?, ?)',
+                (version, description)
+            )
+            db.commit()
+        except BaseException:
+            db.rollback()
+            raise
+        applied.append(version)
+    return applied
+
+def init_db():
+    """初始化数据库表结构"""
+    db = get_db()
+    
+    # 创建或升级表结构
+    migrate(db)
     
     # 检查是否有默认用户，如果没有则创建
     cursor = db.execute('SELECT COUNT(*) FROM users')
@@ -223,46 +554,63 @@ def logout():
     flash('您已成功注销 (You have been logged out)', 'success')
     return redirect(url_for('index'))
 
-# 路由：用户仪表板
-@app.route('/dashboard')
-@login_required
-def dashboard():
-    """用户仪表板，显示任务概况"""
-    db = get_db()
-    user_id = session['user_id']
-    
-    # 获取用户的任务统计
-    total_tasks = db.execute(
-        'SELECT COUNT(*) FROM tasks WHERE user_id = ?', (user_id,)
-    ).fetchone()[0]
-    
-    completed_tasks = db.execute(
-        'SELECT COUNT(*) FROM tasks WHERE user_id = ? AND completed = 1', (user_id,)
-    ).fetchone()[0]
-    
-    pending_tasks = total_tasks - completed_tasks
-    
-    # 获取今天到期的任务
+# 仪表板数据缓存：(数据库, 用户ID) -> (缓存时间, 日期, 数据)
+# 修改任务或分类的路由调用invalidate_dashboard清除对应用户的缓存；
+# 缓存只在当前进程中，其他工作进程的修改最多DASHBOARD_CACHE_TTL秒后可见
+_dashboard_cache = OrderedDict()
+_dashboard_cache_lock = threading.Lock()
+# 每个用户的缓存代数：(数据库, 用户ID) -> 清除次数
+# 查询期间缓存被清除时代数会变化，这次查询的结果可能已经过期，不再写入缓存
+_dashboard_generation = {}
+
+def invalidate_dashboard(user_id):
+    """清除用户的仪表板缓存"""
+    key = (app.config['DATABASE'], user_id)
+    with _dashboard_cache_lock:
+        _dashboard_cache.pop(key, None)
+        _dashboard_generation[key] = _dashboard_generation.get(key, 0) + 1
+
+def dashboard_data(user_id):
+    """
+    获取用户仪表板的统计数据，优先使用缓存
+    日期变化后"今天到期"的数量不同，因此缓存也按日期失效
+    """
+    key = (app.config['DATABASE'], user_id)
     today = datetime.now().strftime('%Y-%m-%d')
-    due_today = db.execute(
-        'SELECT COUNT(*) FROM tasks WHERE user_id = ? AND date(due_date) = ? AND completed = 0',
-        (user_id, today)
-    ).fetchone()[0]
-    
-    # 获取高优先级任务
-    high_priority = db.execute(
-        'SELECT COUNT(*) FROM tasks WHERE user_id = ? AND priority = 2 AND completed = 0',
-        (user_id,)
-    ).fetchone()[0]
+    now = time.monotonic()
+    with _dashboard_cache_lock:
+        cached = _dashboard_cache.get(key)
+        if cached is not None and cached[1] == today and now - cached[0] < app.config['DASHBOARD_CACHE_TTL']:
+            _dashboard_cache.move_to_end(key)
+            return cached[2]
+        generation = _dashboard_generation.get(key, 0)
+
+    db = get_db()
+    # 计数由触发器维护在user_task_stats中，只读取该用户的一行；
+    # 今天到期的数量与日期有关，用截止日期的范围查询只读取今天到期的索引项
+    tomorrow = (datetime.now() + timedelta(days=1)).strftime('%Y-%m-%d')
+    counts = db.execute(
+        '''
+        SELECT s.total AS total_tasks,
+               s.completed AS completed_tasks,
+               s.pending AS pending_tasks,
+               s.high_priority,
+               (SELECT COUNT(*) FROM tasks
+                WHERE user_id = s.user_id AND completed = 0 AND due_date >= ? AND due_date < ?) AS due_today
+        FROM user_task_stats s
+        WHERE s.user_id = ?
+        ''',
+        (today, tomorrow, user_id)
+    ).fetchone()
     
-    # 获取按分类统计的任务数量
+    # 获取按分类统计的未完成任务数量
     categories = db.execute(
         '''
-        SELECT c.id, c.name, COUNT(t.id) as task_count
+        SELECT c.id, c.name, IFNULL(s.pending, 0) as task_count
         FROM categories c
-        LEFT JOIN tasks t ON c.id = t.category_id AND t.completed = 0
+        LEFT JOIN category_stats s ON s.category_id = c.id
         WHERE c.user_id = ?
-        GROUP BY c.id
+        ORDER BY c.id
         ''',
         (user_id,)
     ).fetchall()
@@ -280,14 +628,72 @@ def dashboard():
         (user_id,)
     ).fetchall()
     
-    return render_template('dashboard.html', 
-                           total_tasks=total_tasks, 
-                           completed_tasks=completed_tasks,
-                           pending_tasks=pending_tasks,
-                           due_today=due_today,
-                           high_priority=high_priority,
-                           categories=categories,
-                           recent_tasks=recent_tasks)
+    # 还没有添加过任务的用户没有计数行
+    data = {
+        'total_tasks': counts['total_tasks'] if counts else 0,
+        'completed_tasks': counts['completed_tasks'] if counts else 0,
+        'pending_tasks': counts['pending_tasks'] if counts else 0,
+        'due_today': counts['due_today'] if counts else 0,
+        'high_priority': counts['high_priority'] if counts else 0,
+        'categories': categories,
+        'recent_tasks': recent_tasks,
+    }
+    with _dashboard_cache_lock:
+        if _dashboard_generation.get(key, 0) != generation:
+            return data
+        _dashboard_cache[key] = (now, today, data)
+        _dashboard_cache.move_to_end(key)
+        while len(_dashboard_cache) > app.config['DASHBOARD_CACHE_SIZE']:
+            _dashboard_cache.popitem(last=False)
+    return data
+
+# 路由：用户仪表板
+@app.route('/dashboard')
+@login_required
+def dashboard():
+    """用户仪表板，显示任务概况"""
+    user_id = session['user_id']
+    return render_template('dashboard.html', **dashboard_data(user_id))
+
+# 任务列表的分页游标是页面第一个或最后一个任务的排序键 (截止日期, 优先级, ID)
+def encode_cursor(task):
+    """把任务的排序键编码为URL中的游标"""
+    key = [task['sort_due_date'], task['sort_priority'], task['id']]
+    return base64.urlsafe_b64encode(json.dumps(key).encode()).decode().rstrip('=')
+
+def decode_cursor(cursor):
+    """
+    解析游标
+    返回: (截止日期, 优先级, ID)，游标无效时返回None
+    """
+    try:
+        key = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        due_date, priority, task_id = key
+    except (ValueError, TypeError):
+        return None
+    if not isinstance(due_date, str) or not isinstance(priority, int) or not isinstance(task_id, int):
+        return None
+    return due_date, priority, task_id
+
+def keyset_condition(key, forward):
+    """
+    返回排在游标之后（forward为True）或之前的任务的查询条件和参数
+    排序是截止日期升序、优先级降序、ID升序；第一个条件让SQLite在索引中直接定位到游标处
+    """
+    due_date, priority, task_id = key
+    if forward:
+        condition = '''
+        AND IFNULL(t.due_date, '') >= ?
+        AND (IFNULL(t.due_date, '') > ? OR IFNULL(t.priority, 0) < ?
+             OR (IFNULL(t.priority, 0) = ? AND t.id > ?))
+        '''
+    else:
+        condition = '''
+        AND IFNULL(t.due_date, '') <= ?
+        AND (IFNULL(t.due_date, '') < ? OR IFNULL(t.priority, 0) > ?
+             OR (IFNULL(t.priority, 0) = ? AND t.id < ?))
+        '''
+    return condition, [due_date, due_date, priority, priority, task_id]
 
 # 路由：任务列表
 @app.route('/tasks')
@@ -302,9 +708,16 @@ def task_list():
     category_id = request.args.get('category', 'all')
     priority = request.args.get('priority', 'all')
     
-    # 构建查询
+    # 获取分页参数：after是下一页的游标，before是上一页的游标
+    per_page = request.args.get('per_page', app.config['TASKS_PER_PAGE'], type=int)
+    per_page = max(1, min(per_page, app.config['TASKS_MAX_PER_PAGE']))
+    after = decode_cursor(request.args.get('after', ''))
+    before = decode_cursor(request.args.get('before', '')) if after is None else None
+    
+    # 构建查询，sort_列是没有类型转换的排序键，用于生成游标
     query = '''
-    SELECT t.*, c.name as category_name 
+    SELECT t.*, c.name as category_name,
+           IFNULL(t.due_date, '') as sort_due_date, IFNULL(t.priority, 0) as sort_priority
     FROM tasks t
     LEFT JOIN categories c ON t.category_id = c.id
     WHERE t.user_id = ?
@@ -325,11 +738,38 @@ def task_list():
         query += ' AND t.priority = ?'
         params.append(int(priority))
     
-    # 排序
-    query += ' ORDER BY t.due_date ASC, t.priority DESC'
+    # 从游标处开始，多取一个任务用来判断后面是否还有任务
+    forward = before is None
+    if after or before:
+        condition, cursor_params = keyset_condition(after or before, forward)
+        query += condition
+        params.extend(cursor_params)
+    
+    # 排序，向前翻页时反向读取
+    if forward:
+        query += " ORDER BY IFNULL(t.due_date, '') ASC, IFNULL(t.priority, 0) DESC, t.id ASC"
+    else:
+        query += " ORDER BY IFNULL(t.due_date, '') DESC, IFNULL(t.priority, 0) ASC, t.id DESC"
+    query += ' LIMIT ?'
+    params.append(per_page + 1)
     
     # 执行查询
     tasks = db.execute(query, params).fetchall()
+    has_more = len(tasks) > per_page
+    tasks = tasks[:per_page]
+    if not forward:
+        tasks.reverse()
+    
+    # 从上一页翻过来时一定有上一页，从下一页翻回来时一定有下一页
+    has_next = has_more if forward else True
+    has_prev = (after is not None) if forward else has_more
+    next_cursor = encode_cursor(tasks[-1]) if has_next and tasks else None
+    prev_cursor = encode_cursor(tasks[0]) if has_prev and tasks else None
+    
+    # 翻页链接保留当前的过滤条件
+    filters = {'status': status, 'category': category_id, 'priority': priority, 'per_page': per_page}
+    next_url = url_for('task_list', after=next_cursor, **filters) if next_cursor else None
+    prev_url = url_for('task_list', before=prev_cursor, **filters) if prev_cursor else None
     
     # 获取分类列表，用于过滤
     categories = db.execute(
@@ -342,7 +782,12 @@ def task_list():
                            categories=categories,
                            current_status=status,
                            current_category=category_id,
-                           current_priority=priority)
+                           current_priority=priority,
+                           per_page=per_page,
+                           next_cursor=next_cursor,
+                           prev_cursor=prev_cursor,
+                           next_url=next_url,
+                           prev_url=prev_url)
 
 # 路由：添加任务
 @app.route('/tasks/add', methods=('GET', 'POST'))
@@ -373,6 +818,7 @@ def add_task():
                 (title, description, due_date, priority, category_id, user_id)
             )
             db.commit()
+            invalidate_dashboard(user_id)
             flash('任务已添加 (Task has been added)', 'success')
             return redirect(url_for('task_list'))
         
@@ -429,6 +875,7 @@ def edit_task(id):
                 (title, description, due_date, priority, category_id, completed, id)
             )
             db.commit()
+            invalidate_dashboard(user_id)
             flash('任务已更新 (Task has been updated)', 'success')
             return redirect(url_for('task_list'))
         
@@ -461,6 +908,7 @@ def delete_task(id):
     else:
         db.execute('DELETE FROM tasks WHERE id = ?', (id,))
         db.commit()
+        invalidate_dashboard(user_id)
         flash('任务已删除 (Task has been deleted)', 'success')
     
     return redirect(url_for('task_list'))
@@ -490,6 +938,7 @@ def toggle_task(id):
             (new_status, id)
         )
         db.commit()
+        invalidate_dashboard(user_id)
         flash(f'任务已标记为{status_text} (Task marked as {status_text})', 'success')
     
     return redirect(url_for('task_list'))
@@ -502,16 +951,15 @@ def category_list():
     db = get_db()
     user_id = session['user_id']
     
-    # 获取分类列表以及每个分类下的任务数量
+    # 获取分类列表以及每个分类下的任务数量，计数由触发器维护
     categories = db.execute(
         '''
         SELECT c.id, c.name, 
-               COUNT(t.id) as task_count,
-               SUM(CASE WHEN t.completed = 0 THEN 1 ELSE 0 END) as pending_count
+               IFNULL(s.total, 0) as task_count,
+               IFNULL(s.pending, 0) as pending_count
         FROM categories c
-        LEFT JOIN tasks t ON c.id = t.category_id
+        LEFT JOIN category_stats s ON s.category_id = c.id
         WHERE c.user_id = ?
-        GROUP BY c.id
         ORDER BY c.name
         ''',
         (user_id,)
@@ -540,6 +988,7 @@ def add_category():
                 (name, user_id)
             )
             db.commit()
+            invalidate_dashboard(user_id)
             flash('分类已添加 (Category has been added)', 'success')
             return redirect(url_for('category_list'))
         
@@ -579,6 +1028,7 @@ def edit_category(id):
                 (name, id)
             )
             db.commit()
+            invalidate_dashboard(user_id)
             flash('分类已更新 (Category has been updated)', 'success')
             return redirect(url_for('category_list'))
         
@@ -611,6 +1061,7 @@ def delete_category(id):
         # 删除分类
         db.execute('DELETE FROM categories WHERE id = ?', (id,))
         db.commit()
+        invalidate_dashboard(user_id)
         flash('分类已删除 (Category has been deleted)', 'success')
     
     return redirect(url_for('category_list'))
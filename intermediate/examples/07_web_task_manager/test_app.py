@@ -0,0 +1,309 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Web任务管理器测试模块
+
+使用pytest测试数据库迁移，并用EXPLAIN QUERY PLAN检查页面的查询都使用索引。
+"""
+
+import os
+import random
+import sqlite3
+import pytest
+from datetime import datetime
+from app import app, get_db, get_pool, init_db, migrate, MIGRATIONS, dashboard_data, invalidate_dashboard, ConnectionPool
+
+# 测试数据库
+@pytest.fixture
+def db(tmp_path):
+    """在临时目录中创建并初始化测试数据库"""
+    app.config['DATABASE'] = str(tmp_path / 'test_tasks.db')
+    app.config['TESTING'] = True
+    with app.app_context():
+        init_db()
+        yield get_db()
+
+# 测试连接池
+def test_pool_rolls_back_open_transaction_on_release(tmp_path):
+    """测试放回连接池时回滚请求留下的未提交事务，连接可以继续使用"""
+    pool = ConnectionPool(str(tmp_path / 'pool.db'))
+    connection, created = pool.acquire()
+    connection.execute('CREATE TABLE items (id INTEGER PRIMARY KEY)')
+    connection.execute('INSERT INTO items VALUES (1)')
+    assert connection.in_transaction
+    pool.release(connection, created)
+
+    reused, _ = pool.acquire()
+    assert reused is connection
+    assert not reused.in_transaction
+    assert reused.execute('SELECT COUNT(*) FROM items').fetchone()[0] == 0
+    pool.release(reused, created)
+    pool.close_all()
+
+def test_pool_replaces_connection_that_fails_health_check(tmp_path):
+    """测试空闲连接检查失败时被丢弃，取出的是新建立的连接"""
+    pool = ConnectionPool(str(tmp_path / 'pool.db'), health_check_interval=0)
+    connection, created = pool.acquire()
+    pool.release(connection, created)
+    # 模拟失效的连接
+    connection.close()
+
+    replacement, _ = pool.acquire()
+    assert replacement is not connection
+    assert replacement.execute('SELECT 1').fetchone()[0] == 1
+    assert replacement.execute('PRAGMA journal_mode').fetchone()[0] == 'wal'
+    with pytest.raises(sqlite3.ProgrammingError):
+        connection.execute('SELECT 1')
+    pool.release(replacement, created)
+    pool.close_all()
+
+def test_forked_worker_gets_a_fresh_pool(tmp_path, monkeypatch):
+    """测试fork出的工作进程建立自己的连接池，不使用也不关闭父进程的连接"""
+    app.config['DATABASE'] = str(tmp_path / 'pool.db')
+    parent_pool = get_pool()
+    connection, created = parent_pool.acquire()
+    parent_pool.release(connection, created)
+
+    parent_pid = os.getpid()
+    monkeypatch.setattr('app.os.getpid', lambda: parent_pid + 1)
+    child_pool = get_pool()
+    assert child_pool is not parent_pool
+    assert child_pool.pid == parent_pid + 1
+    child_connection, child_created = child_pool.acquire()
+    assert child_connection is not connection
+    # 父进程的空闲连接保持原样
+    assert [idle[0] for idle in parent_pool._idle] == [connection]
+    assert connection.execute('SELECT 1').fetchone()[0] == 1
+    child_pool.release(child_connection, child_created)
+    child_pool.close_all()
+
+# 测试迁移
+def test_migrations_are_recorded_once(db):
+    """测试迁移只执行一次并记录版本号"""
+    versions = [row['version'] for row in db.execute('SELECT version FROM schema_version ORDER BY version')]
+    assert versions == [version for version, _, _ in MIGRATIONS]
+    assert migrate(db) == []
+
+    indexes = {row['name'] for row in db.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+    assert {'idx_tasks_user_status_due', 'idx_tasks_user_created',
+            'idx_tasks_category', 'idx_categories_user'} <= indexes
+
+def test_failed_migration_rolls_back(db, monkeypatch):
+    """测试出错的迁移整体回滚，不记录版本号"""
+    broken = (len(MIGRATIONS) + 1, '出错的迁移', (
+        'CREATE TABLE broken (id INTEGER PRIMARY KEY)',
+        'INSERT INTO no_such_table VALUES (1)',
+    ))
+    monkeypatch.setattr('app.MIGRATIONS', MIGRATIONS + [broken])
+    with pytest.raises(Exception):
+        migrate(db)
+
+    assert db.execute("SELECT 1 FROM sqlite_master WHERE name = 'broken'").fetchone() is None
+    assert db.execute('SELECT MAX(version) FROM schema_version').fetchone()[0] == len(MIGRATIONS)
+
+# 测试查询计划
+def page_statements(db, monkeypatch, urls):
+    """
+    以admin登录后请求每个页面，返回页面实际执行的查询任务和分类的SQL语句
+    测试在应用上下文中运行，请求使用同一个数据库连接；语句来自连接的跟踪回调，
+    参数已经代入，可以直接用EXPLAIN QUERY PLAN检查
+    """
+    # 没有模板文件，页面只需要执行查询
+    monkeypatch.setattr('app.render_template', lambda name, **context: '')
+    client = app.test_client()
+    client.post('/login', data={'username': 'admin', 'password': 'password'})
+    statements = {}
+    for url in urls:
+        executed = statements[url] = []
+        db.set_trace_callback(executed.append)
+        client.get(url)
+    db.set_trace_callback(None)
+    return {url: [sql for sql in executed if sql.lstrip().upper().startswith('SELECT')
+                  and ('tasks' in sql or 'categories' in sql)]
+            for url, executed in statements.items()}
+
+def page_link(monkeypatch, url, link='next_url'):
+    """返回页面的下一页或上一页链接"""
+    pages = []
+    monkeypatch.setattr('app.render_template', lambda name, **context: pages.append(context) or '')
+    client = app.test_client()
+    client.post('/login', data={'username': 'admin', 'password': 'password'})
+    client.get(url)
+    return pages[-1][link]
+
+def test_page_queries_use_indexes(db, monkeypatch):
+    """测试仪表板、任务列表和分类列表实际执行的查询都通过索引查找，任务列表不需要排序"""
+    db.executemany(
+        'INSERT INTO tasks (title, due_date, priority, completed, user_id, category_id) VALUES (?, ?, ?, ?, ?, ?)',
+        [(f'任务{i}', f'2024-01-{i % 28 + 1:02d} 09:00:00', i % 3, i % 2, 1, i % 3 + 1) for i in range(30)]
+    )
+    db.commit()
+    urls = [
+        '/dashboard',
+        '/tasks',
+        '/tasks?status=all',
+        '/tasks?status=completed',
+        '/tasks?status=all&category=1&priority=2',
+        page_link(monkeypatch, '/tasks?status=all&per_page=5'),
+        page_link(monkeypatch, '/tasks?per_page=5'),
+        page_link(monkeypatch, page_link(monkeypatch, '/tasks?per_page=5'), 'prev_url'),
+        '/categories',
+    ]
+    statements = page_statements(db, monkeypatch, urls)
+
+    for url in urls:
+        assert statements.get(url), url
+        for sql in statements[url]:
+            plan = [row['detail'] for row in db.execute('EXPLAIN QUERY PLAN ' + sql)]
+            assert not any(step.startswith('SCAN') for step in plan), (url, sql, plan)
+            if url.startswith('/tasks') and 'LIMIT' in sql:
+                assert not any('TEMP B-TREE' in step for step in plan), (url, sql, plan)
+
+# 测试仪表板
+def test_dashboard_counts_and_cache(db):
+    """测试仪表板的计数，缓存命中时不查询数据库，修改任务后缓存失效"""
+    # due_date声明为TIMESTAMP，读取时按日期时间解析
+    today = datetime.now().strftime('%Y-%m-%d 12:00:00')
+    db.executemany(
+        'INSERT INTO tasks (title, due_date, priority, completed, user_id, category_id) VALUES (?, ?, ?, ?, ?, ?)',
+        [('今天到期', today, 2, 0, 1, 1), ('已完成', today, 2, 1, 1, 1),
+         ('低优先级', None, 0, 0, 1, None), ('其他用户', today, 2, 0, 2, 4)]
+    )
+    db.commit()
+
+    data = dashboard_data(1)
+    assert (data['total_tasks'], data['completed_tasks'], data['pending_tasks'],
+            data['due_today'], data['high_priority']) == (3, 1, 2, 1, 1)
+    assert {row['name']: row['task_count'] for row in data['categories']} == {'工作': 1, '学习': 0, '个人': 0}
+
+    statements = []
+    db.set_trace_callback(statements.append)
+    assert dashboard_data(1) is data
+    assert statements == []
+    db.set_trace_callback(None)
+
+    client = app.test_client()
+    client.post('/login', data={'username': 'admin', 'password': 'password'})
+    client.post('/tasks/1/toggle')
+    assert dashboard_data(1)['completed_tasks'] == 2
+
+def test_dashboard_not_cached_when_invalidated_during_query(db):
+    """测试查询期间缓存被清除时，可能过期的结果不会写入缓存"""
+    invalidate_dashboard(1)
+    db.set_trace_callback(lambda sql: invalidate_dashboard(1))
+    dashboard_data(1)
+    db.set_trace_callback(None)
+
+    statements = []
+    db.set_trace_callback(statements.append)
+    dashboard_data(1)
+    db.set_trace_callback(None)
+    assert statements
+
+# 测试计数表
+def counts_by_query(db):
+    """直接统计任务行得到的用户和分类计数，用于和计数表比较"""
+    def count(group):
+        return {row[0]: tuple(row[1:]) for row in db.execute(f'''
+            SELECT {group}, COUNT(*),
+                   SUM(IFNULL(completed, 0) = 1),
+                   SUM(IFNULL(completed, 0) = 0),
+                   SUM(IFNULL(completed, 0) = 0 AND IFNULL(priority, 0) = 2)
+            FROM tasks WHERE {group} IS NOT NULL GROUP BY {group}
+        ''')}
+    return count('user_id'), count('category_id')
+
+def counts_by_table(db, table, key):
+    """计数表中不为零的行"""
+    return {row[0]: tuple(row[1:]) for row in db.execute(
+        f'SELECT {key}, total, completed, pending, high_priority FROM {table} WHERE total > 0'
+    )}
+
+def test_triggers_keep_stats_in_sync(db):
+    """测试随机添加、修改和删除任务后，计数表与直接统计的结果一致"""
+    rng = random.Random(24)
+    categories = {1: [1, 2, 3], 2: [4, 5, 6]}
+    for _ in range(300):
+        task_ids = [row[0] for row in db.execute('SELECT id FROM tasks')]
+        action = rng.random()
+        if action < 0.4 or not task_ids:
+            user_id = rng.choice([1, 2])
+            db.execute(
+                'INSERT INTO tasks (title, priority, completed, user_id, category_id) VALUES (?, ?, ?, ?, ?)',
+                ('任务', rng.choice([0, 1, 2, None]), rng.choice([0, 1]), user_id,
+                 rng.choice(categories[user_id] + [None]))
+            )
+        elif action < 0.6:
+            db.execute('UPDATE tasks SET completed = 1 - completed WHERE id = ?', (rng.choice(task_ids),))
+        elif action < 0.8:
+            db.execute('UPDATE tasks SET priority = ?, category_id = ? WHERE id = ?',
+                       (rng.choice([0, 1, 2]), rng.choice([1, 2, 3, None]), rng.choice(task_ids)))
+        else:
+            db.execute('DELETE FROM tasks WHERE id = ?', (rng.choice(task_ids),))
+    db.commit()
+
+    by_user, by_category = counts_by_query(db)
+    assert counts_by_table(db, 'user_task_stats', 'user_id') == by_user
+    assert counts_by_table(db, 'category_stats', 'category_id') == by_category
+
+    # 删除分类时先把任务移出分类，再删除分类和它的计数
+    db.execute('UPDATE tasks SET category_id = NULL WHERE category_id = 1')
+    db.execute('DELETE FROM categories WHERE id = 1')
+    db.commit()
+    assert db.execute('SELECT 1 FROM category_stats WHERE category_id = 1').fetchone() is None
+    assert counts_by_table(db, 'user_task_stats', 'user_id') == counts_by_query(db)[0]
+
+def test_stats_migration_counts_existing_tasks(db):
+    """测试计数表的迁移统计已有的任务"""
+    db.executemany(
+        'INSERT INTO tasks (title, priority, completed, user_id, category_id) VALUES (?, ?, ?, ?, ?)',
+        [('a', 2, 0, 1, 1), ('b', 2, 1, 1, 2), ('c', 0, 0, 2, None)]
+    )
+    db.execute('DELETE FROM user_task_stats')
+    db.execute('DELETE FROM category_stats')
+    db.execute('DELETE FROM schema_version WHERE version >= 3')
+    db.commit()
+
+    assert migrate(db)[0] == 3
+    by_user, by_category = counts_by_query(db)
+    assert counts_by_table(db, 'user_task_stats', 'user_id') == by_user
+    assert counts_by_table(db, 'category_stats', 'category_id') == by_category
+
+# 测试任务列表分页
+def test_task_list_keyset_pagination(db, monkeypatch):
+    """测试按游标向后翻页再向前翻回，每个任务只出现一次且顺序与排序一致"""
+    rng = random.Random(25)
+    dates = [None, '2024-01-01 09:00:00', '2024-01-02 09:00:00', '2024-02-01 09:00:00']
+    db.executemany(
+        'INSERT INTO tasks (title, due_date, priority, completed, user_id) VALUES (?, ?, ?, ?, ?)',
+        [(f'任务{i}', rng.choice(dates), rng.choice([0, 1, 2]), rng.choice([0, 1]), 1) for i in range(53)]
+    )
+    db.commit()
+    expected = [row['id'] for row in db.execute(
+        "SELECT id FROM tasks WHERE user_id = 1 ORDER BY IFNULL(due_date, ''), priority DESC, id"
+    )]
+
+    # 没有模板文件，记录传给模板的数据
+    pages = []
+    monkeypatch.setattr('app.render_template', lambda name, **context: pages.append(context) or '')
+    client = app.test_client()
+    client.post('/login', data={'username': 'admin', 'password': 'password'})
+
+    url = '/tasks?status=all&per_page=10'
+    seen = []
+    while url:
+        client.get(url)
+        seen.append([task['id'] for task in pages[-1]['tasks']])
+        url = pages[-1]['next_url']
+    assert [task_id for page in seen for task_id in page] == expected
+    assert [len(page) for page in seen] == [10, 10, 10, 10, 10, 3]
+    assert pages[0]['prev_url'] is None
+
+    back = []
+    url = pages[-1]['prev_url']
+    while url:
+        client.get(url)
+        back.append([task['id'] for task in pages[-1]['tasks']])
+        url = pages[-1]['prev_url']
+    assert back == seen[-2::-1]